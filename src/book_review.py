@@ -1,21 +1,34 @@
 # TODO: Include "What I liked" and "What I didn't like" sections. LIke here: https://mtlynch.io/book-reports/start-small-stay-small/
 
+import argparse
+import hashlib
+import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from datetime import datetime
 from dotenv import load_dotenv
 import openai
 from pathlib import Path
 
+from src.llm_cache import cache, openai_chat_text
+
 load_dotenv()
 
 client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+HIGHLIGHTS_DIR = Path.cwd() / "ignore" / "highlights"
+REVIEWS_DIR = Path.cwd() / "ignore" / "reviews"
+MANIFEST_PATH = Path.cwd() / "caches" / "book_reviews.json"
+
 def get_highlights_content(filename: str) -> str:
     # Ensure filename has .md extension
     if not filename.endswith('.md'):
         filename += '.md'
 
     # Build path to the highlights file relative to the current working directory
-    highlights_path = Path.cwd() / "ignore" / "highlights" / filename
+    highlights_path = HIGHLIGHTS_DIR / filename
 
     try:
         with open(highlights_path, 'r', encoding='utf-8') as file:
@@ -76,7 +89,8 @@ def generate_frontmatter(highligths: str) -> str:
       - Only return the frontmatter, no other text.
     """
 
-    response = client.chat.completions.create(
+    return openai_chat_text(
+        client,
         model="gpt-5",
         messages=[
             {
@@ -86,8 +100,6 @@ def generate_frontmatter(highligths: str) -> str:
         ]
     )
 
-    return response.choices[0].message.content
-
 def generate_summary_learnings(highligths: str) -> str:
     message=f"""
       I'm writing a book review. Below are the highlights and notes I took.
@@ -108,7 +120,8 @@ def generate_summary_learnings(highligths: str) -> str:
       - Response should be in Markdown format.
     """
 
-    response = client.chat.completions.create(
+    return openai_chat_text(
+        client,
         model="gpt-5",
         messages=[
             {
@@ -118,8 +131,6 @@ def generate_summary_learnings(highligths: str) -> str:
         ]
     )
 
-    return response.choices[0].message.content
-
 def generate_key_sentences(highligths: str) -> str:
     message=f"""
         You are an expert reader trained in analytical reading.
@@ -151,7 +162,8 @@ def generate_key_sentences(highligths: str) -> str:
         ```
     """
 
-    response = client.chat.completions.create(
+    return openai_chat_text(
+        client,
         model="gpt-5",
         messages=[
             {
@@ -161,8 +173,6 @@ def generate_key_sentences(highligths: str) -> str:
         ]
     )
 
-    return response.choices[0].message.content
-
 
 def generate_unity_of_the_book(highligths: str) -> str:
     message=f"""
@@ -189,7 +199,8 @@ def generate_unity_of_the_book(highligths: str) -> str:
         - Only return the unity statement, no other text.
     """
 
-    response = client.chat.completions.create(
+    return openai_chat_text(
+        client,
         model="gpt-5",
         messages=[
             {
@@ -199,8 +210,6 @@ def generate_unity_of_the_book(highligths: str) -> str:
         ]
     )
 
-    return response.choices[0].message.content
-
 
 def generate_author_problems(highligths: str) -> str:
     message=f"""
@@ -242,7 +251,8 @@ def generate_author_problems(highligths: str) -> str:
         - Only return the problems, no other text.
     """
 
-    response = client.chat.completions.create(
+    return openai_chat_text(
+        client,
         model="gpt-5",
         messages=[
             {
@@ -252,8 +262,6 @@ def generate_author_problems(highligths: str) -> str:
         ]
     )
 
-    return response.choices[0].message.content
-
 
 def generate_book_structure(highligths: str) -> str:
     message=f"""
@@ -290,7 +298,8 @@ def generate_book_structure(highligths: str) -> str:
         - Only return the structure, no other text.
     """
 
-    response = client.chat.completions.create(
+    return openai_chat_text(
+        client,
         model="gpt-5",
         messages=[
             {
@@ -300,8 +309,6 @@ def generate_book_structure(highligths: str) -> str:
         ]
     )
 
-    return response.choices[0].message.content
-
 def generate_prompt_ideas(highligths: str) -> str:
     message=f"""
         Based on book highlights provided below can you help me come up with prompt ideas that
@@ -318,7 +325,8 @@ def generate_prompt_ideas(highligths: str) -> str:
         - Come up with 10 good ideas.
     """
 
-    response = client.chat.completions.create(
+    return openai_chat_text(
+        client,
         model="gpt-5",
         messages=[
             {
@@ -328,49 +336,149 @@ def generate_prompt_ideas(highligths: str) -> str:
         ]
     )
 
-    return response.choices[0].message.content
 
+def generate_review(highlights: str, max_workers: int = 7, limiter: threading.Semaphore = None) -> str:
+    """Generate all review sections concurrently and assemble them in order.
 
-if __name__ == "__main__":
-    filename = input("Enter the filename: ")
+    The sections only depend on the highlights, so the review takes about as
+    long as the slowest section instead of the sum of all seven. A shared
+    `limiter` caps in-flight GPT requests when several reviews run at once.
+    """
+    def section(generate):
+        with limiter or nullcontext():
+            return generate(highlights)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        frontmatter = executor.submit(section, generate_frontmatter)
+        summary_and_learnings = executor.submit(section, generate_summary_learnings)
+        key_sentences = executor.submit(section, generate_key_sentences)
+        unity_of_the_book = executor.submit(section, generate_unity_of_the_book)
+        author_problems = executor.submit(section, generate_author_problems)
+        book_structure = executor.submit(section, generate_book_structure)
+        prompt_ideas = executor.submit(section, generate_prompt_ideas)
 
-    highlights = get_highlights_content(filename)
+        article = ""
 
-    article = ""
+        article += frontmatter.result()
+        article += "\n"
 
-    frontmatter = generate_frontmatter(highlights)
-    article += frontmatter
-    article += "\n"
+        article += summary_and_learnings.result()
+        article += "\n"
 
-    summary_and_learnings = generate_summary_learnings(highlights)
-    article += summary_and_learnings
-    article += "\n"
+        article += "## [How to Read a Book](/how-to-read-a-book) Analysis"
+        article += "\n"
 
-    article += "## [How to Read a Book](/how-to-read-a-book) Analysis"
-    article += "\n"
+        article += "### Key Sentences"
+        article += key_sentences.result()
+        article += "\n"
 
-    article += "### Key Sentences"
-    key_sentences = generate_key_sentences(highlights)
-    article += key_sentences
-    article += "\n"
+        article += "### Unity of the Book"
+        article += unity_of_the_book.result()
+        article += "\n"
 
-    article += "### Unity of the Book"
-    unity_of_the_book = generate_unity_of_the_book(highlights)
-    article += unity_of_the_book
-    article += "\n"
+        article += "### Author's Problems"
+        article += author_problems.result()
+        article += "\n"
 
-    article += "### Author's Problems"
-    author_problems = generate_author_problems(highlights)
-    article += author_problems
-    article += "\n"
+        article += "### Book's Structure"
+        article += book_structure.result()
+        article += "\n"
 
-    article += "### Book's Structure"
-    book_structure = generate_book_structure(highlights)
-    article += book_structure
-    article += "\n"
+        article += "## Prompt Ideas"
+        article += prompt_ideas.result()
 
-    article += "## Prompt Ideas"
-    prompt_ideas = generate_prompt_ideas(highlights)
-    article += prompt_ideas
+    return article
 
-    print(article)
+
+def load_manifest() -> dict:
+    """Highlight-file hashes of the reviews generated so far, keyed by file name."""
+    try:
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_manifest(manifest: dict) -> None:
+    MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = MANIFEST_PATH.with_suffix(".json.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    tmp_path.replace(MANIFEST_PATH)
+
+def review_all_books(book_workers: int = 3, max_requests: int = 8, force: bool = False) -> dict:
+    """Write a review to `ignore/reviews/` for every highlights file that changed.
+
+    A book is skipped when its highlights file hashes to the same value as
+    when its review was last written (and the review still exists). Up to
+    `book_workers` books are processed at once, and all of them share a cap
+    of `max_requests` in-flight GPT requests. Returns counts per outcome.
+    """
+    manifest = load_manifest()
+    manifest_lock = threading.Lock()
+    limiter = threading.BoundedSemaphore(max_requests)
+    REVIEWS_DIR.mkdir(parents=True, exist_ok=True)
+
+    pending = []
+    skipped = 0
+    for highlights_path in sorted(HIGHLIGHTS_DIR.glob("*.md")):
+        digest = hashlib.sha256(highlights_path.read_bytes()).hexdigest()
+        review_path = REVIEWS_DIR / highlights_path.name
+        entry = manifest.get(highlights_path.name, {})
+        if not force and entry.get("sha256") == digest and review_path.exists():
+            skipped += 1
+            continue
+        pending.append((highlights_path, review_path, digest))
+
+    print(f"{len(pending)} books to review, {skipped} unchanged.")
+
+    def review_book(highlights_path: Path, review_path: Path, digest: str) -> None:
+        highlights = highlights_path.read_text(encoding='utf-8')
+        article = generate_review(highlights, limiter=limiter)
+        review_path.write_text(article, encoding='utf-8')
+        # Recorded per book, so an interrupted batch resumes where it stopped
+        with manifest_lock:
+            manifest[highlights_path.name] = {
+                "sha256": digest,
+                "review": str(review_path),
+                "generated_at": datetime.now().isoformat(timespec="seconds"),
+            }
+            save_manifest(manifest)
+
+    done = 0
+    failed = 0
+    with ThreadPoolExecutor(max_workers=book_workers) as executor:
+        futures = {executor.submit(review_book, *job): job[0].name for job in pending}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                future.result()
+                done += 1
+                print(f"✓ [{done + failed}/{len(pending)}] {name}")
+            except Exception as e:
+                failed += 1
+                print(f"✗ [{done + failed}/{len(pending)}] {name}: {e}")
+
+    return {"reviewed": done, "skipped": skipped, "failed": failed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate book reviews from highlights in ignore/highlights/')
+    parser.add_argument('--batch', action='store_true', help='Review every changed highlights file')
+    parser.add_argument('--workers', type=int, default=3, help='Books processed at once in batch mode')
+    parser.add_argument('--max-requests', type=int, default=8, help='In-flight GPT requests across all books')
+    parser.add_argument('--force', action='store_true', help='Regenerate reviews even if the highlights are unchanged')
+    args = parser.parse_args()
+
+    if args.batch:
+        results = review_all_books(book_workers=args.workers, max_requests=args.max_requests, force=args.force)
+        print(f"Reviewed {results['reviewed']}, skipped {results['skipped']} unchanged, {results['failed']} failed.")
+        cache.print_stats()
+    else:
+        filename = input("Enter the filename: ")
+
+        highlights = get_highlights_content(filename)
+
+        article = generate_review(highlights)
+
+        print(article)
+        cache.print_stats()
@@ -0,0 +1,174 @@
+"""Append-only checkpoints for long paginated crawls.
+
+Each fetched record is appended to a JSONL file as its own line, through one
+handle kept open for the crawl, and every finished page is sealed with a
+marker line holding the page's cursors, record count and a SHA-256 of its
+record lines. Sealing a page flushes the file. If a crawl dies, the next run
+replays the sealed pages from disk and continues from the last good cursor; a
+torn or corrupted page is dropped and simply fetched again.
+"""
+
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+CHECKPOINT_DIR = Path.cwd() / "caches" / "checkpoints"
+# Records in an old checkpoint may have changed since, so stale ones are not resumed
+MAX_AGE_HOURS = 24
+
+
+class CrawlCheckpoint:
+    def __init__(
+        self,
+        name: str,
+        params: Dict[str, Any] = None,
+        directory: Path = None,
+        max_age_hours: float = MAX_AGE_HOURS,
+    ):
+        # Cursors are only valid for the query they came from, so the params are part of the key
+        key = hashlib.sha256(json.dumps(params or {}, sort_keys=True).encode()).hexdigest()[:12]
+        self.path = Path(directory or CHECKPOINT_DIR) / f"{name}-{key}.jsonl"
+        self.max_age_hours = max_age_hours
+        self.resume_cursor = None
+        self.finished = False
+        self.pages = 0
+        self.records = 0
+        self.expected_count = None
+        self._page_hash = hashlib.sha256()
+        self._page_records = 0
+        self._ids = set()
+        self._duplicates = 0
+        self._file = None
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def iter_pages(self) -> Iterator[Tuple[Optional[str], List[Any], Optional[str]]]:
+        """Replay `(cursor, records, next_cursor)` for every sealed page on disk.
+
+        Afterwards `resume_cursor` is where the crawl should continue and
+        `finished` tells whether the last sealed page was the final one.
+        Anything after the last intact page is truncated away.
+        """
+        if not self.path.exists():
+            return
+        if time.time() - self.path.stat().st_mtime > self.max_age_hours * 3600:
+            print(f"Checkpoint {self.path.name} is older than {self.max_age_hours}h, starting over")
+            self.complete()
+            return
+
+        good_size = 0
+        records = []
+        page_hash = hashlib.sha256()
+        with open(self.path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # torn write from a crash
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+
+                if "record" in entry:
+                    page_hash.update(line)
+                    records.append(entry["record"])
+                    continue
+
+                page = entry.get("page")
+                if not page or page.get("count") != len(records) or page.get("sha256") != page_hash.hexdigest():
+                    print(
+                        f"Checkpoint {self.path.name}: page {self.pages + 1} failed its integrity check, "
+                        "refetching from there"
+                    )
+                    break
+
+                good_size = f.tell()
+                self.pages += 1
+                self.resume_cursor = page.get("next")
+                self.finished = not page.get("next")
+                if page.get("expected_count") is not None:
+                    self.expected_count = page["expected_count"]
+                for record in records:
+                    self._track(record)
+                yield page.get("cursor"), records, page.get("next")
+
+                records = []
+                page_hash = hashlib.sha256()
+
+        with open(self.path, "r+b") as f:
+            f.truncate(good_size)
+
+        if self.pages:
+            print(
+                f"Resuming from checkpoint {self.path.name}: "
+                f"{self.pages} pages, {self.records} records already fetched"
+            )
+
+    def _track(self, record: Any) -> None:
+        self.records += 1
+        record_id = record.get("id", record.get("user_book_id")) if isinstance(record, dict) else None
+        if record_id is not None:
+            if record_id in self._ids:
+                self._duplicates += 1
+            self._ids.add(record_id)
+
+    def add_record(self, record: Any) -> None:
+        line = (json.dumps({"record": record}) + "\n").encode()
+        self._append(line)
+        self._page_hash.update(line)
+        self._page_records += 1
+        self._track(record)
+
+    def end_page(self, cursor: Optional[str], next_cursor: Optional[str]) -> None:
+        """Seal the records added since the previous page."""
+        page = {
+            "cursor": cursor,
+            "next": next_cursor,
+            "count": self._page_records,
+            "sha256": self._page_hash.hexdigest(),
+            "expected_count": self.expected_count,
+        }
+        self._append((json.dumps({"page": page}) + "\n").encode())
+        # A sealed page has to survive a crash; records of an unsealed one don't
+        self._file.flush()
+        self.pages += 1
+        self.resume_cursor = next_cursor
+        self.finished = not next_cursor
+        self._page_hash = hashlib.sha256()
+        self._page_records = 0
+
+    def add_page(self, cursor: Optional[str], records: List[Any], next_cursor: Optional[str]) -> None:
+        for record in records:
+            self.add_record(record)
+        self.end_page(cursor, next_cursor)
+
+    def _append(self, line: bytes) -> None:
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "ab")
+        self._file.write(line)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def verify(self) -> List[str]:
+        """Check the finished crawl. Returns a list of problems (empty if it looks complete)."""
+        problems = []
+        if not self.finished:
+            problems.append("the crawl did not reach the last page")
+        if self.expected_count is not None and self.expected_count != self.records:
+            problems.append(f"the API reported {self.expected_count} records but {self.records} were fetched")
+        if self._duplicates:
+            problems.append(f"{self._duplicates} records were fetched more than once")
+        for problem in problems:
+            print(f"Checkpoint {self.path.name}: warning: {problem}")
+        return problems
+
+    def complete(self) -> None:
+        """Remove the checkpoint once its records are safely stored elsewhere."""
+        self.close()
+        self.path.unlink(missing_ok=True)
@@ -0,0 +1,218 @@
+"""Concurrent commit analysis with bounded Anthropic usage.
+
+`analyze_commits` runs `analyze_commit` for many commits on a thread pool.
+At most `max_in_flight` Anthropic requests are open at once, and a token
+bucket keeps the estimated input + output tokens under `tokens_per_minute`,
+so a big month doesn't trip the account's rate limits. Overloaded and
+rate-limited responses are retried with a growing delay. Results come back
+in the order of the input commits, and `on_result` lets the caller store
+each one as soon as it's ready.
+
+Small commits (by lines changed) are summarized `batch_size` at a time with
+one JSON-returning prompt; large ones, and any commit a batch response
+leaves out, get their own call, with the per-file stats GraphQL doesn't
+return fetched over REST first.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, Optional, Sequence
+
+import anthropic
+
+from src.github.commits import add_file_stats
+from src.github.helpers import (
+    BATCH_SUMMARY_MAX_TOKENS,
+    BATCH_SUMMARY_TOKENS_PER_COMMIT,
+    COMMIT_SUMMARY_MAX_TOKENS,
+    analyze_commit,
+    analyze_commit_batch,
+    build_batch_prompt,
+    build_commit_prompt,
+    commit_info_from_rest,
+)
+from src.prompt_packing import estimate_tokens
+
+MAX_WORKERS = int(os.getenv("COMMIT_ANALYSIS_WORKERS", "8"))
+MAX_IN_FLIGHT = int(os.getenv("ANTHROPIC_MAX_IN_FLIGHT", "4"))
+TOKENS_PER_MINUTE = int(os.getenv("ANTHROPIC_TOKENS_PER_MINUTE", "80000"))
+MAX_RETRIES = 5
+RETRY_DELAY = 10  # seconds, multiplied by the attempt number
+RETRY_STATUSES = {429, 529}
+BATCH_SIZE = int(os.getenv("COMMIT_BATCH_SIZE", "10"))
+# Commits changing more lines than this always get a prompt of their own
+SMALL_COMMIT_LINES = int(os.getenv("COMMIT_BATCH_MAX_LINES", "200"))
+
+
+class TokenBudget:
+    """Token bucket over estimated tokens per minute, shared by all workers."""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = tokens_per_minute
+        self._tokens = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def acquire(self, tokens: int) -> None:
+        """Block until `tokens` fit in the budget (a request bigger than a minute's worth waits for a full bucket)."""
+        if not self.capacity:
+            return
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.capacity / 60)
+                self._last_refill = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) * 60 / self.capacity
+                self.waited_seconds += wait
+            time.sleep(wait)
+
+
+def commit_size(commit_info: dict) -> Optional[int]:
+    """Lines added + deleted, or None if unknown."""
+    stats = commit_info.get('stats')
+    if stats and stats.get('additions') is not None:
+        return stats['additions'] + (stats.get('deletions') or 0)
+    if 'files' in commit_info:
+        return sum(file['changes'] for file in commit_info['files'])
+    return None
+
+
+def plan_batches(
+    commit_infos: Sequence[dict],
+    batch_size: int = BATCH_SIZE,
+    small_lines: int = SMALL_COMMIT_LINES,
+) -> List[List[int]]:
+    """Group commit indices into work units: runs of small commits, and large commits alone."""
+    units: List[List[int]] = []
+    batch: List[int] = []
+    for i, commit_info in enumerate(commit_infos):
+        size = commit_size(commit_info)
+        if batch_size > 1 and size is not None and size <= small_lines:
+            batch.append(i)
+            if len(batch) == batch_size:
+                units.append(batch)
+                batch = []
+        else:
+            units.append([i])
+    if batch:
+        units.append(batch)
+    return units
+
+
+def is_retryable(error: Exception) -> bool:
+    return getattr(error, "status_code", None) in RETRY_STATUSES or "overloaded_error" in str(error)
+
+
+def analyze_commits(
+    client: anthropic.Client,
+    commits: Sequence,
+    repo_url: str,
+    max_workers: int = MAX_WORKERS,
+    max_in_flight: int = MAX_IN_FLIGHT,
+    tokens_per_minute: int = TOKENS_PER_MINUTE,
+    batch_size: int = BATCH_SIZE,
+    on_result: Callable[[dict], None] = None,
+) -> List[Optional[dict]]:
+    """Analyze `commits` (commit_info dicts or PyGithub commits) concurrently.
+
+    Returns one result per commit, in input order, with None for commits
+    that failed. `batch_size=1` gives every commit its own prompt.
+    `on_result(result)` is called from the calling thread as each analysis
+    finishes, in completion order.
+    """
+    in_flight = threading.BoundedSemaphore(max_in_flight)
+    budget = TokenBudget(tokens_per_minute)
+
+    def call(prompt: str, max_tokens: int, request: Callable, label: str):
+        tokens = estimate_tokens(prompt) + max_tokens
+        for attempt in range(MAX_RETRIES + 1):
+            budget.acquire(tokens)
+            try:
+                with in_flight:
+                    return request()
+            except Exception as e:
+                if not is_retryable(e) or attempt == MAX_RETRIES:
+                    raise
+                delay = RETRY_DELAY * (attempt + 1)
+                print(f"Anthropic API overloaded. Retrying {label} in {delay} seconds... "
+                      f"(Attempt {attempt + 1}/{MAX_RETRIES})")
+                time.sleep(delay)
+
+    def analyze_one(commit_info: dict) -> dict:
+        commit_info = add_file_stats(commit_info, repo_url)
+        return call(
+            build_commit_prompt(commit_info),
+            COMMIT_SUMMARY_MAX_TOKENS,
+            lambda: analyze_commit(client, commit_info, repo_url),
+            commit_info['sha'][:7],
+        )
+
+    def analyze_unit(unit: List[int]) -> List[tuple]:
+        infos = [commit_infos[i] for i in unit]
+        if len(infos) == 1:
+            return [(unit[0], analyze_one(infos[0]))]
+
+        try:
+            batch_results = call(
+                build_batch_prompt(infos),
+                min(BATCH_SUMMARY_TOKENS_PER_COMMIT * len(infos), BATCH_SUMMARY_MAX_TOKENS),
+                lambda: analyze_commit_batch(client, infos, repo_url),
+                f"a batch of {len(infos)}",
+            )
+        except Exception as e:
+            # Don't lose the whole batch to one failed call; a bad commit then only fails itself
+            print(f"Batch of {len(infos)} commits failed ({e}), summarizing them one by one")
+            batch_results = [None] * len(infos)
+        else:
+            missing = [i for i, result in zip(unit, batch_results) if result is None]
+            if missing:
+                print(f"Batch response skipped {len(missing)} of {len(infos)} commits, summarizing them one by one")
+
+        unit_results = []
+        for i, result in zip(unit, batch_results):
+            if result is None:
+                try:
+                    result = analyze_one(commit_infos[i])
+                except Exception as e:
+                    print(f"Error analyzing commit {commit_infos[i]['sha'][:7]}: {e}")
+            unit_results.append((i, result))
+        return unit_results
+
+    # REST commits need their file list (one request each) before they can be sized
+    commit_infos = [
+        commit if isinstance(commit, dict) else commit_info_from_rest(commit, repo_url) for commit in commits
+    ]
+    units = plan_batches(commit_infos, batch_size=batch_size)
+    print(f"Summarizing {len(commit_infos)} commits in {len(units)} requests")
+
+    results: List[Optional[dict]] = [None] * len(commits)
+    done = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(analyze_unit, unit): unit for unit in units}
+        for future in as_completed(futures):
+            unit = futures[future]
+            try:
+                unit_results = future.result()
+            except Exception as e:
+                shas = ", ".join(commit_infos[i]['sha'][:7] for i in unit)
+                print(f"Error analyzing commit {shas}: {e}")
+                continue
+            for i, result in unit_results:
+                if result is None:
+                    continue
+                done += 1
+                results[i] = result
+                print(f"Analyzed commit {done}/{len(commits)} ({result['sha'][:7]})")
+                if on_result:
+                    on_result(result)
+
+    if budget.waited_seconds:
+        print(f"Waited {budget.waited_seconds:.0f}s in total for the tokens-per-minute budget")
+    return results
@@ -0,0 +1,86 @@
+"""Shared GitHub client for the repo summary scripts.
+
+One `Github` instance (and so one pooled HTTP session) is reused for every
+call. PyGithub records `X-RateLimit-Remaining` / `X-RateLimit-Reset` from
+each response, so the remaining quota is checked locally instead of asking
+`/rate_limit` before every commit; we only sleep once the headers say the
+quota is spent.
+"""
+
+import datetime
+import os
+import threading
+import time
+from typing import Tuple
+
+from dotenv import load_dotenv
+from github import Auth, Github
+
+load_dotenv()
+
+GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
+PER_PAGE = 100  # Max page size for commit listings
+POOL_SIZE = int(os.getenv("GITHUB_POOL_SIZE", "10"))
+# Requests to keep in reserve before pausing for the reset
+MIN_REMAINING = int(os.getenv("GITHUB_MIN_REMAINING", "0"))
+
+_github = None
+_github_lock = threading.Lock()
+_wait_lock = threading.Lock()
+
+
+def get_github() -> Github:
+    """Return the shared GitHub client, creating it on first use."""
+    global _github
+    with _github_lock:
+        if _github is None:
+            auth = Auth.Token(GITHUB_TOKEN) if GITHUB_TOKEN else None
+            _github = Github(auth=auth, per_page=PER_PAGE, pool_size=POOL_SIZE)
+        return _github
+
+
+def parse_repo_url(repo_url: str) -> Tuple[str, str]:
+    """'https://github.com/owner/repo' -> ('owner', 'repo')."""
+    _, _, _, owner, repo_name = repo_url.rstrip('/').split('/')
+    return owner, repo_name
+
+
+def remaining_quota(g: Github = None) -> Tuple[int, int]:
+    """`(remaining, limit)` as of the last response; no request once one has been made."""
+    return (g or get_github()).rate_limiting
+
+
+def handle_rate_limit(g: Github = None):
+    """Wait for the GitHub rate limit to reset if the last response said we're out of requests."""
+    g = g or get_github()
+    # Threads that hit the limit together wait once, then see the fresh quota
+    with _wait_lock:
+        remaining, _ = g.rate_limiting
+        if remaining > MIN_REMAINING:
+            return
+
+        reset_timestamp = g.rate_limiting_resettime
+        sleep_time = reset_timestamp - time.time() + 1  # Add 1 second buffer
+        if sleep_time > 0:
+            reset_time = datetime.datetime.fromtimestamp(reset_timestamp).strftime('%H:%M:%S')
+            print(f"\nGitHub API rate limit reached!")
+            print(f"Waiting for {sleep_time:.2f} seconds (until {reset_time})...")
+
+            # Print a progress dot every 30 seconds
+            dots_to_print = int(sleep_time / 30)
+            for _ in range(dots_to_print):
+                time.sleep(30)
+                print(".", end="", flush=True)
+
+            time_remaining = sleep_time % 30
+            if time_remaining > 0:
+                time.sleep(time_remaining)
+
+            print("\nRate limit reset, resuming operations...")
+            # Refresh the local numbers so the next check doesn't sleep again
+            g.get_rate_limit()
+
+
+def print_quota(g: Github = None) -> None:
+    remaining, limit = remaining_quota(g)
+    print(f"GitHub API calls remaining: {remaining}/{limit}")
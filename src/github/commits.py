@@ -0,0 +1,146 @@
+"""Bulk commit listing over the GitHub GraphQL API.
+
+Listing commits over REST and then reading `commit.files` costs one extra
+request per commit. The GraphQL commit history returns message, author,
+date and change stats for up to 100 commits per request, already in the
+`commit_info` shape `analyze_commit` sends to the model. GraphQL has no
+per-file breakdown, so each commit carries its aggregate `stats` (lines
+added/deleted, files changed) instead of a `files` list; `add_file_stats`
+fetches the list over REST for the commits that get a prompt of their own.
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from github import GithubException, RateLimitExceededException
+
+from src.github.client import get_github, handle_rate_limit, parse_repo_url
+from src.github.helpers import commit_info_from_rest
+
+PAGE_SIZE = 100  # GraphQL connection maximum
+
+HISTORY_QUERY = """
+query($owner: String!, $name: String!, $since: GitTimestamp, $until: GitTimestamp, $first: Int!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    defaultBranchRef {
+      target {
+        ... on Commit {
+          history(first: $first, since: $since, until: $until, after: $cursor) {
+            totalCount
+            pageInfo { hasNextPage endCursor }
+            nodes {
+              oid
+              message
+              additions
+              deletions
+              changedFilesIfAvailable
+              author { name email date }
+            }
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[str]:
+    if value is None:
+        return None
+    value = value.replace(microsecond=0)
+    return value.isoformat() if value.tzinfo else value.isoformat() + "Z"
+
+
+def _commit_info(node: Dict[str, Any], owner: str, repo_name: str) -> Dict[str, Any]:
+    author = node.get("author") or {}
+    date = None
+    if author.get("date"):
+        # GitTimestamp keeps the author's offset; REST dates are UTC, and the
+        # summary store buckets by `date[:10]`, so convert before storing
+        date = datetime.fromisoformat(author["date"].replace("Z", "+00:00")).astimezone(timezone.utc).isoformat()
+    return {
+        'sha': node["oid"],
+        'message': node["message"],
+        'author': {
+            'name': author.get("name"),
+            'email': author.get("email"),
+        },
+        'date': date,
+        'url': f"https://github.com/{owner}/{repo_name}/commit/{node['oid']}",
+        'stats': {
+            'additions': node.get("additions"),
+            'deletions': node.get("deletions"),
+            'changed_files': node.get("changedFilesIfAvailable"),
+        },
+    }
+
+
+def iter_commit_infos(
+    repo_url: str,
+    since: datetime = None,
+    until: datetime = None,
+    page_size: int = PAGE_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    """Yield `commit_info` dicts for the default branch, newest first, one GraphQL page at a time."""
+    owner, repo_name = parse_repo_url(repo_url)
+    g = get_github()
+    variables = {
+        "owner": owner,
+        "name": repo_name,
+        "since": _timestamp(since),
+        "until": _timestamp(until),
+        "first": page_size,
+        "cursor": None,
+    }
+
+    while True:
+        try:
+            _, data = g.requester.graphql_query(HISTORY_QUERY, variables)
+        except RateLimitExceededException:
+            handle_rate_limit(g)
+            continue
+
+        target = ((data["data"]["repository"] or {}).get("defaultBranchRef") or {}).get("target") or {}
+        history = target.get("history")
+        if not history:
+            return
+        if variables["cursor"] is None:
+            print(f"Total commits to fetch: {history['totalCount']}")
+
+        for node in history["nodes"]:
+            yield _commit_info(node, owner, repo_name)
+
+        if not history["pageInfo"]["hasNextPage"]:
+            return
+        variables["cursor"] = history["pageInfo"]["endCursor"]
+
+
+def add_file_stats(commit_info: Dict[str, Any], repo_url: str) -> Dict[str, Any]:
+    """`commit_info` plus its per-file `files` list, fetched with one REST request.
+
+    Falls back to the aggregate `stats` alone if the request fails.
+    """
+    if 'files' in commit_info:
+        return commit_info
+    owner, repo_name = parse_repo_url(repo_url)
+    g = get_github()
+    while True:
+        try:
+            commit = g.get_repo(f"{owner}/{repo_name}", lazy=True).get_commit(commit_info['sha'])
+            break
+        except RateLimitExceededException:
+            handle_rate_limit(g)
+        except GithubException as e:
+            print(f"Couldn't fetch the file list of {commit_info['sha'][:7]}: {e}")
+            return commit_info
+    return dict(commit_info, files=commit_info_from_rest(commit, repo_url)['files'])
+
+
+def fetch_commit_infos(repo_url: str, since: datetime = None, until: datetime = None) -> List[Dict[str, Any]]:
+    commits = []
+    for i, commit_info in enumerate(iter_commit_infos(repo_url, since=since, until=until), 1):
+        if i % PAGE_SIZE == 0:
+            print(f"Fetched {i} commits so far...")
+        commits.append(commit_info)
+    return commits
@@ -1,39 +1,19 @@
-from typing import Dict
+from typing import Dict, List, Optional
 import anthropic
-import os
 from pathlib import Path
 import json
+import re
 import datetime
-import time
-from github import Github
+from github import RateLimitExceededException
 
-def handle_rate_limit(g: Github):
-    """Handle GitHub API rate limit by waiting if necessary."""
-    rate_limit = g.get_rate_limit()
-    remaining = rate_limit.core.remaining
-
-    print(f"Current API calls remaining: {remaining}")
-
-    if remaining == 0:
-        reset_timestamp = rate_limit.core.reset.timestamp()
-        sleep_time = reset_timestamp - time.time() + 1  # Add 1 second buffer
-        if sleep_time > 0:
-            reset_time = datetime.fromtimestamp(reset_timestamp).strftime('%H:%M:%S')
-            print(f"\nGitHub API rate limit reached!")
-            print(f"Waiting for {sleep_time:.2f} seconds (until {reset_time})...")
-
-            # Print a progress dot every 30 seconds
-            dots_to_print = int(sleep_time / 30)
-            for _ in range(dots_to_print):
-                time.sleep(30)
-                print(".", end="", flush=True)
-
-            time_remaining = sleep_time % 30
-            if time_remaining > 0:
-                time.sleep(time_remaining)
-
-            print("\nRate limit reset, resuming operations...")
+from src.github.client import handle_rate_limit, parse_repo_url
+from src.llm_cache import anthropic_text
 
+COMMIT_SUMMARY_MODEL = "claude-3-5-sonnet-latest"
+COMMIT_SUMMARY_MAX_TOKENS = 1000
+# Output budget per commit in a batched prompt, and the overall ceiling
+BATCH_SUMMARY_TOKENS_PER_COMMIT = 300
+BATCH_SUMMARY_MAX_TOKENS = 4096
 
 def ensure_cache_directory() -> Path:
     """Ensure the cache directory exists and return its path."""
@@ -43,18 +23,14 @@ def ensure_cache_directory() -> Path:
     return cache_dir
 
 
-def analyze_commit(client: anthropic.Client, commit, repo_url: str) -> dict:
-    """Analyze a single commit using Claude."""
+def commit_info_from_rest(commit, repo_url: str) -> dict:
+    """Build `commit_info` from a PyGithub commit (reading `commit.files` costs one request)."""
     # Extract owner and repo name from URL for commit link
-    _, _, _, owner, repo_name = repo_url.rstrip('/').split('/')
+    owner, repo_name = parse_repo_url(repo_url)
     commit_url = f"https://github.com/{owner}/{repo_name}/commit/{commit.sha}"
 
-    # Initialize GitHub client for getting commit details
-    g = Github(os.getenv('GITHUB_TOKEN'))
-    handle_rate_limit(g)
-
     try:
-        commit_info = {
+        return {
             'sha': commit.sha,
             'message': commit.commit.message,
             'author': {
@@ -73,14 +49,14 @@ def analyze_commit(client: anthropic.Client, commit, repo_url: str) -> dict:
                 for file in commit.files
             ]
         }
-    except Exception as e:
-        if "rate limit" in str(e).lower():
-            handle_rate_limit(g)
-            # Retry after handling rate limit
-            return analyze_commit(client, commit, repo_url)
-        raise e
+    except RateLimitExceededException:
+        # Wait out the reset and retry
+        handle_rate_limit()
+        return commit_info_from_rest(commit, repo_url)
 
-    prompt = f"""
+
+def build_commit_prompt(commit_info: dict) -> str:
+    return f"""
     Analyze this GitHub commit and provide a concise summary of the changes.
     Focus on what was changed and why. Be specific but brief.
 
@@ -88,31 +64,109 @@ def analyze_commit(client: anthropic.Client, commit, repo_url: str) -> dict:
     {json.dumps(commit_info, indent=2)}
     """
 
-    message = client.messages.create(
-        model="claude-3-5-sonnet-latest",
-        max_tokens=1000,
+
+def analyze_commit(client: anthropic.Client, commit, repo_url: str) -> dict:
+    """Analyze a single commit using Claude.
+
+    `commit` is either a `commit_info` dict (from `src.github.commits`) or a
+    PyGithub commit object.
+    """
+    commit_info = commit if isinstance(commit, dict) else commit_info_from_rest(commit, repo_url)
+
+    summary = anthropic_text(
+        client,
+        model=COMMIT_SUMMARY_MODEL,
+        max_tokens=COMMIT_SUMMARY_MAX_TOKENS,
         temperature=0,
         messages=[
-            {"role": "user", "content": prompt}
+            {"role": "user", "content": build_commit_prompt(commit_info)}
         ]
     )
 
     return {
-        "summary": message.content[0].text,
-        "url": commit_url,
+        "summary": summary,
+        "url": commit_info['url'],
         "date": commit_info['date'],
         "author": commit_info['author'],
-        "sha": commit.sha
+        "sha": commit_info['sha']
     }
 
 
-def generate_master_summary(client: anthropic.Client, summaries: Dict[str, dict], start_date: datetime, repo_url: str) -> str:
+def build_batch_prompt(commit_infos: List[dict]) -> str:
+    return f"""
+    Analyze each of these {len(commit_infos)} GitHub commits and provide a concise summary of its changes.
+    Focus on what was changed and why. Be specific but brief. Summarize every commit separately.
+
+    Respond with only a JSON array, one object per commit, in this form:
+    [{{"sha": "<full commit sha>", "summary": "<summary>"}}]
+
+    Commits:
+    {json.dumps(commit_infos, indent=2)}
+    """
+
+
+def parse_batch_summaries(text: str) -> Dict[str, str]:
+    """Map sha -> summary from a batched response, tolerating a code fence or text around the array."""
+    text = re.sub(r"```[a-zA-Z]*", "", text)
+    decoder = json.JSONDecoder()
+    items = []
+    # Prose before the array may contain brackets of its own, so try each one
+    for match in re.finditer(r"\[", text):
+        try:
+            candidate, _ = decoder.raw_decode(text, match.start())
+        except ValueError:
+            continue
+        if isinstance(candidate, list) and any(isinstance(item, dict) for item in candidate):
+            items = candidate
+            break
+    return {
+        item["sha"]: item["summary"]
+        for item in items
+        if isinstance(item, dict) and isinstance(item.get("sha"), str) and item.get("summary")
+    }
+
+
+def analyze_commit_batch(client: anthropic.Client, commit_infos: List[dict], repo_url: str) -> List[Optional[dict]]:
+    """Summarize several small commits with one Claude call.
+
+    Returns results aligned with `commit_infos`, in the same shape as
+    `analyze_commit`, with None for any commit the response left out.
+    """
+    response = anthropic_text(
+        client,
+        model=COMMIT_SUMMARY_MODEL,
+        max_tokens=min(BATCH_SUMMARY_TOKENS_PER_COMMIT * len(commit_infos), BATCH_SUMMARY_MAX_TOKENS),
+        temperature=0,
+        messages=[
+            {"role": "user", "content": build_batch_prompt(commit_infos)}
+        ]
+    )
+    summaries = parse_batch_summaries(response)
+
+    results = []
+    for commit_info in commit_infos:
+        # Models sometimes shorten the sha; accept a unique prefix
+        summary = summaries.get(commit_info['sha']) or next(
+            (text for sha, text in summaries.items() if len(sha) >= 7 and commit_info['sha'].startswith(sha)),
+            None,
+        )
+        results.append({
+            "summary": summary,
+            "url": commit_info['url'],
+            "date": commit_info['date'],
+            "author": commit_info['author'],
+            "sha": commit_info['sha']
+        } if summary else None)
+    return results
+
+
+def generate_master_summary(client: anthropic.Client, summaries: Dict[str, dict], start_date: datetime.datetime, repo_url: str) -> str:
     """Generate a master summary from individual commit summaries."""
     if not summaries:
         return "No commits found for the specified time period."
 
     # Extract owner and repo name from URL
-    _, _, _, owner, repo_name = repo_url.rstrip('/').split('/')
+    owner, repo_name = parse_repo_url(repo_url)
 
     # Prepare a more structured summary of commits for Claude
     formatted_summaries = []
@@ -146,7 +200,8 @@ def generate_master_summary(client: anthropic.Client, summaries: Dict[str, dict]
     - Implemented user authentication system (by John Doe - https://github.com/owner/repo/commit/abc123)
     """
 
-    message = client.messages.create(
+    return anthropic_text(
+        client,
         model="claude-3-5-sonnet-latest",
         max_tokens=1000,
         temperature=0,
@@ -154,5 +209,3 @@ def generate_master_summary(client: anthropic.Client, summaries: Dict[str, dict]
             {"role": "user", "content": prompt}
         ]
     )
-
-    return message.content[0].text
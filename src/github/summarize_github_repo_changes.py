@@ -1,60 +1,28 @@
 import os
 import anthropic
-from datetime import datetime, timedelta
-from github import Github
-import json
+from datetime import datetime
 from typing import List, Dict
-from pathlib import Path
-import time
 from dotenv import load_dotenv
 
-from src.github.helpers import ensure_cache_directory, generate_master_summary, handle_rate_limit
+from src.github import summary_store
+from src.github.analysis import analyze_commits
+from src.github.client import handle_rate_limit, parse_repo_url, print_quota
+from src.github.commits import fetch_commit_infos
+from src.github.helpers import ensure_cache_directory, generate_master_summary
 
 # Load environment variables from .env file
 load_dotenv()
 
-def get_existing_commits_for_month(summaries_file: Path, month_start: datetime, month_end: datetime) -> Dict[str, dict]:
+def get_existing_commits_for_month(conn, repo: str, month_start: datetime, month_end: datetime) -> Dict[str, dict]:
     """Get existing commit summaries for the specified month."""
-    if not summaries_file.exists():
-        return {}
-
-    try:
-        with open(summaries_file, 'r') as f:
-            all_summaries = json.load(f)
-
-        print(f"\nChecking {len(all_summaries)} total summaries for period: "
-              f"{month_start.strftime('%Y-%m-%d')} to {month_end.strftime('%Y-%m-%d')}")
-
-        # Filter summaries for the specified month
-        month_summaries = {}
-        for sha, summary in all_summaries.items():
-            try:
-                commit_date = summary.get('date')
-                if commit_date:
-                    # Print some debug info for the first few entries
-                    if len(month_summaries) < 3:
-                        print(f"Processing commit date: {commit_date}")
-
-                    # Handle both full ISO format and date-only format
-                    if 'T' in commit_date:
-                        commit_datetime = datetime.fromisoformat(commit_date.split('T')[0])
-                    else:
-                        commit_datetime = datetime.fromisoformat(commit_date)
-
-                    if month_start <= commit_datetime < month_end:
-                        month_summaries[sha] = summary
-            except (ValueError, AttributeError) as e:
-                print(f"Warning: Could not process date for commit {sha[:7]}: {e}")
-                continue
-
-        print(f"Found {len(month_summaries)} commits for the specified month")
-        return month_summaries
-    except Exception as e:
-        print(f"Error reading existing summaries: {e}")
-        return {}
-
-def get_month_commits(repo_url: str, date: datetime) -> tuple[List, str]:
-    """Get all commits for a specific month from a GitHub repository."""
+    month_summaries = summary_store.query_summaries(
+        conn, repo, start=month_start.strftime('%Y-%m-%d'), end=month_end.strftime('%Y-%m-%d')
+    )
+    print(f"Found {len(month_summaries)} commits for the specified month")
+    return month_summaries
+
+def get_month_commits(repo_url: str, date: datetime) -> tuple[List[dict], str]:
+    """Get `commit_info` dicts for all commits for a specific month from a GitHub repository."""
     # Calculate start and end of the month
     start_date = date.replace(day=1)
     if date.month == 12:
@@ -66,42 +34,22 @@ def get_month_commits(repo_url: str, date: datetime) -> tuple[List, str]:
     print(f"Date range: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
 
     # Extract owner and repo name from URL
-    _, _, _, owner, repo_name = repo_url.rstrip('/').split('/')
+    owner, repo_name = parse_repo_url(repo_url)
     print(f"Repository: {owner}/{repo_name}")
 
-    # Initialize GitHub client
-    print("Initializing GitHub client...")
-    g = Github(os.getenv('GITHUB_TOKEN'))
-
     try:
-        print("Accessing repository...")
-        repo = g.get_repo(f"{owner}/{repo_name}")
-
-        # Get commits for the specified month
+        # 100 commits per GraphQL request, with stats included
         print("Starting to fetch commits...")
-        commits = []
-        commit_pages = repo.get_commits(since=start_date, until=end_date)
-
-        # Get total count if available
-        try:
-            total_count = commit_pages.totalCount
-            print(f"Total commits to fetch: {total_count}")
-        except Exception:
-            print("Unable to get total commit count, proceeding anyway...")
-
-        for i, commit in enumerate(commit_pages, 1):
-            if i % 10 == 0:  # Print progress every 10 commits
-                print(f"Fetched {i} commits so far...")
-            handle_rate_limit(g)
-            commits.append(commit)
+        commits = fetch_commit_infos(repo_url, since=start_date, until=end_date)
 
         print(f"Successfully fetched {len(commits)} commits")
+        print_quota()
         return commits, repo_name
 
     except Exception as e:
         if "rate limit" in str(e).lower():
             print("Hit rate limit, waiting to reset...")
-            handle_rate_limit(g)
+            handle_rate_limit()
             # Retry after handling rate limit
             return get_month_commits(repo_url, date)
         print(f"Error during commit fetching: {str(e)}")
@@ -128,6 +76,8 @@ if __name__ == "__main__":
         print("Invalid date format. Please use YYYY-MM-DD")
         exit(1)
 
+    # One store connection for the whole run; summaries are saved from this thread
+    conn = summary_store.connect()
     try:
         # Calculate month range
         month_start = analysis_date.replace(day=1)
@@ -138,11 +88,11 @@ if __name__ == "__main__":
 
         # Create output file paths
         cache_dir = ensure_cache_directory()
-        summaries_file = cache_dir / f"django_commit_summaries.json"  # Using explicit name instead of repo_name
+        repo = "/".join(parse_repo_url(repo_url))
         master_file = cache_dir / f"django_{analysis_date.strftime('%Y_%m')}_master_summary.txt"
 
         # Check existing summaries first
-        existing_month_summaries = get_existing_commits_for_month(summaries_file, month_start, month_end)
+        existing_month_summaries = get_existing_commits_for_month(conn, repo, month_start, month_end)
         print(f"Found {len(existing_month_summaries)} existing summaries for {month_start.strftime('%B %Y')}")
 
         # Ask if user wants to fetch new commits
@@ -153,38 +103,21 @@ if __name__ == "__main__":
             commits, repo_name = get_month_commits(repo_url, analysis_date)
             print(f"Found {len(commits)} commits")
 
-            # Load all existing summaries
-            existing_summaries = {}
-            if summaries_file.exists():
-                with open(summaries_file, 'r') as f:
-                    existing_summaries = json.load(f)
-
             # Initialize Anthropic client
             client = anthropic.Client(api_key=os.getenv('ANTHROPIC_API_KEY'))
 
-            # Analyze new commits
-            summaries = existing_summaries.copy()
-            for i, commit in enumerate(commits, 1):
-                if commit.sha in summaries:
-                    print(f"Skipping commit {i}/{len(commits)} (already analyzed)")
-                    continue
-
-                print(f"Analyzing commit {i}/{len(commits)} ({commit.sha[:7]})")
-                try:
-                    result = analyze_commit(client, commit, repo_url)
-                    summaries[commit.sha] = result
-
-                    # Save after each successful analysis
-                    with open(summaries_file, 'w') as f:
-                        json.dump(summaries, f, indent=2)
-                    print(f"Saved summary to {summaries_file}")
+            # Analyze new commits concurrently, saving each summary as it arrives
+            analyzed = summary_store.existing_shas(conn, repo, (commit['sha'] for commit in commits))
+            pending = [commit for commit in commits if commit['sha'] not in analyzed]
+            print(f"Skipping {len(commits) - len(pending)} already analyzed commits, analyzing {len(pending)}")
 
-                except Exception as e:
-                    print(f"Error analyzing commit {commit.sha[:7]}: {str(e)}")
-                    continue
+            analyze_commits(
+                client, pending, repo_url, on_result=lambda result: summary_store.save_summary(conn, repo, result)
+            )
+            print(f"Saved summaries to {summary_store.DB_PATH}")
 
             # Update existing_month_summaries with new analyses
-            existing_month_summaries = get_existing_commits_for_month(summaries_file, month_start, month_end)
+            existing_month_summaries = get_existing_commits_for_month(conn, repo, month_start, month_end)
 
         # Generate master summary only if we have commits for the month
         if existing_month_summaries:
@@ -202,3 +135,5 @@ if __name__ == "__main__":
 
     except Exception as e:
         print(f"Error: {str(e)}")
+    finally:
+        conn.close()
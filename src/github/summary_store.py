@@ -0,0 +1,142 @@
+"""SQLite store for per-commit summaries.
+
+Summaries are keyed by repository ("owner/name") and commit sha, with an
+index on the commit day, so saving one summary is a single upsert and
+loading a month or a date range is an index range scan instead of reading
+and filtering one big JSON file. Scripts open one connection per run with
+`connect` and pass it to the helpers. The old
+`caches/django_commit_summaries.json` is imported once, the first time the
+store is opened.
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Set
+
+DB_PATH = Path.cwd() / "caches" / "github_summaries.sqlite3"
+LEGACY_JSON_PATH = Path.cwd() / "caches" / "django_commit_summaries.json"
+LEGACY_REPO = "django/django"
+
+# Databases whose schema and legacy import were already checked by this process
+_prepared: Set[Path] = set()
+_prepared_lock = threading.Lock()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS commit_summaries (
+    repo TEXT NOT NULL,
+    sha TEXT NOT NULL,
+    day TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (repo, sha)
+);
+CREATE INDEX IF NOT EXISTS idx_commit_summaries_repo_day ON commit_summaries (repo, day);
+
+CREATE TABLE IF NOT EXISTS migrations (
+    name TEXT PRIMARY KEY,
+    applied_at TEXT NOT NULL
+);
+"""
+
+
+def connect(db_path: Path = None) -> sqlite3.Connection:
+    """Open the store, creating the schema and importing the legacy JSON cache on first use."""
+    db_path = Path(db_path or DB_PATH)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    with _prepared_lock:
+        if db_path not in _prepared:
+            # WAL is persistent, so the pragma only needs setting once
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            migrate_json(conn, LEGACY_JSON_PATH, LEGACY_REPO)
+            _prepared.add(db_path)
+    return conn
+
+
+def _day(date: Optional[str]) -> Optional[str]:
+    """UTC commit day of an ISO timestamp (naive ones are already UTC)."""
+    if not date:
+        return None
+    try:
+        parsed = datetime.fromisoformat(date.replace("Z", "+00:00"))
+    except ValueError:
+        return date[:10]
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc)
+    return parsed.date().isoformat()
+
+
+def _row(repo: str, summary: dict) -> tuple:
+    return repo, summary["sha"], _day(summary.get("date")), json.dumps(summary)
+
+
+def migrate_json(conn: sqlite3.Connection, json_path: Path, repo: str) -> int:
+    """Import a `{sha: summary}` JSON file once. Returns the number of summaries imported."""
+    name = f"import:{Path(json_path).name}"
+    if conn.execute("SELECT 1 FROM migrations WHERE name = ?", (name,)).fetchone():
+        return 0
+    if not Path(json_path).exists():
+        return 0
+
+    with open(json_path, "r") as f:
+        summaries = json.load(f)
+    conn.executemany(
+        # Anything already in the store is newer than the JSON file
+        "INSERT OR IGNORE INTO commit_summaries (repo, sha, day, data) VALUES (?, ?, ?, ?)",
+        [_row(repo, dict(summary, sha=summary.get("sha") or sha)) for sha, summary in summaries.items()],
+    )
+    conn.execute("INSERT INTO migrations (name, applied_at) VALUES (?, datetime('now'))", (name,))
+    conn.commit()
+    print(f"Imported {len(summaries)} commit summaries from {json_path}")
+    return len(summaries)
+
+
+def save_summary(conn: sqlite3.Connection, repo: str, summary: dict) -> None:
+    conn.execute(
+        """
+        INSERT INTO commit_summaries (repo, sha, day, data) VALUES (?, ?, ?, ?)
+        ON CONFLICT(repo, sha) DO UPDATE SET day = excluded.day, data = excluded.data
+        """,
+        _row(repo, summary),
+    )
+    conn.commit()
+
+
+def existing_shas(conn: sqlite3.Connection, repo: str, shas: Iterable[str]) -> Set[str]:
+    """The subset of `shas` that already have a summary."""
+    shas = list(shas)
+    found: Set[str] = set()
+    # Stay under SQLite's bound-parameter limit
+    for start in range(0, len(shas), 500):
+        chunk = shas[start:start + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        rows = conn.execute(
+            f"SELECT sha FROM commit_summaries WHERE repo = ? AND sha IN ({placeholders})",
+            [repo] + chunk,
+        )
+        found.update(row["sha"] for row in rows)
+    return found
+
+
+def query_summaries(
+    conn: sqlite3.Connection,
+    repo: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+) -> Dict[str, dict]:
+    """Summaries for commits made on (UTC) days in `[start, end)` (ISO dates, either bound optional), oldest first."""
+    sql = "SELECT sha, data FROM commit_summaries WHERE repo = ?"
+    params = [repo]
+    if start:
+        sql += " AND day >= ?"
+        params.append(start)
+    if end:
+        sql += " AND day < ?"
+        params.append(end)
+    sql += " ORDER BY day, sha"
+    return {row["sha"]: json.loads(row["data"]) for row in conn.execute(sql, params)}
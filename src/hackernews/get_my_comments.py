@@ -1,51 +1,66 @@
 import requests
 import html
+import threading
 import time
 
+from src.pagination import iter_numbered_pages
+
 USERNAME = "rasulkireev"
 BASE_URL = "https://hn.algolia.com/api/v1/search"
 OUTPUT_FILE = f"{USERNAME}_comments.txt"
+REQUEST_INTERVAL = 0.5  # Minimum seconds between two requests, to be polite to the API
 
 def fetch_comments():
     """Fetches all comments for the specified user from the Algolia HN API."""
     all_comments = []
-    page = 0
-    total_pages = None
 
     print(f"Fetching comments for user: {USERNAME}")
 
     headers = {
         'User-Agent': 'My HN Comment Fetcher Script (Python/Requests)'
     }
-
-    while True:
+    session = requests.Session()
+    request_lock = threading.Lock()
+    last_request = 0.0
+
+    def wait_for_turn():
+        # Workers take turns, so requests start at least REQUEST_INTERVAL apart
+        nonlocal last_request
+        with request_lock:
+            wait = last_request + REQUEST_INTERVAL - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            last_request = time.monotonic()
+
+    def fetch_page(page):
+        wait_for_turn()
         params = {
             'tags': f'comment,author_{USERNAME}',
             'page': page
         }
-        try:
-            print(f"Fetching page {page}...", end="")
-            response = requests.get(BASE_URL, params=params, headers=headers, timeout=30)
-            response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
-            data = response.json()
-            print(f" Done ({len(data.get('hits', []))} hits).")
-
-            # --- Get total pages on the first request ---
-            if total_pages is None:
-                total_pages = data.get('nbPages', 0)
-                nb_hits = data.get('nbHits', 0)
-                if nb_hits == 0:
-                    print("No comments found for this user.")
-                    return []
+        response = session.get(BASE_URL, params=params, headers=headers, timeout=30)
+        response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
+        data = response.json()
+        hits = data.get('hits', [])
+        print(f"Fetched page {page} ({len(hits)} hits).")
+
+        # --- Get total pages on the first request ---
+        if page == 0:
+            nb_hits = data.get('nbHits', 0)
+            if nb_hits:
                 print(f"Total comments found: {nb_hits}")
-                print(f"Total pages to fetch: {total_pages}")
+                print(f"Total pages to fetch: {data.get('nbPages', 0)}")
 
-            # --- Extract comments from the current page ---
-            hits = data.get('hits', [])
+        return hits, data.get('nbPages', 0)
+
+    try:
+        # --- Pages after the first are fetched two at a time, still spaced REQUEST_INTERVAL apart ---
+        for hits in iter_numbered_pages(fetch_page, max_workers=2):
             if not hits:
                 print("No more hits found on this page or subsequent pages.")
                 break # Stop if no hits are returned
 
+            # --- Extract comments from the current page ---
             for hit in hits:
                 comment_text = hit.get('comment_text')
                 created_at = hit.get('created_at') # e.g., "2025-04-01T12:58:52Z"
@@ -57,24 +72,18 @@ def fetch_comments():
                     # Decode HTML entities (like &#x2F;) and unicode escapes
                     cleaned_text = html.unescape(comment_text)
                     all_comments.append((date_str, cleaned_text, object_id))
-
-            # --- Check if we've fetched all pages ---
-            page += 1
-            if page >= total_pages:
-                print("Fetched all pages.")
-                break
-
-            # --- Add a small delay to be polite to the API ---
-            time.sleep(0.5) # Sleep for 500 milliseconds
-
-        except requests.exceptions.RequestException as e:
-            print(f"\nError fetching page {page}: {e}")
-            print("Stopping.")
-            break
-        except Exception as e:
-            print(f"\nAn unexpected error occurred on page {page}: {e}")
-            print("Stopping.")
-            break # Stop on other unexpected errors
+        else:
+            print("Fetched all pages.")
+
+    except requests.exceptions.RequestException as e:
+        print(f"\nError fetching comments: {e}")
+        print("Stopping.")
+    except Exception as e:
+        print(f"\nAn unexpected error occurred: {e}")
+        print("Stopping.")
+
+    if not all_comments:
+        print("No comments found for this user.")
 
     return all_comments
 
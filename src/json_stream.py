@@ -0,0 +1,115 @@
+"""Incremental decoding of `{"...": ..., "results": [ ... ]}` style API pages.
+
+Only the standard library is used: the top-level object is walked by hand and
+each array element is decoded with `json.JSONDecoder.raw_decode` as soon as
+enough bytes have arrived, so a page never has to be held as one big dict.
+"""
+
+import codecs
+import json
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",:]}"
+
+
+class _Buffer:
+    """Text buffer over a byte-chunk iterator that drops consumed text on refill."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._decode = codecs.getincrementaldecoder("utf-8")().decode
+        self.text = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, min_size: int = 1) -> None:
+        """Read chunks until at least `min_size` unconsumed chars are buffered (or EOF)."""
+        pending = [self.text[self.pos:]]
+        size = len(pending[0])
+        while not self.eof and size < min_size:
+            try:
+                text = self._decode(next(self._chunks))
+            except StopIteration:
+                text = self._decode(b"", final=True)
+                self.eof = True
+            pending.append(text)
+            size += len(text)
+        self.text = "".join(pending)
+        self.pos = 0
+
+    def skip_whitespace(self) -> None:
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text) or self.eof:
+                return
+            self.fill()
+
+    def peek(self) -> str:
+        self.skip_whitespace()
+        if self.pos >= len(self.text):
+            raise ValueError("Unexpected end of JSON stream")
+        return self.text[self.pos]
+
+    def expect(self, *chars: str) -> str:
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f"Expected one of {chars!r} at JSON stream position {self.pos}, got {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value, reading more input as needed."""
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            else:
+                # A number cut off at a chunk boundary ("1." or "1.5e") decodes as its
+                # prefix, so only accept a value followed by a delimiter, or at EOF.
+                if self.eof or (end < len(self.text) and self.text[end] in _DELIMITERS):
+                    self.pos = end
+                    return value
+            # Double the buffer each retry so large values are re-parsed O(log n) times
+            self.fill(max(2 * (len(self.text) - self.pos), 65536))
+
+
+def iter_json_array(
+    chunks: Iterable[bytes],
+    key: str = "results",
+    meta: Optional[Dict[str, Any]] = None,
+) -> Iterator[Any]:
+    """Yield the items of the top-level `key` array of a streamed JSON object.
+
+    Every other top-level field (e.g. `nextPageCursor`) is stored in `meta` as
+    it is parsed; it is complete once the generator is exhausted.
+    """
+    buf = _Buffer(chunks)
+    buf.expect("{")
+    if buf.peek() == "}":
+        return
+
+    while True:
+        name = buf.value()
+        buf.expect(":")
+        if name == key and buf.peek() == "[":
+            buf.pos += 1
+            if buf.peek() == "]":
+                buf.pos += 1
+            else:
+                while True:
+                    yield buf.value()
+                    if buf.expect(",", "]") == "]":
+                        break
+        else:
+            value = buf.value()
+            if meta is not None:
+                meta[name] = value
+
+        if buf.expect(",", "}") == "}":
+            return
@@ -0,0 +1,202 @@
+"""Content-addressed cache for LLM responses.
+
+Every Anthropic, OpenAI and Gemini call in the repo goes through one of the
+`*_text` helpers below. The response text is stored in a local SQLite file
+keyed by the SHA-256 of the provider, model, prompt and parameters, so a rerun
+on identical input (after a crash, or after tweaking an unrelated step) is
+answered from disk. Entries expire after a TTL, and once the file grows past
+its size limit the least recently used entries are evicted.
+
+Set `LLM_CACHE=off` to bypass the cache, or pass `refresh=True` to a helper to
+force a new response for one call. Token usage of every call that reaches a
+provider is reported to `src.tracing`.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from src.tracing import tracer
+
+CACHE_PATH = Path.cwd() / "caches" / "llm_cache.sqlite3"
+TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_DAYS", "30")) * 86400
+MAX_BYTES = int(float(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024)
+ENABLED = os.getenv("LLM_CACHE", "on").lower() not in ("off", "0", "false")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_responses (
+    key TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    model TEXT,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_responses_last_used_at ON llm_responses (last_used_at);
+"""
+
+
+class LLMCache:
+    def __init__(self, path: Path = None, ttl_seconds: float = TTL_SECONDS, max_bytes: int = MAX_BYTES):
+        self.path = Path(path or CACHE_PATH)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._schema_ready:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._schema_ready = True
+        return conn
+
+    @staticmethod
+    def make_key(provider: str, model: Optional[str], request: Dict[str, Any]) -> str:
+        payload = json.dumps([provider, model, request], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                conn.commit()
+                row = None
+            if row:
+                conn.execute("UPDATE llm_responses SET last_used_at = ? WHERE key = ?", (now, key))
+                conn.commit()
+        finally:
+            conn.close()
+
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return row[0] if row else None
+
+    def put(self, key: str, provider: str, model: Optional[str], response: str) -> None:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                """
+                INSERT INTO llm_responses (key, provider, model, response, size, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    response = excluded.response,
+                    size = excluded.size,
+                    created_at = excluded.created_at,
+                    last_used_at = excluded.last_used_at
+                """,
+                (key, provider, model, response, len(response.encode("utf-8")), now, now),
+            )
+            self._evict(conn, now)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Least recently used first, until we're back under the limit
+        for key, size in conn.execute("SELECT key, size FROM llm_responses ORDER BY last_used_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+            total -= size
+
+    def call(
+        self,
+        provider: str,
+        model: Optional[str],
+        request: Dict[str, Any],
+        generate: Callable[[], str],
+        refresh: bool = False,
+    ) -> str:
+        """Return the cached response for `request`, or run `generate()` and cache its text."""
+        if not ENABLED:
+            return generate()
+
+        key = self.make_key(provider, model, request)
+        if not refresh:
+            cached = self.get(key)
+            if cached is not None:
+                tracer.record_llm(model, cached=True)
+                return cached
+
+        response = generate()
+        if response:
+            self.put(key, provider, model, response)
+        return response
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    def print_stats(self) -> None:
+        stats = self.stats()
+        print(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses")
+
+
+cache = LLMCache()
+
+
+def anthropic_text(client, refresh: bool = False, **request) -> str:
+    """`client.messages.create(**request)`, returning the first text block."""
+    def generate():
+        response = client.messages.create(**request)
+        usage = getattr(response, "usage", None)
+        tracer.record_llm(
+            request.get("model"),
+            getattr(usage, "input_tokens", 0) or 0,
+            getattr(usage, "output_tokens", 0) or 0,
+        )
+        return response.content[0].text
+
+    return cache.call("anthropic", request.get("model"), request, generate, refresh=refresh)
+
+
+def openai_chat_text(client, refresh: bool = False, **request) -> str:
+    """`client.chat.completions.create(**request)`, returning the first choice's message."""
+    def generate():
+        response = client.chat.completions.create(**request)
+        usage = getattr(response, "usage", None)
+        tracer.record_llm(
+            request.get("model"),
+            getattr(usage, "prompt_tokens", 0) or 0,
+            getattr(usage, "completion_tokens", 0) or 0,
+        )
+        return response.choices[0].message.content
+
+    return cache.call("openai", request.get("model"), request, generate, refresh=refresh)
+
+
+def gemini_text(client, model: str, contents: Any, refresh: bool = False, **request) -> str:
+    """`client.models.generate_content(model=..., contents=..., **request)`, returning `.text`."""
+    def generate():
+        response = client.models.generate_content(model=model, contents=contents, **request)
+        usage = getattr(response, "usage_metadata", None)
+        # Thinking tokens are billed as output
+        output_tokens = (
+            (getattr(usage, "candidates_token_count", 0) or 0) + (getattr(usage, "thoughts_token_count", 0) or 0)
+        )
+        tracer.record_llm(model, getattr(usage, "prompt_token_count", 0) or 0, output_tokens)
+        return response.text
+
+    return cache.call("gemini", model, dict(request, contents=contents), generate, refresh=refresh)
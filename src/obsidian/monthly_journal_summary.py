@@ -5,6 +5,8 @@ from pathlib import Path
 from datetime import datetime, timedelta, date
 import calendar
 
+from src.llm_cache import anthropic_text
+
 def get_last_month_dates():
     """
     Get the date range for the previous month (all days)
@@ -152,12 +154,12 @@ Content:
 """
 
     try:
-        response = client.messages.create(
+        return anthropic_text(
+            client,
             model="claude-3-7-sonnet-latest",
             max_tokens=2000,
             messages=[{"role": "user", "content": [{"type": "text", "text": prompt}]}],
-        )
-        return response.content[0].text.strip()
+        ).strip()
     except Exception as e:
         return f"Error analyzing content with Claude: {e}"
 
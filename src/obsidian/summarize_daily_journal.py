@@ -4,6 +4,8 @@ import argparse
 from pathlib import Path
 import anthropic
 
+from src.llm_cache import anthropic_text
+
 def get_notes_content(year, notes_dir="~/Obsidian/notes/recurring/daily/"):
     """
     Retrieve content from all notes of a specific year.
@@ -64,12 +66,12 @@ def analyze_with_claude(content):
     {content}"""
 
     try:
-        response = client.messages.create(
+        return anthropic_text(
+            client,
             model="claude-3-5-sonnet-latest",
             max_tokens=1000,
             messages=[{"role": "user", "content": [{"type": "text", "text": prompt}]}],
-        )
-        return response.content[0].text.strip()
+        ).strip()
     except Exception as e:
         return f"Error analyzing content with Claude: {e}"
 
@@ -5,6 +5,8 @@ from pathlib import Path
 from google import genai
 from typing import List, Dict
 
+from src.llm_cache import gemini_text
+
 def get_all_recurring_notes(notes_base_dir: str = "~/Obsidian/notes/recurring/") -> Dict[str, List[str]]:
     """
     Retrieve content from all recurring notes (daily, weekly, monthly, yearly).
@@ -79,10 +81,9 @@ def analyze_with_gemini(notes_data: Dict[str, List[str]]) -> str:
                 prompt += f"{note}\n"
 
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-pro-preview-03-25", contents=prompt
+        return gemini_text(
+            client, model="gemini-2.5-pro-preview-03-25", contents=prompt
         )
-        return response.text
     except Exception as e:
         return f"Error analyzing content with Gemini: {e}"
 
@@ -5,6 +5,8 @@ from pathlib import Path
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
+from src.llm_cache import anthropic_text
+
 load_dotenv()
 
 
@@ -88,12 +90,12 @@ def analyze_with_claude(content):
     {content}"""
 
     try:
-        response = client.messages.create(
+        return anthropic_text(
+            client,
             model="claude-sonnet-4-20250514",
             max_tokens=1000,
             messages=[{"role": "user", "content": [{"type": "text", "text": prompt}]}],
-        )
-        return response.content[0].text.strip()
+        ).strip()
     except Exception as e:
         return f"Error analyzing content with Claude: {e}"
 
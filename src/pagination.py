@@ -0,0 +1,133 @@
+"""Prefetching paginators for the cursor- and page-number-based APIs we crawl.
+
+`fetch_page` callables do the request *and* the JSON decoding, so both run on
+a background thread while the caller is still processing the previous page.
+Records are yielded one page at a time instead of being collected into one
+big list.
+"""
+
+import contextvars
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+_DONE = object()
+
+
+def iter_cursor_pages(
+    fetch_page: Callable[[Optional[str]], Tuple[List[Any], Optional[str]]],
+    start_cursor: Optional[str] = None,
+    prefetch: int = 2,
+    checkpoint=None,
+) -> Iterator[Tuple[Optional[str], List[Any], Optional[str]]]:
+    """Yield `(cursor, records, next_cursor)` for every page of a cursor-paginated API.
+
+    `fetch_page(cursor)` must return `(records, next_cursor)`. The next page is
+    requested as soon as the previous one is decoded, up to `prefetch` pages
+    ahead of the consumer. Errors raised by `fetch_page` are re-raised here.
+
+    With a `src.checkpoint.CrawlCheckpoint`, pages saved by an earlier,
+    interrupted run are replayed first and fetching resumes after them; each
+    new page is appended to the checkpoint before it is yielded.
+    """
+    if checkpoint is not None:
+        yield from checkpoint.iter_pages()
+        if checkpoint.finished:
+            return
+        start_cursor = checkpoint.resume_cursor or start_cursor
+
+    pages = queue.Queue(maxsize=max(prefetch, 1))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        cursor = start_cursor
+        try:
+            while not stop.is_set():
+                records, next_cursor = fetch_page(cursor)
+                if not put((cursor, records, next_cursor)):
+                    return
+                if not next_cursor:
+                    break
+                cursor = next_cursor
+            put(_DONE)
+        except BaseException as e:
+            put(e)
+
+    # Run in the caller's context so per-stage tracing still sees these requests
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(producer,), daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = pages.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            if checkpoint is not None:
+                checkpoint.add_page(*item)
+            yield item
+    finally:
+        # Lets the producer exit if the consumer stopped early
+        stop.set()
+
+
+def iter_cursor_records(
+    fetch_page: Callable[[Optional[str]], Tuple[List[Any], Optional[str]]],
+    start_cursor: Optional[str] = None,
+    prefetch: int = 2,
+    checkpoint=None,
+) -> Iterator[Any]:
+    """Like `iter_cursor_pages`, but yields the records themselves."""
+    pages = iter_cursor_pages(fetch_page, start_cursor=start_cursor, prefetch=prefetch, checkpoint=checkpoint)
+    for _, records, _ in pages:
+        yield from records
+
+
+def iter_numbered_pages(
+    fetch_page: Callable[[int], Tuple[List[Any], Optional[int]]],
+    first_page: int = 0,
+    max_workers: int = 4,
+) -> Iterator[List[Any]]:
+    """Yield pages of a page-number-paginated API, in order.
+
+    `fetch_page(page)` must return `(records, total_pages)`. Once the first
+    page reports the total, the remaining pages are fetched concurrently by
+    up to `max_workers` threads. If the total is unknown (None), pages are
+    fetched one at a time until an empty page comes back.
+    """
+    records, total_pages = fetch_page(first_page)
+    yield records
+
+    if total_pages is None:
+        page = first_page + 1
+        while records:
+            records, _ = fetch_page(page)
+            if records:
+                yield records
+            page += 1
+        return
+
+    remaining = iter(range(first_page + 1, first_page + total_pages))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = []
+        for page in remaining:
+            in_flight.append(executor.submit(contextvars.copy_context().run, fetch_page, page))
+            if len(in_flight) >= max_workers:
+                break
+
+        while in_flight:
+            records, _ = in_flight.pop(0).result()
+            next_page = next(remaining, None)
+            if next_page is not None:
+                in_flight.append(executor.submit(contextvars.copy_context().run, fetch_page, next_page))
+            yield records
@@ -12,10 +12,13 @@ import os
 import anthropic
 import requests
 from dotenv import load_dotenv
+from src.llm_cache import anthropic_text, cache
 from src.obsidian.weekly_journal_summary import get_last_week_notes
 from src.raindrop.main import add_tag_to_raindrop, get_last_7_raindrops_from_other, get_random_person_from_collection
 from src.readwise.highlights import filter_highlights_by_date_range, get_highlights_last_7_days
 from src.readwise.utils import fetch_recently_archived_documents
+from src.task_graph import TaskGraph
+from src.tracing import record_response, traced, tracer
 from src.twitter.utils import generate_tweet_thread_from_newsletter, send_to_typefully
 
 load_dotenv()
@@ -24,6 +27,7 @@ api_key = os.getenv('ANTHROPIC_API_KEY')
 client = anthropic.Client(api_key=api_key)
 
 
+@traced
 def create_personal_updates_block():
     print("Creating personal updates block...")
 
@@ -43,16 +47,17 @@ def create_personal_updates_block():
     """
 
     try:
-        response = client.messages.create(
+        return anthropic_text(
+            client,
             model="claude-sonnet-4-20250514",
             max_tokens=800,
             messages=[{"role": "user", "content": [{"type": "text", "text": prompt}]}],
-        )
-        return response.content[0].text.strip()
+        ).strip()
     except Exception as e:
         return f"Error generating quote with Claude: {e}"
 
 
+@traced
 def create_quote_of_the_week_block():
     print("Creating quote of the week block...")
 
@@ -94,16 +99,17 @@ def create_quote_of_the_week_block():
     Return only the formatted newsletter section, starting with "## Quote of the week" and including any formatting you think would work well."""
 
     try:
-        response = client.messages.create(
+        return anthropic_text(
+            client,
             model="claude-sonnet-4-20250514",
             max_tokens=800,
             messages=[{"role": "user", "content": [{"type": "text", "text": prompt}]}],
-        )
-        return response.content[0].text.strip()
+        ).strip()
     except Exception as e:
         return f"Error generating quote with Claude: {e}"
 
 
+@traced
 def create_cool_person_block():
     print("Creating cool person block...")
 
@@ -119,7 +125,7 @@ def create_cool_person_block():
         "Authorization": f"Bearer {os.getenv('JINA_READER_API_KEY')}",
     }
 
-    response = requests.get(jina_url, headers=headers, timeout=30)
+    response = requests.get(jina_url, headers=headers, timeout=30, hooks={"response": record_response})
     response.raise_for_status()
 
     data = response.json().get("data", {})
@@ -167,12 +173,12 @@ def create_cool_person_block():
     """
 
     try:
-        response = client.messages.create(
+        content = anthropic_text(
+            client,
             model="claude-sonnet-4-20250514",
             max_tokens=800,
             messages=[{"role": "user", "content": [{"type": "text", "text": prompt}]}],
-        )
-        content = response.content[0].text.strip()
+        ).strip()
     except Exception as e:
         return f"Error generating cool person block with Claude: {e}"
 
@@ -181,6 +187,7 @@ def create_cool_person_block():
     return content
 
 
+@traced
 def create_recently_read_articles_block():
     print("Creating recently read articles block...")
 
@@ -205,6 +212,7 @@ def create_recently_read_articles_block():
 
 
 
+@traced
 def create_other_cool_links_block():
     print("Creating other cool links block...")
 
@@ -221,6 +229,7 @@ def create_other_cool_links_block():
     return block
 
 
+@traced
 def create_support_block():
     print("Creating support block...")
 
@@ -235,6 +244,7 @@ You can support this project by using one of the affiliate links below. These ar
 """
 
 
+@traced
 def create_sponsors_block():
     print("Creating sponsors block...")
 
@@ -248,52 +258,43 @@ This newsletter is sponsored by [Marketing Agents](https://marketingagents.net).
 """
 
 
-if __name__ == "__main__":
-    newsletter_content = """Hey, Happy Tuesday!
+NEWSLETTER_INTRO = """Hey, Happy Tuesday!
 
 > ***Why are you getting this***: You signed up to receive this newsletter on [my personal website](https://rasulkireev.com). I promised to send you the most interesting sites and resources I have encountered during the week. *If you don't want to receive this newsletter, feel free to* [*unsubscribe*]({{ unsubscribe_url }}) *anytime.*"""
 
-    newsletter_content += "\n\n"
-
-    personal_updates_block = create_personal_updates_block()
-    newsletter_content += personal_updates_block
-
-    newsletter_content += "\n\n"
-
-    quote_block = create_quote_of_the_week_block()
-    newsletter_content += quote_block
-
-    newsletter_content += "\n\n"
-
-    cool_person_block = create_cool_person_block()
-    newsletter_content += cool_person_block
+# Newsletter sections, in the order they appear
+NEWSLETTER_BLOCKS = [
+    ("personal_updates", create_personal_updates_block),
+    ("quote_of_the_week", create_quote_of_the_week_block),
+    ("cool_person", create_cool_person_block),
+    # ("tweet_of_the_week", create_tweet_of_the_week_block),
+    ("recently_read_articles", create_recently_read_articles_block),
+    ("other_cool_links", create_other_cool_links_block),
+    ("support", create_support_block),
+    ("sponsors", create_sponsors_block),
+]
 
-    # newsletter_content += "\n\n"
 
-    # tweet_block = create_tweet_of_the_week_block()
-    # newsletter_content += tweet_block
+def build_newsletter(max_workers=None):
+    """Build every block concurrently and join them in section order."""
+    graph = TaskGraph()
+    for name, create_block in NEWSLETTER_BLOCKS:
+        graph.add(name, create_block)
 
-    newsletter_content += "\n\n"
+    blocks = graph.run(max_workers=max_workers)
 
-    recently_read_arrticles = create_recently_read_articles_block()
-    newsletter_content += recently_read_arrticles
+    return "\n\n".join([NEWSLETTER_INTRO] + [blocks[name] for name, _ in NEWSLETTER_BLOCKS])
 
-    newsletter_content += "\n\n"
 
-    other_cool_links_block = create_other_cool_links_block()
-    newsletter_content += other_cool_links_block
-
-    newsletter_content += "\n\n"
-
-    support_block = create_support_block()
-    newsletter_content += support_block
-
-    newsletter_content += "\n\n"
-
-    sponsors_block = create_sponsors_block()
-    newsletter_content += sponsors_block
+if __name__ == "__main__":
+    try:
+        newsletter_content = build_newsletter()
 
-    print(newsletter_content)
+        print(newsletter_content)
+        cache.print_stats()
 
-    thread = generate_tweet_thread_from_newsletter(newsletter_content)
-    send_to_typefully(thread)
+        thread = generate_tweet_thread_from_newsletter(newsletter_content)
+        send_to_typefully(thread)
+    finally:
+        tracer.print_summary()
+        print(f"Trace written to {tracer.write_json('newsletter')}")
@@ -0,0 +1,61 @@
+"""Linear-time assembly of large LLM prompts.
+
+Text is collected as a list of parts with a running length, so checking the
+size of a half-built prompt is O(1) and the final string is joined exactly
+once. Builders can be nested (a section per category, a block per book) and
+merged with `extend`, or written out part by part instead of being joined.
+"""
+
+from typing import Iterator, List, Optional, TextIO
+
+
+class PromptBuilder:
+    def __init__(self, max_chars: Optional[int] = None):
+        self.max_chars = max_chars
+        self.parts: List[str] = []
+        self.length = 0
+        self.truncated = False
+
+    def __len__(self) -> int:
+        return self.length
+
+    def remaining(self) -> Optional[int]:
+        """Characters left in the budget, or None if there is no budget."""
+        if self.max_chars is None:
+            return None
+        return max(self.max_chars - self.length, 0)
+
+    def fits(self, size: int) -> bool:
+        return self.max_chars is None or self.length + size <= self.max_chars
+
+    def add(self, *texts: str) -> "PromptBuilder":
+        """Append text regardless of the budget (headers, truncation markers)."""
+        for text in texts:
+            self.parts.append(text)
+            self.length += len(text)
+        return self
+
+    def add_if_fits(self, text: str) -> bool:
+        """Append `text` only if it stays within the budget; otherwise mark the builder truncated."""
+        if not self.fits(len(text)):
+            self.truncated = True
+            return False
+        self.add(text)
+        return True
+
+    def extend(self, other: "PromptBuilder") -> "PromptBuilder":
+        self.parts.extend(other.parts)
+        self.length += other.length
+        self.truncated = self.truncated or other.truncated
+        return self
+
+    def iter_parts(self) -> Iterator[str]:
+        return iter(self.parts)
+
+    def write_to(self, stream: TextIO) -> int:
+        """Write the prompt to a file-like object without joining it first."""
+        stream.writelines(self.parts)
+        return self.length
+
+    def build(self) -> str:
+        return "".join(self.parts)
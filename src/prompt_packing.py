@@ -0,0 +1,104 @@
+"""Token-budgeted selection of prompt entries.
+
+Every candidate entry (a highlight, a document) has an estimated token cost,
+a base score and a set of diversity keys (its tags, category, book...).
+`pack` chooses the subset that carries the most score within a token budget:
+a lazy greedy over score per token, where each key an entry shares with
+already chosen entries lowers its value, so the budget is spread across
+categories and tags instead of being spent on whatever comes first.
+
+An exact 0/1 knapsack is out of reach at tens of thousands of entries and a
+six-figure token budget; greedy by value density is the usual approximation.
+"""
+
+import heapq
+import math
+import os
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+CHARS_PER_TOKEN = 4
+
+# Input window of the Gemini models we use; the margin absorbs the error of
+# the characters-per-token estimate.
+GEMINI_CONTEXT_TOKENS = int(os.getenv("GEMINI_CONTEXT_TOKENS", "1048576"))
+CONTEXT_SAFETY_MARGIN = 0.9
+# Gemini bills prompts over 200k tokens at a higher rate, so by default prompts
+# stay under that tier; raise it (up to the context window) to pack more in.
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "200000"))
+
+DIVERSITY_WEIGHT = 0.5
+RECENCY_HALF_LIFE_DAYS = 365
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token for English text)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def prompt_budget(template_tokens: int = 0, context_tokens: int = None) -> int:
+    """Tokens left for data once the template is accounted for."""
+    context_tokens = min(context_tokens or PROMPT_TOKEN_BUDGET, GEMINI_CONTEXT_TOKENS)
+    return max(int(context_tokens * CONTEXT_SAFETY_MARGIN) - template_tokens, 0)
+
+
+def recency_score(age_days: Optional[float], half_life_days: float = RECENCY_HALF_LIFE_DAYS) -> float:
+    """1.0 for something from today, halving every `half_life_days`; 0 if the age is unknown."""
+    if age_days is None:
+        return 0.0
+    return 0.5 ** (max(age_days, 0) / half_life_days)
+
+
+def pack(
+    candidates: Sequence[Tuple[float, int, Iterable[Hashable]]],
+    budget_tokens: int,
+    group_of: Sequence[Hashable] = None,
+    group_cost: Dict[Hashable, int] = None,
+    diversity_weight: float = DIVERSITY_WEIGHT,
+) -> List[int]:
+    """Pick candidate indices that maximize total value within `budget_tokens`.
+
+    Each candidate is `(score, tokens, keys)`. Its value is `score` plus
+    `diversity_weight / (1 + n)` for every key already used by `n` chosen
+    entries, so values only shrink as entries are picked and a lazy greedy
+    stays exact to the plain greedy. Optionally, `group_of[i]` names a group
+    whose one-off `group_cost` (e.g. a book header) is charged when its first
+    entry is picked. Returns indices in their original order.
+    """
+    group_cost = group_cost or {}
+    keys = [tuple(set(c[2])) for c in candidates]
+    key_uses: Dict[Hashable, int] = defaultdict(int)
+    opened = set()
+
+    def value(i: int) -> float:
+        bonus = sum(diversity_weight / (1 + key_uses[key]) for key in keys[i])
+        return candidates[i][0] + bonus
+
+    def density(i: int) -> float:
+        return value(i) / max(candidates[i][1], 1)
+
+    heap = [(-density(i), i) for i in range(len(candidates))]
+    heapq.heapify(heap)
+
+    chosen = []
+    remaining = budget_tokens
+    while heap and remaining > 0:
+        _, i = heapq.heappop(heap)
+        current = -density(i)
+        if heap and current > heap[0][0]:
+            # Its value dropped since it was queued; requeue and look again
+            heapq.heappush(heap, (current, i))
+            continue
+
+        group = group_of[i] if group_of is not None else None
+        cost = candidates[i][1] + (group_cost.get(group, 0) if group not in opened else 0)
+        if cost > remaining:
+            continue
+
+        chosen.append(i)
+        remaining -= cost
+        opened.add(group)
+        for key in keys[i]:
+            key_uses[key] += 1
+
+    return sorted(chosen)
@@ -0,0 +1,163 @@
+"""Async Raindrop.io client.
+
+One `httpx.AsyncClient` per `RaindropClient`, with at most `MAX_CONCURRENCY`
+requests in flight. Collection listings fetch the first page to learn the
+total and then every other page concurrently. The collection name -> id map
+is cached in memory and in `caches/raindrop_collections.json` for
+`COLLECTIONS_TTL_SECONDS`, and refreshed early only when a name is missing.
+
+The sync helpers in `src.raindrop.main` wrap these coroutines with
+`asyncio.run`, so callers that aren't async don't need to change.
+"""
+
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import httpx
+from dotenv import load_dotenv
+
+from src.readwise.throttle import parse_retry_after
+from src.tracing import tracer
+
+load_dotenv()
+
+RAINDROP_ACCESS_TOKEN = os.getenv("RAINDROP_ACCESS_TOKEN")
+BASE_URL = "https://api.raindrop.io/rest/v1"
+PER_PAGE = 50  # Max page size the Raindrop API allows
+MAX_CONCURRENCY = 8
+MAX_RETRIES = 3
+DEFAULT_TIMEOUT = 30
+
+COLLECTIONS_CACHE_PATH = Path.cwd() / "caches" / "raindrop_collections.json"
+COLLECTIONS_TTL_SECONDS = float(os.getenv("RAINDROP_COLLECTIONS_TTL_SECONDS", "3600"))
+
+_collections: Dict[str, Any] = {"fetched_at": 0.0, "ids": {}}
+_collections_lock = threading.Lock()
+
+
+def _load_collections_cache() -> Dict[str, Any]:
+    with _collections_lock:
+        if not _collections["ids"] and COLLECTIONS_CACHE_PATH.exists():
+            try:
+                _collections.update(json.loads(COLLECTIONS_CACHE_PATH.read_text()))
+            except (OSError, ValueError):
+                pass
+        return dict(_collections)
+
+
+def _save_collections_cache(ids: Dict[str, int]) -> None:
+    with _collections_lock:
+        _collections.update({"fetched_at": time.time(), "ids": ids})
+        COLLECTIONS_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = COLLECTIONS_CACHE_PATH.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(_collections))
+        tmp_path.replace(COLLECTIONS_CACHE_PATH)
+
+
+def invalidate_collections_cache() -> None:
+    with _collections_lock:
+        _collections.update({"fetched_at": 0.0, "ids": {}})
+        COLLECTIONS_CACHE_PATH.unlink(missing_ok=True)
+
+
+async def _trace_response(response: httpx.Response) -> None:
+    await response.aread()
+    request = response.request
+    tracer.record_request(len(request.content or b"") + len(str(request.url)), len(response.content))
+
+
+class RaindropClient:
+    def __init__(self, token: str = None, max_concurrency: int = MAX_CONCURRENCY, timeout: float = DEFAULT_TIMEOUT):
+        token = token or RAINDROP_ACCESS_TOKEN
+        if not token:
+            raise ValueError("Missing RAINDROP_ACCESS_TOKEN in environment variables.")
+        self._client = httpx.AsyncClient(
+            base_url=BASE_URL,
+            headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+            timeout=timeout,
+            event_hooks={"response": [_trace_response]},
+        )
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    async def __aenter__(self) -> "RaindropClient":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def request(self, path: str, method: str = "GET", data: dict = None, params: dict = None) -> dict:
+        """Send one request, waiting out 429s, and return the decoded JSON."""
+        for attempt in range(MAX_RETRIES + 1):
+            async with self._slots:
+                response = await self._client.request(method, f"/{path}", json=data, params=params)
+            if response.status_code == 429 and attempt < MAX_RETRIES:
+                pause = parse_retry_after(response.headers.get("Retry-After")) or 2 ** attempt
+                print(f"Raindrop returned 429, retrying in {pause:.0f}s (attempt {attempt + 1}/{MAX_RETRIES})")
+                await asyncio.sleep(pause)
+                continue
+            response.raise_for_status()
+            return response.json()
+
+    async def get_collections(self) -> List[dict]:
+        """Root collections followed by nested ones."""
+        roots, children = await asyncio.gather(self.request("collections"), self.request("collections/childrens"))
+        return roots.get("items", []) + children.get("items", [])
+
+    async def get_collection_ids(self, refresh: bool = False) -> Dict[str, int]:
+        cached = _load_collections_cache()
+        if not refresh and cached["ids"] and time.time() - cached["fetched_at"] < COLLECTIONS_TTL_SECONDS:
+            return cached["ids"]
+
+        ids: Dict[str, int] = {}
+        for collection in await self.get_collections():
+            # Keep the first collection with a given title, as the old lookup did
+            ids.setdefault(collection["title"], collection["_id"])
+        _save_collections_cache(ids)
+        return ids
+
+    async def get_collection_id_by_name(self, name: str) -> Optional[int]:
+        ids = await self.get_collection_ids()
+        if name not in ids:
+            # Could be a collection created since the map was cached
+            ids = await self.get_collection_ids(refresh=True)
+        return ids.get(name)
+
+    async def get_collection_raindrops(self, collection_id: int, **params) -> List[dict]:
+        """Every raindrop in a collection; pages after the first are fetched concurrently."""
+        def page_params(page: int) -> dict:
+            return dict(params, page=page, perpage=PER_PAGE)
+
+        path = f"raindrops/{collection_id}"
+        first = await self.request(path, params=page_params(0))
+        pages = math.ceil(first.get("count", 0) / PER_PAGE)
+        rest = await asyncio.gather(*(self.request(path, params=page_params(page)) for page in range(1, pages)))
+
+        items = list(first.get("items", []))
+        for data in rest:
+            items.extend(data.get("items", []))
+        return items
+
+    async def get_latest_raindrops(self, collection_id: int, count: int) -> List[dict]:
+        """The first `count` raindrops of a collection (newest first, the API's default order), from one page."""
+        data = await self.request(f"raindrops/{collection_id}", params={"page": 0, "perpage": min(count, PER_PAGE)})
+        return data.get("items", [])
+
+    async def get_raindrop(self, raindrop_id: int) -> dict:
+        return (await self.request(f"raindrop/{raindrop_id}")).get("item", {})
+
+    async def add_tags(self, raindrop_ids: Iterable[int], tags: List[str], collection_id: int = 0) -> dict:
+        """Append `tags` to many raindrops with one bulk update (collection 0 means any collection)."""
+        return await self.request(
+            f"raindrops/{collection_id}",
+            "PUT",
+            data={"ids": list(raindrop_ids), "tags": list(tags)},
+        )
@@ -1,11 +1,16 @@
-import requests
-import os
-from dotenv import load_dotenv
+import asyncio
 
-load_dotenv()
+from src.raindrop.client import RaindropClient
+
+
+def _run(method: str, *args, **kwargs):
+    """Call one `RaindropClient` coroutine from sync code."""
+    async def call():
+        async with RaindropClient() as client:
+            return await getattr(client, method)(*args, **kwargs)
+
+    return asyncio.run(call())
 
-RAINDROP_ACCESS_TOKEN = os.getenv("RAINDROP_ACCESS_TOKEN")
-BASE_URL = "https://api.raindrop.io/rest/v1"
 
 def make_request(
     path: str,
@@ -13,42 +18,43 @@ def make_request(
     data: dict = None,
     params: dict = None,
 ) -> dict:
-    headers = {
-        "Authorization": f"Bearer {RAINDROP_ACCESS_TOKEN}",
-        "Content-Type": "application/json",
-    }
-    response = requests.request(method, f"{BASE_URL}/{path}", headers=headers, json=data, params=params)
-    return response.json()
+    return _run("request", path, method, data=data, params=params)
 
 
-def get_collections() -> list[dict]:
-    return make_request("collections")
+def get_collections() -> dict:
+    return {"items": _run("get_collections")}
 
 
 def get_collection_id_by_name(name: str) -> int:
-    collections = get_collections()
-    for collection in collections["items"]:
-        if collection["title"] == name:
-            return collection["_id"]
-    return None
+    return _run("get_collection_id_by_name", name)
 
 
 def get_collection_raindrops(collection_id: int) -> dict:
-    return make_request(f"raindrops/{collection_id}")
+    """Get every raindrop in a collection, fetching the pages after the first concurrently."""
+    items = _run("get_collection_raindrops", collection_id)
+    return {"items": items, "count": len(items)}
+
+
+def add_tag_to_raindrops(raindrop_ids: list[int], tag: str):
+    print(f"Adding tag {tag} to {len(raindrop_ids)} raindrops")
+    return _run("add_tags", raindrop_ids, [tag])
 
 
 def add_tag_to_raindrop(raindrop_id: int, tag: str):
-    raindrop = make_request(f"raindrop/{raindrop_id}")
-    tags = raindrop['item']["tags"] + [tag]
     print(f"Adding tag {tag} to raindrop {raindrop_id}")
-    return make_request(f"raindrop/{raindrop_id}", "PUT", data={"tags": tags})
+    return _run("add_tags", [raindrop_id], [tag])
 
 
-def get_random_person_from_collection() -> dict:
-    collection_id = get_collection_id_by_name("People")
-    raindrops = get_collection_raindrops(collection_id)
+async def _collection_items(name: str) -> list[dict]:
+    async with RaindropClient() as client:
+        collection_id = await client.get_collection_id_by_name(name)
+        if collection_id is None:
+            return []
+        return await client.get_collection_raindrops(collection_id)
+
 
-    for raindrop in raindrops["items"]:
+def get_random_person_from_collection() -> dict:
+    for raindrop in asyncio.run(_collection_items("People")):
         if "featured in newsletter" in raindrop["tags"]:
             continue
 
@@ -59,9 +65,11 @@ def get_random_person_from_collection() -> dict:
 
 def get_last_7_raindrops_from_other() -> list[dict]:
     """Get the last 7 raindrops from the 'Other' collection."""
-    collection_id = get_collection_id_by_name("Other")
-    if collection_id is None:
-        return []
-
-    raindrops = get_collection_raindrops(collection_id)
-    return raindrops["items"][:7]
+    async def latest():
+        async with RaindropClient() as client:
+            collection_id = await client.get_collection_id_by_name("Other")
+            if collection_id is None:
+                return []
+            return await client.get_latest_raindrops(collection_id, 7)
+
+    return asyncio.run(latest())
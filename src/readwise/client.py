@@ -0,0 +1,265 @@
+"""Shared HTTP client for every Readwise / Reader API call in this repo.
+
+All fetchers go through one pooled `requests.Session`, so paging through a big
+library reuses the same keep-alive connection instead of paying a new TCP+TLS
+handshake per page.
+"""
+
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from src.json_stream import iter_json_array
+from src.pagination import iter_cursor_pages, iter_cursor_records
+from src.readwise.throttle import parse_retry_after, throttle
+from src.tracing import record_streamed_body, trace_session
+
+# Load environment variables early
+load_dotenv()
+
+# Configuration
+READWISE_TOKEN = os.getenv("READWISE_TOKEN")
+READER_LIST_URL = "https://readwise.io/api/v3/list/"
+EXPORT_URL = "https://readwise.io/api/v2/export/"
+HIGHLIGHTS_URL = "https://readwise.io/api/v2/highlights/"
+
+# Number of distinct hosts to keep pools for, and max open connections per host
+POOL_CONNECTIONS = int(os.getenv("READWISE_POOL_CONNECTIONS", "4"))
+POOL_MAXSIZE = int(os.getenv("READWISE_POOL_MAXSIZE", "8"))
+DEFAULT_TIMEOUT = 30
+MAX_RETRIES = int(os.getenv("READWISE_MAX_RETRIES", "8"))
+RETRY_STATUSES = {429, 503}
+
+_session = None
+_session_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {"requests": 0, "bytes": 0}
+
+
+def get_session(pool_connections: int = None, pool_maxsize: int = None) -> requests.Session:
+    """Return the shared Readwise session, creating it on first use.
+
+    `pool_maxsize` is the per-host connection limit. The pool blocks instead of
+    opening extra throwaway connections when every slot is busy.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            adapter = HTTPAdapter(
+                pool_connections=pool_connections or POOL_CONNECTIONS,
+                pool_maxsize=pool_maxsize or POOL_MAXSIZE,
+                pool_block=True,
+            )
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                "Accept": "application/json",
+                "Accept-Encoding": "gzip, deflate",
+                "Connection": "keep-alive",
+            })
+            _session = trace_session(session)
+        return _session
+
+
+def configure(pool_connections: int = None, pool_maxsize: int = None) -> requests.Session:
+    """Rebuild the shared session with a different pool size."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+    return get_session(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+
+
+def auth_headers(token: str = None) -> dict:
+    token = token or READWISE_TOKEN
+    if not token:
+        raise ValueError("Missing READWISE_TOKEN in environment variables. Ensure it's set in your .env file.")
+    return {"Authorization": f"Token {token}"}
+
+
+def record_response(response: requests.Response, consumed: int = None) -> None:
+    """Add a finished response to the counters (bytes as received on the wire).
+
+    urllib3 doesn't count chunked bodies, so for a streamed response pass the
+    `consumed` (decoded) byte count as the fallback.
+    """
+    raw = getattr(response, "raw", None)
+    try:
+        received = raw.tell() if raw is not None else 0
+    except Exception:
+        received = 0
+    if not received:
+        received = consumed if consumed is not None else len(response.content)
+    with _stats_lock:
+        _stats["bytes"] += received
+    record_streamed_body(response, received)
+
+
+def get(
+    url: str,
+    params: dict = None,
+    timeout: int = DEFAULT_TIMEOUT,
+    stream: bool = False,
+    token: str = None,
+) -> requests.Response:
+    """GET a Readwise endpoint over the shared session.
+
+    Every request waits on the shared throttle. A 429 (or 503) is retried for
+    the same URL and params after its `Retry-After`, so a paginated crawl
+    carries on from the page it was on. Raises `requests.HTTPError` once
+    retries run out, or for any other 4xx/5xx. Streamed responses are
+    counted once the caller calls `record_response` after consuming the body.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        throttle.acquire()
+        response = get_session().get(url, params=params, headers=auth_headers(token), timeout=timeout, stream=stream)
+        with _stats_lock:
+            _stats["requests"] += 1
+
+        if response.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            response.close()
+            pause = throttle.on_rate_limited(retry_after)
+            print(
+                f"Readwise returned {response.status_code}, retrying in {pause:.0f}s "
+                f"(attempt {attempt + 1}/{MAX_RETRIES}, now {throttle.rate:.1f} requests/min)"
+            )
+            continue
+
+        if not stream:
+            record_response(response)
+        response.raise_for_status()
+        throttle.on_success()
+        return response
+
+
+def get_json(url: str, params: dict = None, timeout: int = DEFAULT_TIMEOUT) -> dict:
+    response = get(url, params=params, timeout=timeout)
+    try:
+        return response.json()
+    except requests.exceptions.JSONDecodeError as e:
+        print(f"Error decoding JSON response: {e}")
+        print(f"Response status code: {response.status_code}")
+        print(f"Response text: {response.text[:500]}...")
+        raise Exception("Failed to decode API response JSON.") from e
+
+
+def cursor_fetcher(url: str, params: dict = None, checkpoint=None):
+    """Return a `fetch_page(cursor)` callable for the paginators in `src.pagination`.
+
+    With a checkpoint, the total `count` reported on the first page is kept
+    as the checkpoint's expected record count.
+    """
+    def fetch_page(cursor):
+        page_params = dict(params or {})
+        if cursor:
+            page_params["pageCursor"] = cursor
+        print(f"Fetching page with params: {page_params}")
+        data = get_json(url, params=page_params)
+        if checkpoint is not None and not cursor and data.get("count") is not None:
+            checkpoint.expected_count = data["count"]
+        return data.get("results", []), data.get("nextPageCursor")
+
+    return fetch_page
+
+
+def iter_pages(url: str, params: dict = None, start_cursor: str = None, checkpoint=None):
+    """Yield `(cursor, results, next_cursor)` for each page, prefetching the next one."""
+    return iter_cursor_pages(cursor_fetcher(url, params, checkpoint), start_cursor=start_cursor, checkpoint=checkpoint)
+
+
+def iter_results(url: str, params: dict = None, checkpoint=None):
+    """Yield every result across all pages of a Readwise cursor endpoint."""
+    return iter_cursor_records(cursor_fetcher(url, params, checkpoint), checkpoint=checkpoint)
+
+
+def stream_results(url: str, params: dict = None, chunk_size: int = 65536, checkpoint=None):
+    """Yield every result across all pages, decoding each page incrementally.
+
+    Unlike `iter_results`, a page is never materialized as a whole: records are
+    parsed straight off the socket, so memory stays bounded by the largest
+    single record. Pages are fetched one after another. With a checkpoint,
+    saved pages are replayed first and each record is appended as it arrives.
+    """
+    cursor = None
+    if checkpoint is not None:
+        for _, records, _ in checkpoint.iter_pages():
+            yield from records
+        if checkpoint.finished:
+            return
+        cursor = checkpoint.resume_cursor
+
+    while True:
+        page_params = dict(params or {})
+        if cursor:
+            page_params["pageCursor"] = cursor
+        print(f"Streaming page with params: {page_params}")
+
+        meta = {}
+        consumed = 0
+        response = get(url, params=page_params, stream=True)
+
+        def chunks():
+            nonlocal consumed
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                consumed += len(chunk)
+                yield chunk
+
+        try:
+            for record in iter_json_array(chunks(), key="results", meta=meta):
+                if checkpoint is not None:
+                    checkpoint.add_record(record)
+                yield record
+        finally:
+            record_response(response, consumed)
+            response.close()
+
+        next_cursor = meta.get("nextPageCursor")
+        if checkpoint is not None:
+            checkpoint.end_page(cursor, next_cursor)
+        if not next_cursor:
+            break
+        cursor = next_cursor
+
+
+def get_stats() -> dict:
+    """Return request/byte counters plus how many requests reused a pooled connection."""
+    with _stats_lock:
+        stats = dict(_stats)
+
+    new_connections = 0
+    pooled_requests = 0
+    if _session is not None:
+        for adapter in set(_session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                new_connections += pool.num_connections
+                pooled_requests += pool.num_requests
+
+    stats["connections_opened"] = new_connections
+    stats["reused_connections"] = max(pooled_requests - new_connections, 0)
+    stats["rate_limited"] = throttle.rate_limited
+    stats["throttled_seconds"] = round(throttle.waited_seconds, 1)
+    return stats
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        _stats["requests"] = 0
+        _stats["bytes"] = 0
+
+
+def print_stats() -> None:
+    stats = get_stats()
+    print(
+        f"Readwise HTTP: {stats['requests']} requests, {stats['bytes']:,} bytes received, "
+        f"{stats['connections_opened']} connections opened, {stats['reused_connections']} reused, "
+        f"{stats['rate_limited']} rate-limited, {stats['throttled_seconds']}s throttled"
+    )
@@ -3,22 +3,20 @@ from google import genai
 from dotenv import load_dotenv
 from typing import List, Dict, Any
 
-from src.readwise.utils import fetch_all_documents
+from src.llm_cache import gemini_text
+from src.readwise.utils import fetch_documents_by_partition, merge_documents
 
 # Load environment variables
 load_dotenv()
 
 def get_all_books() -> List[Dict[str, Any]]:
     """Fetch all PDF and EPUB documents from Readwise Reader."""
-    print("Fetching PDFs from Readwise...")
-    pdfs = fetch_all_documents(category='pdf')
-    print(f"Fetched {len(pdfs)} PDFs.")
+    print("Fetching PDFs and EPUBs from Readwise...")
+    by_category = fetch_documents_by_partition(categories=['pdf', 'epub'])
+    print(f"Fetched {len(by_category[('pdf', None)])} PDFs.")
+    print(f"Fetched {len(by_category[('epub', None)])} EPUBs.")
 
-    print("Fetching EPUBs from Readwise...")
-    epubs = fetch_all_documents(category='epub')
-    print(f"Fetched {len(epubs)} EPUBs.")
-
-    all_books = pdfs + epubs
+    all_books = merge_documents(by_category)
     print(f"Total books (PDFs + EPUBs): {len(all_books)}")
     return all_books
 
@@ -70,14 +68,12 @@ def get_recommendations_with_gemini(books: List[Dict[str, Any]]) -> str:
     try:
         # Simplified call structure, similar to summarize_me.py
         # Model name is passed directly, safety settings use defaults
-        response = client.models.generate_content(
+        recommendations = gemini_text(
+            client,
             model=model_name,
             contents=prompt
             )
 
-        # Simplified response handling
-        recommendations = response.text
-
         print("Received recommendations from Gemini.")
         return recommendations
 
@@ -2,8 +2,8 @@ import os
 from dotenv import load_dotenv
 from collections import defaultdict
 
-# Import the utility function
-from src.readwise.utils import fetch_all_documents
+# Import the utility functions
+from src.readwise.utils import fetch_documents_by_partition, merge_documents
 
 # Load environment variables
 load_dotenv()
@@ -13,16 +13,13 @@ load_dotenv()
 # READWISE_TOKEN = os.getenv("READWISE_TOKEN")
 
 def get_books():
-    """Fetch all PDF and EPUB documents using the utility function."""
-    print("Fetching PDFs...")
-    pdfs = fetch_all_documents(category='pdf')
-    print(f"Fetched {len(pdfs)} PDFs.")
+    """Fetch all PDF and EPUB documents, both categories at once."""
+    print("Fetching PDFs and EPUBs...")
+    by_category = fetch_documents_by_partition(categories=['pdf', 'epub'])
+    print(f"Fetched {len(by_category[('pdf', None)])} PDFs.")
+    print(f"Fetched {len(by_category[('epub', None)])} EPUBs.")
 
-    print("Fetching EPUBs...")
-    epubs = fetch_all_documents(category='epub')
-    print(f"Fetched {len(epubs)} EPUBs.")
-
-    return pdfs + epubs
+    return merge_documents(by_category)
 
 def group_books_by_location(books):
     """Group books by their location."""
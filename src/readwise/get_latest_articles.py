@@ -2,50 +2,27 @@
 # - Split by type (pdf, epub, etc) , probbablty want to prioriztize articles and books
 
 import requests
-import os
 from datetime import datetime, timedelta, timezone
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+from src.readwise import client
+from src.readwise.client import READER_LIST_URL as API_URL, READWISE_TOKEN
 
 # Configuration
-READWISE_TOKEN = os.getenv("READWISE_TOKEN")
-API_URL = "https://readwise.io/api/v3/list/"
 CUTOFF_DAYS = 7
 
 def fetch_recent_documents():
     """Fetch all documents updated in the last 7 days"""
     cutoff = datetime.now(timezone.utc) - timedelta(days=CUTOFF_DAYS)
-    all_docs = []
-    next_cursor = None
-
-    while True:
-        params = {"updatedAfter": cutoff.isoformat()}
-        if next_cursor:
-            params["pageCursor"] = next_cursor
-
-        response = requests.get(
-            API_URL,
-            headers={"Authorization": f"Token {READWISE_TOKEN}"},
-            params=params
-        )
-
-        if response.status_code != 200:
-            raise Exception(f"API Error: {response.status_code} - {response.text}")
-
-        data = response.json()
-        all_docs.extend(data["results"])
-        next_cursor = data.get("nextPageCursor")
-
-        if not next_cursor:
-            break
+    all_docs = client.iter_results(API_URL, params={"updatedAfter": cutoff.isoformat()})
 
     # Filter to only include documents saved in the last 7 days
-    recent_docs = [
-        doc for doc in all_docs
-        if doc.get("last_opened_at") and datetime.fromisoformat(doc.get("last_opened_at")).replace(tzinfo=timezone.utc) >= cutoff
-    ]
+    try:
+        recent_docs = [
+            doc for doc in all_docs
+            if doc.get("last_opened_at") and datetime.fromisoformat(doc.get("last_opened_at")).replace(tzinfo=timezone.utc) >= cutoff
+        ]
+    except requests.exceptions.HTTPError as e:
+        raise Exception(f"API Error: {e.response.status_code} - {e.response.text}") from e
 
     return recent_docs
 
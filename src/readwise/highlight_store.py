@@ -0,0 +1,225 @@
+"""Local SQLite mirror of the Readwise v2 highlights export.
+
+Books and highlights live in the same database as the Reader mirror
+(see `src.readwise.store`). After the first full export, only highlights
+updated since the stored watermark are fetched and upserted per book.
+"""
+
+import json
+import sqlite3
+from itertools import groupby
+from pathlib import Path
+from typing import Iterator, List, Dict, Any
+
+from src.checkpoint import CrawlCheckpoint
+from src.readwise import client, store
+
+EXPORT_SCOPE = "export"
+SYNC_COMMIT_EVERY = 100  # books
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    user_book_id INTEGER PRIMARY KEY,
+    title TEXT,
+    author TEXT,
+    category TEXT,
+    source TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_books_category ON books (category);
+
+CREATE TABLE IF NOT EXISTS highlights (
+    id INTEGER PRIMARY KEY,
+    book_id INTEGER NOT NULL,
+    highlighted_at TEXT,
+    updated_at TEXT,
+    is_favorite INTEGER NOT NULL DEFAULT 0,
+    has_note INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_highlights_book_id ON highlights (book_id);
+CREATE INDEX IF NOT EXISTS idx_highlights_highlighted_at ON highlights (highlighted_at);
+CREATE INDEX IF NOT EXISTS idx_highlights_updated_at ON highlights (updated_at);
+"""
+
+
+def connect(db_path: Path = None) -> sqlite3.Connection:
+    conn = store.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def upsert_book(conn: sqlite3.Connection, book: Dict[str, Any]) -> None:
+    """Store one export result (a book with its changed highlights)."""
+    book_data = {key: value for key, value in book.items() if key != "highlights"}
+    conn.execute(
+        """
+        INSERT INTO books (user_book_id, title, author, category, source, data)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_book_id) DO UPDATE SET
+            title = excluded.title,
+            author = excluded.author,
+            category = excluded.category,
+            source = excluded.source,
+            data = excluded.data
+        """,
+        (
+            book["user_book_id"],
+            book.get("title"),
+            book.get("author"),
+            book.get("category"),
+            book.get("source"),
+            json.dumps(book_data),
+        ),
+    )
+
+    highlights = book.get("highlights", [])
+    deleted = [(h["id"],) for h in highlights if h.get("is_deleted")]
+    live = [h for h in highlights if not h.get("is_deleted")]
+
+    if deleted:
+        conn.executemany("DELETE FROM highlights WHERE id = ?", deleted)
+    conn.executemany(
+        """
+        INSERT INTO highlights (id, book_id, highlighted_at, updated_at, is_favorite, has_note, data)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            book_id = excluded.book_id,
+            highlighted_at = excluded.highlighted_at,
+            updated_at = excluded.updated_at,
+            is_favorite = excluded.is_favorite,
+            has_note = excluded.has_note,
+            data = excluded.data
+        """,
+        [
+            (
+                h["id"],
+                book["user_book_id"],
+                h.get("highlighted_at"),
+                h.get("updated_at"),
+                int(bool(h.get("is_favorite"))),
+                int(bool(h.get("note"))),
+                json.dumps(h),
+            )
+            for h in live
+        ],
+    )
+
+
+def sync_highlights(full_refresh: bool = False, db_path: Path = None) -> int:
+    """Bring the local export mirror up to date. Returns the number of highlights fetched."""
+    conn = connect(db_path)
+    try:
+        if full_refresh:
+            conn.execute("DELETE FROM highlights")
+            conn.execute("DELETE FROM books")
+            # Not set_watermark: that would stamp `synced_at` before the crawl has
+            # succeeded, and `highlights.sync_if_stale` would trust the partial copy
+            store.clear_sync_state(conn, EXPORT_SCOPE)
+            conn.commit()
+            CrawlCheckpoint("highlights-export").complete()
+
+        updated_after = store.get_watermark(conn, EXPORT_SCOPE)
+        if updated_after:
+            print(f"Syncing highlights updated after {updated_after}...")
+        else:
+            print("No local copy of the highlights export, running a full crawl...")
+
+        params = {"updatedAfter": updated_after} if updated_after else {}
+        checkpoint = CrawlCheckpoint("highlights-export", params)
+
+        # Export pages are the largest responses we fetch, so they are decoded
+        # one book at a time instead of one page at a time.
+        fetched = 0
+        newest = updated_after
+        for books, book in enumerate(client.stream_results(client.EXPORT_URL, params=params, checkpoint=checkpoint), 1):
+            upsert_book(conn, book)
+            for highlight in book.get("highlights", []):
+                fetched += 1
+                if highlight.get("updated_at") and (newest is None or highlight["updated_at"] > newest):
+                    newest = highlight["updated_at"]
+
+            if books % SYNC_COMMIT_EVERY == 0:
+                conn.commit()
+                print(f"Synced {books} books. Highlights so far: {fetched}.")
+        conn.commit()
+        print(f"Finished syncing highlights. Highlights fetched: {fetched}.")
+
+        # Only move the watermark once the whole delta is stored.
+        checkpoint.verify()
+        store.set_watermark(conn, EXPORT_SCOPE, newest)
+        conn.commit()
+        checkpoint.complete()
+        return fetched
+    finally:
+        conn.close()
+
+
+def where_clause(
+    highlighted_after: str = None,
+    highlighted_before: str = None,
+    updated_after: str = None,
+    category: str = None,
+) -> tuple:
+    clauses = []
+    params = []
+    if highlighted_after:
+        clauses.append("h.highlighted_at >= ?")
+        params.append(highlighted_after)
+    if highlighted_before:
+        clauses.append("h.highlighted_at < ?")
+        params.append(highlighted_before)
+    if updated_after:
+        clauses.append("h.updated_at >= ?")
+        params.append(updated_after)
+    if category:
+        clauses.append("b.category = ?")
+        params.append(category)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def iter_books(
+    highlighted_after: str = None,
+    highlighted_before: str = None,
+    updated_after: str = None,
+    category: str = None,
+    db_path: Path = None,
+) -> Iterator[Dict[str, Any]]:
+    """Yield books in the v2 export shape, each with only its matching highlights.
+
+    Timestamps are compared as ISO strings, so bounds like '2024-01-01' work.
+    Books without a matching highlight are skipped.
+    """
+    where, params = where_clause(highlighted_after, highlighted_before, updated_after, category)
+    sql = (
+        "SELECT h.book_id, b.data AS book_data, h.data AS highlight_data "
+        "FROM highlights h JOIN books b ON b.user_book_id = h.book_id"
+        f"{where} ORDER BY h.book_id, h.id"
+    )
+
+    conn = connect(db_path)
+    try:
+        for _, rows in groupby(conn.execute(sql, params), key=lambda row: row["book_id"]):
+            rows = list(rows)
+            book = json.loads(rows[0]["book_data"])
+            book["highlights"] = [json.loads(row["highlight_data"]) for row in rows]
+            yield book
+    finally:
+        conn.close()
+
+
+def load_books(**filters) -> List[Dict[str, Any]]:
+    return list(iter_books(**filters))
+
+
+def query_highlights(**filters) -> List[Dict[str, Any]]:
+    """Return a flat list of highlights with `book_*` context fields attached."""
+    highlights = []
+    for book in iter_books(**filters):
+        for highlight in book["highlights"]:
+            highlight["book_title"] = book.get("title", "")
+            highlight["book_author"] = book.get("author", "")
+            highlight["book_category"] = book.get("category", "")
+            highlight["book_source"] = book.get("source", "")
+            highlights.append(highlight)
+    return highlights
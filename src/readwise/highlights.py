@@ -1,80 +1,69 @@
-import os
-from dotenv import load_dotenv
 import datetime
+import os
+import threading
 import requests
 from typing import List, Dict, Any, Optional
 
-# Load environment variables early
-load_dotenv()
+from src.readwise import highlight_store, store
+
+# A mirror synced more recently than this is queried as is, so several
+# scripts run back to back (newsletter, weekly prep) crawl the export once.
+SYNC_MAX_AGE_MINUTES = float(os.getenv("HIGHLIGHTS_SYNC_MAX_AGE_MINUTES", "60"))
+
+_recent_highlights: Dict[int, List[Dict[str, Any]]] = {}
+_recent_lock = threading.Lock()
+
+
+def sync_if_stale(max_age_minutes: float = SYNC_MAX_AGE_MINUTES) -> None:
+    """Delta-sync the highlights mirror unless it was synced in the last `max_age_minutes`."""
+    conn = highlight_store.connect()
+    try:
+        age = store.seconds_since_sync(conn, highlight_store.EXPORT_SCOPE)
+    finally:
+        conn.close()
+
+    if age is not None and age < max_age_minutes * 60:
+        print(f"Highlights were synced {age / 60:.0f} minutes ago, using the local copy.")
+        return
+
+    try:
+        highlight_store.sync_highlights()
+    except requests.exceptions.RequestException as e:
+        # Fall back to whatever is already stored locally
+        print(f"Error making API request: {e}")
+
 
-# Configuration
-READWISE_TOKEN = os.getenv("READWISE_TOKEN")
-API_URL = "https://readwise.io/api/v3/list/"
+def get_recent_highlights(days: int = 7, max_age_minutes: float = SYNC_MAX_AGE_MINUTES) -> List[Dict[str, Any]]:
+    """
+    Highlights updated in the last `days` days, with `book_*` fields attached.
+
+    This is the one entry point for "recent highlights": the mirror is synced
+    at most once per `max_age_minutes` (across processes) and the query result
+    is memoized for the rest of the process, so concurrent newsletter blocks
+    and the weekly prep script share a single crawl.
+    """
+    with _recent_lock:
+        if days not in _recent_highlights:
+            sync_if_stale(max_age_minutes)
+            # Export timestamps are UTC
+            since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=days)
+            _recent_highlights[days] = highlight_store.query_highlights(
+                updated_after=since.strftime('%Y-%m-%dT%H:%M:%S')
+            )
+        return list(_recent_highlights[days])
 
 
 def get_highlights_last_7_days() -> List[Dict[str, Any]]:
     """
     Fetch all highlights that were updated in the last 7 days from Readwise.
 
-    Args:
-        token (str): Your Readwise access token
+    Served by `get_recent_highlights`, so the export is crawled at most once
+    per run no matter how many callers ask.
 
     Returns:
         List[Dict[str, Any]]: List of all highlights from the last 7 days
     """
-    # Calculate the date 7 days ago
-    seven_days_ago = datetime.datetime.now() - datetime.timedelta(days=7)
-    updated_after = seven_days_ago.isoformat()
-
-    all_highlights = []
-    next_page_cursor = None
-
-    while True:
-        # Prepare request parameters
-        params = {'updatedAfter': updated_after}
-        if next_page_cursor:
-            params['pageCursor'] = next_page_cursor
-
-        try:
-            # Make the API request
-            response = requests.get(
-                url="https://readwise.io/api/v2/export/",
-                params=params,
-                headers={"Authorization": f"Token {READWISE_TOKEN}"},
-                verify=True
-            )
-
-            # Check if request was successful
-            response.raise_for_status()
-
-            # Parse the JSON response
-            data = response.json()
-
-            # Extract highlights from all books in this page
-            for book in data.get('results', []):
-                highlights = book.get('highlights', [])
-                # Add book metadata to each highlight for context
-                for highlight in highlights:
-                    highlight['book_title'] = book.get('title', '')
-                    highlight['book_author'] = book.get('author', '')
-                    highlight['book_category'] = book.get('category', '')
-                    highlight['book_source'] = book.get('source', '')
-
-                all_highlights.extend(highlights)
-
-            # Check if there are more pages
-            next_page_cursor = data.get('nextPageCursor')
-            if not next_page_cursor:
-                break
-
-        except requests.exceptions.RequestException as e:
-            print(f"Error making API request: {e}")
-            break
-        except KeyError as e:
-            print(f"Error parsing response: {e}")
-            break
-
-    return all_highlights
+    return get_recent_highlights(days=7)
 
 def filter_highlights_by_date_range(highlights: List[Dict[str, Any]],
                                   days: int = 7) -> List[Dict[str, Any]]:
@@ -4,159 +4,201 @@
 # when ai figures out my weaknesses i want to improve those
 
 import os
-import requests
 from dotenv import load_dotenv
 from google import genai
-from typing import List, Dict, Any
-from datetime import datetime
+from typing import List, Dict, Any, Tuple
+from datetime import datetime, timezone
+
+from src.llm_cache import cache, gemini_text
+from src.prompt_builder import PromptBuilder
+from src.prompt_packing import estimate_tokens, pack, prompt_budget, recency_score
+from src.readwise.utils import fetch_documents_by_partition
 
 # Load environment variables
 load_dotenv()
 
 # Configuration
-READWISE_TOKEN = os.getenv("READWISE_TOKEN")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-API_URL = "https://readwise.io/api/v3/list/"
-
-def fetch_all_documents(category=None, location=None):
-    """Fetch all documents from the Readwise Reader API, handling pagination."""
-    if not READWISE_TOKEN:
-        raise ValueError("Missing READWISE_TOKEN in environment variables. Ensure it's set in your .env file.")
-
-    all_docs = []
-    next_cursor = None
-
-    print(f"Starting fetch... Category: {category}, Location: {location}")
-
-    while True:
-        params = {}
-        if category:
-            params["category"] = category
-        if location:
-            params["location"] = location
-        if next_cursor:
-            params["pageCursor"] = next_cursor
-
-        print(f"Fetching page with params: {params}")
-        try:
-            response = requests.get(
-                API_URL,
-                headers={"Authorization": f"Token {READWISE_TOKEN}"},
-                params=params,
-                timeout=30
-            )
-            response.raise_for_status()
-
-        except requests.exceptions.RequestException as e:
-            print(f"Error during API request: {e}")
-            raise Exception(f"API Request Failed: {e}") from e
-
-        try:
-            data = response.json()
-        except requests.exceptions.JSONDecodeError as e:
-            print(f"Error decoding JSON response: {e}")
-            print(f"Response status code: {response.status_code}")
-            print(f"Response text: {response.text[:500]}...")
-            raise Exception("Failed to decode API response JSON.") from e
-
-        results = data.get("results", [])
-        all_docs.extend(results)
-        next_cursor = data.get("nextPageCursor")
-
-        print(f"Fetched {len(results)} documents. Total: {len(all_docs)}. Next cursor: {'Yes' if next_cursor else 'No'}")
-
-        if not next_cursor:
-            break
-
-    print(f"Finished fetching. Total documents: {len(all_docs)}")
-    return all_docs
 
 def fetch_documents_by_locations(locations: List[str]) -> Dict[str, List[Dict]]:
-    """Fetch documents from multiple locations and organize them by location."""
-    documents_by_location = {}
+    """Fetch documents from multiple locations at once and organize them by location."""
+    print(f"\n--- Fetching documents from {', '.join(repr(location) for location in locations)} ---")
+    try:
+        by_partition = fetch_documents_by_partition(locations=locations)
+    except Exception as e:
+        print(f"Error fetching documents: {e}")
+        return {location: [] for location in locations}
 
+    documents_by_location = {}
     for location in locations:
-        print(f"\n--- Fetching documents from '{location}' ---")
-        try:
-            docs = fetch_all_documents(location=location)
-            documents_by_location[location] = docs
-            print(f"Found {len(docs)} documents in '{location}'")
-        except Exception as e:
-            print(f"Error fetching documents from '{location}': {e}")
-            documents_by_location[location] = []
+        docs = by_partition[(None, location)]
+        documents_by_location[location] = docs
+        print(f"Found {len(docs)} documents in '{location}'")
 
     return documents_by_location
 
-def format_documents_for_analysis(documents_by_location: Dict[str, List[Dict]], max_chars: int = 800000) -> str:
-    """Format documents into a readable string for Gemini analysis with size limit."""
-    formatted_text = ""
+def format_document(doc: Dict) -> str:
+    """Format one Reader document as a prompt entry."""
+    title = doc.get('title', 'No title')
+    author = doc.get('author', 'Unknown author')
+    site_name = doc.get('site_name', '')
+    summary = doc.get('summary', '')
+    word_count = doc.get('word_count', 0)
+    reading_progress = doc.get('reading_progress', 0)
+    tags = doc.get('tags', {})
+    published_date = doc.get('published_date', '')
+
+    lines = [f"• {title}"]
+    if author and author != 'Unknown author':
+        lines.append(f" by {author}")
+    if site_name:
+        lines.append(f" ({site_name})")
+    lines.append("\n")
+
+    if summary:
+        lines.append(f"  Summary: {summary[:200]}{'...' if len(summary) > 200 else ''}\n")
+
+    if word_count:
+        lines.append(f"  Length: {word_count} words")
+        if reading_progress > 0:
+            lines.append(f" (Read: {int(reading_progress * 100)}%)")
+        lines.append("\n")
+
+    if tags:
+        tag_names = [tag.get('name', key) for key, tag in tags.items()]
+        if tag_names:
+            lines.append(f"  Tags: {', '.join(tag_names)}\n")
+
+    if published_date:
+        lines.append(f"  Published: {published_date}\n")
+
+    lines.append("\n")
+    return "".join(lines)
+
+def format_location_header(location: str, count: int) -> str:
+    return f"=== {location.upper()} ({count} documents) ===\n\n"
+
+def format_category_header(category: str, count: int) -> str:
+    return f"--- {category.upper()} ({count} items) ---\n"
+
+def build_documents_prompt(
+    documents_by_location: Dict[str, List[Dict]],
+    max_chars: int = 800000,
+    library_total: int = None,
+) -> PromptBuilder:
+    """Format documents into a `PromptBuilder` for Gemini analysis with size limit (None for no limit).
+
+    When the documents are a packed subset, `library_total` makes the header read "N of M".
+    """
+    output = PromptBuilder(max_chars=max_chars)
 
     total_docs = sum(len(docs) for docs in documents_by_location.values())
-    formatted_text += f"Total documents analyzed: {total_docs}\n\n"
+    of_total = f" of {library_total}" if library_total is not None else ""
+    output.add(f"Total documents analyzed: {total_docs}{of_total}\n\n")
 
     for location, docs in documents_by_location.items():
         if not docs:
             continue
 
-        formatted_text += f"=== {location.upper()} ({len(docs)} documents) ===\n\n"
+        output.add(format_location_header(location, len(docs)))
 
         # Group by category for better organization
         categories = {}
         for doc in docs:
-            category = doc.get('category', 'unknown')
-            if category not in categories:
-                categories[category] = []
-            categories[category].append(doc)
+            categories.setdefault(doc.get('category', 'unknown'), []).append(doc)
 
         for category, category_docs in categories.items():
-            formatted_text += f"--- {category.upper()} ({len(category_docs)} items) ---\n"
+            output.add(format_category_header(category, len(category_docs)))
 
             for doc in category_docs:
-                # Check if we're approaching the character limit
-                if len(formatted_text) > max_chars:
-                    formatted_text += "\n[TRUNCATED - Too many documents to include all details]\n"
-                    return formatted_text
+                if not output.add_if_fits(format_document(doc)):
+                    output.add("\n[TRUNCATED - Too many documents to include all details]\n")
+                    return output
 
-                title = doc.get('title', 'No title')
-                author = doc.get('author', 'Unknown author')
-                site_name = doc.get('site_name', '')
-                summary = doc.get('summary', '')
-                word_count = doc.get('word_count', 0)
-                reading_progress = doc.get('reading_progress', 0)
-                tags = doc.get('tags', {})
-                published_date = doc.get('published_date', '')
+            output.add("\n")
 
-                formatted_text += f"• {title}"
-                if author and author != 'Unknown author':
-                    formatted_text += f" by {author}"
-                if site_name:
-                    formatted_text += f" ({site_name})"
-                formatted_text += "\n"
+        output.add("\n")
 
-                if summary:
-                    formatted_text += f"  Summary: {summary[:200]}{'...' if len(summary) > 200 else ''}\n"
+    return output
 
-                if word_count:
-                    formatted_text += f"  Length: {word_count} words"
-                    if reading_progress > 0:
-                        formatted_text += f" (Read: {int(reading_progress * 100)}%)"
-                    formatted_text += "\n"
-
-                if tags:
-                    tag_names = [tag.get('name', key) for key, tag in tags.items()]
-                    if tag_names:
-                        formatted_text += f"  Tags: {', '.join(tag_names)}\n"
-
-                if published_date:
-                    formatted_text += f"  Published: {published_date}\n"
-
-                formatted_text += "\n"
+def format_documents_for_analysis(
+    documents_by_location: Dict[str, List[Dict]],
+    max_chars: int = 800000,
+    library_total: int = None,
+) -> str:
+    """Format documents into a readable string for Gemini analysis with size limit."""
+    return build_documents_prompt(documents_by_location, max_chars=max_chars, library_total=library_total).build()
 
-            formatted_text += "\n"
+def score_document(doc: Dict, now: datetime) -> float:
+    """Prompt priority of a document: recently saved, actually read and annotated ones first."""
+    age_days = None
+    saved_at = doc.get('saved_at') or doc.get('created_at')
+    if saved_at:
+        try:
+            age_days = (now - datetime.fromisoformat(saved_at.replace('Z', '+00:00'))).total_seconds() / 86400
+        except ValueError:
+            pass
+
+    score = 1.0 + recency_score(age_days)
+    score += doc.get('reading_progress') or 0
+    if (doc.get('notes') or '').strip():
+        score += 0.75
+    return score
+
+def pack_documents(
+    documents_by_location: Dict[str, List[Dict]],
+    budget_tokens: int,
+) -> Tuple[Dict[str, List[Dict]], Dict[str, int]]:
+    """Keep the documents that carry the most signal within `budget_tokens`.
+
+    Documents are scored with `score_document` and packed by score per token,
+    with a bonus for covering locations, categories, sites and tags that
+    aren't represented yet. The location and category headers a document
+    brings into the prompt are charged when the first document of its
+    (location, category) group is picked. Returns the same location ->
+    documents mapping holding only the chosen documents, and counts for
+    logging.
+    """
+    now = datetime.now(timezone.utc)
+    candidates = []
+    owners = []  # (location, document) per candidate
+    groups = []  # (location, category) per candidate
+    group_cost = {}
 
-        formatted_text += "\n"
+    for location, docs in documents_by_location.items():
+        category_counts = {}
+        for doc in docs:
+            category = doc.get('category', 'unknown')
+            category_counts[category] = category_counts.get(category, 0) + 1
+        for category, count in category_counts.items():
+            # Counts in the headers can only shrink, so the full ones are an upper bound.
+            # Every group pays for its location header too, which can only overcharge.
+            group_cost[(location, category)] = (
+                estimate_tokens(format_location_header(location, len(docs)))
+                + estimate_tokens(format_category_header(category, count) + "\n")
+            )
 
-    return formatted_text
+        for doc in docs:
+            keys = [f"location:{location}", f"category:{doc.get('category', 'unknown')}"]
+            if doc.get('site_name'):
+                keys.append(f"site:{doc['site_name']}")
+            keys.extend(f"tag:{tag.get('name', key)}" for key, tag in (doc.get('tags') or {}).items())
+            candidates.append((score_document(doc, now), estimate_tokens(format_document(doc)), keys))
+            owners.append((location, doc))
+            groups.append((location, doc.get('category', 'unknown')))
+
+    # The totals line at the top of the prompt
+    total = len(candidates)
+    budget_tokens = max(budget_tokens - estimate_tokens(f"Total documents analyzed: {total} of {total}\n\n"), 0)
+    chosen = pack(candidates, budget_tokens, group_of=groups, group_cost=group_cost)
+
+    packed = {location: [] for location in documents_by_location}
+    for i in chosen:
+        location, doc = owners[i]
+        packed[location].append(doc)
+    used_tokens = sum(candidates[i][1] for i in chosen)
+    used_tokens += sum(group_cost[group] for group in {groups[i] for i in chosen})
+    return packed, {'selected': len(chosen), 'total': len(candidates), 'used_tokens': used_tokens}
 
 def test_gemini_connection():
     """Test if the Gemini API key is working."""
@@ -176,18 +218,9 @@ def test_gemini_connection():
         print(f"✗ Gemini API connection failed: {e}")
         return False
 
-def analyze_reading_profile_with_gemini(documents_text: str) -> str:
-    """Use Gemini to analyze reading habits and create a comprehensive personality profile."""
-    if not GOOGLE_API_KEY:
-        raise ValueError("GOOGLE_API_KEY not found in environment variables. Ensure it's set in your .env file.")
-
-    client = genai.Client(api_key=GOOGLE_API_KEY)
-    # Use a more recent and stable model
-    model_name = "gemini-2.5-pro"
-
-    print(f"Using Gemini model: {model_name}")
-
-    prompt = f"""
+def build_profile_prompt(documents_text: str) -> str:
+    """Wrap formatted documents in the reading-profile prompt."""
+    return f"""
 Based on the following comprehensive list of documents from my Readwise Reader (organized by inbox, later, and archive), please create a detailed personality and intellectual profile of me as a person.
 
 Please analyze and provide insights on:
@@ -289,16 +322,28 @@ Here is my reading data:
 Please provide a comprehensive, thoughtful analysis that treats this as a serious intellectual and personal profiling exercise.
 """
 
+def analyze_reading_profile_with_gemini(documents_text: str) -> str:
+    """Use Gemini to analyze reading habits and create a comprehensive personality profile."""
+    if not GOOGLE_API_KEY:
+        raise ValueError("GOOGLE_API_KEY not found in environment variables. Ensure it's set in your .env file.")
+
+    client = genai.Client(api_key=GOOGLE_API_KEY)
+    # Use a more recent and stable model
+    model_name = "gemini-2.5-pro"
+
+    print(f"Using Gemini model: {model_name}")
+
+    prompt = build_profile_prompt(documents_text)
+
     print("\nSending request to Gemini API for comprehensive personality analysis...")
     print(f"Analyzing approximately {len(documents_text):,} characters of reading data...")
 
     try:
-        response = client.models.generate_content(
+        analysis = gemini_text(
+            client,
             model=model_name,
             contents=prompt
         )
-
-        analysis = response.text
         print("Received comprehensive personality analysis from Gemini.")
         return analysis
 
@@ -362,8 +407,15 @@ def main():
             print("No documents found. Please check your Readwise token and ensure you have documents saved.")
             return
 
+        # Pack as much signal as fits into the model's context window
         print(f"\nStep 2: Formatting {total_docs} documents for analysis...")
-        formatted_documents = format_documents_for_analysis(documents_by_location)
+        budget_tokens = prompt_budget(template_tokens=estimate_tokens(build_profile_prompt("")))
+        packed_documents, packing = pack_documents(documents_by_location, budget_tokens)
+        print(
+            f"Packed {packing['selected']:,} of {packing['total']:,} documents "
+            f"(~{packing['used_tokens']:,} of {budget_tokens:,} tokens)"
+        )
+        formatted_documents = format_documents_for_analysis(packed_documents, max_chars=None, library_total=total_docs)
 
         # Show a preview of what we're analyzing
         print(f"Document data preview (first 500 chars):")
@@ -390,6 +442,7 @@ def main():
 
         if filename:
             print(f"\n(Full analysis also saved to: {filename})")
+        cache.print_stats()
 
     except Exception as e:
         print(f"Error during analysis: {e}")
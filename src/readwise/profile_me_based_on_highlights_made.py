@@ -3,183 +3,301 @@
 # recommendations should be to challenge my thinking in terms of my blind spots.
 # when ai figures out my weaknesses i want to improve those
 
+import argparse
+import heapq
 import os
 import requests
 from dotenv import load_dotenv
 from google import genai
-from typing import List, Dict, Any
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Dict, Any, Tuple
+from datetime import datetime, timezone
+
+from src.llm_cache import cache, gemini_text
+from src.prompt_builder import PromptBuilder
+from src.prompt_packing import estimate_tokens, pack, prompt_budget, recency_score
+from src.readwise import highlight_store
+from src.readwise.client import READWISE_TOKEN
 
 # Load environment variables
 load_dotenv()
 
 # Configuration
-READWISE_TOKEN = os.getenv("READWISE_TOKEN")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-EXPORT_API_URL = "https://readwise.io/api/v2/export/"
-
-def fetch_all_highlights(updated_after=None):
-    """Fetch all highlights from the Readwise API using the export endpoint."""
-    if not READWISE_TOKEN:
-        raise ValueError("Missing READWISE_TOKEN in environment variables. Ensure it's set in your .env file.")
-
-    all_data = []
-    next_page_cursor = None
-
-    print("Starting highlights fetch...")
+PROFILE_MODEL = "gemini-2.5-pro"
 
-    while True:
-        params = {}
-        if next_page_cursor:
-            params['pageCursor'] = next_page_cursor
-        if updated_after:
-            params['updatedAfter'] = updated_after
+# Map-reduce mode: size of each slice's request (prompt template included, so the
+# default stays in Gemini's lower price tier) and how many are analyzed at once
+MAP_CHUNK_TOKENS = int(os.getenv("PROFILE_MAP_CHUNK_TOKENS", "200000"))
+MAP_MAX_WORKERS = int(os.getenv("PROFILE_MAP_MAX_WORKERS", "4"))
 
-        print(f"Fetching page with params: {params}")
-        try:
-            response = requests.get(
-                EXPORT_API_URL,
-                headers={"Authorization": f"Token {READWISE_TOKEN}"},
-                params=params,
-                timeout=30
-            )
-            response.raise_for_status()
+# Fixed text around the formatted books in a highlights prompt, reserved out of `max_chars`
+TRUNCATION_MARKER = "\n[TRUNCATED - Too many highlights to include all details]\n"
+SECTION_SEPARATOR = "\n"
+BOOK_SEPARATOR = "\n"
+COUNT_WIDTH = 12  # digits reserved per count in the headers
 
-        except requests.exceptions.RequestException as e:
-            print(f"Error during API request: {e}")
-            raise Exception(f"API Request Failed: {e}") from e
+def fetch_all_highlights(updated_after=None, stream=False):
+    """Fetch all highlights, syncing the local export mirror first.
 
-        try:
-            data = response.json()
-        except requests.exceptions.JSONDecodeError as e:
-            print(f"Error decoding JSON response: {e}")
-            print(f"Response status code: {response.status_code}")
-            print(f"Response text: {response.text[:500]}...")
-            raise Exception("Failed to decode API response JSON.") from e
+    With `stream=True` a generator is returned that reads one book at a time
+    from the local store instead of loading every book into a list.
+    """
+    if not READWISE_TOKEN:
+        raise ValueError("Missing READWISE_TOKEN in environment variables. Ensure it's set in your .env file.")
 
-        results = data.get("results", [])
-        all_data.extend(results)
-        next_page_cursor = data.get("nextPageCursor")
+    print("Starting highlights fetch...")
+    try:
+        highlight_store.sync_highlights()
+    except requests.exceptions.RequestException as e:
+        print(f"Error during API request: {e}")
+        raise Exception(f"API Request Failed: {e}") from e
 
-        total_highlights = sum(len(book.get('highlights', [])) for book in results)
-        print(f"Fetched {len(results)} books with {total_highlights} highlights. Total books: {len(all_data)}. Next cursor: {'Yes' if next_page_cursor else 'No'}")
+    if stream:
+        return highlight_store.iter_books(updated_after=updated_after)
 
-        if not next_page_cursor:
-            break
+    all_data = highlight_store.load_books(updated_after=updated_after)
 
     total_books = len(all_data)
     total_highlights = sum(len(book.get('highlights', [])) for book in all_data)
     print(f"Finished fetching. Total books: {total_books}, Total highlights: {total_highlights}")
     return all_data
 
-def format_highlights_for_analysis(books_data: List[Dict], max_chars: int = 800000) -> str:
-    """Format highlights into a readable string for Gemini analysis with size limit."""
-    formatted_text = ""
+def _tag_names(tags) -> List[str]:
+    return [tag.get('name', tag) if isinstance(tag, dict) else str(tag) for tag in tags]
+
+def format_highlight(highlight: Dict) -> str:
+    """Format one highlight (text, note, details, tags) as a prompt entry."""
+    text = highlight.get('text', '').strip()
+    if not text:
+        return ""
+
+    note = (highlight.get('note') or '').strip()
+    location = highlight.get('location')
+    color = highlight.get('color', '')
+    highlighted_at = highlight.get('highlighted_at', '')
+    tags = highlight.get('tags', [])
+    is_favorite = highlight.get('is_favorite', False)
+
+    lines = [f"• {text}\n"]
+    if note:
+        lines.append(f"  📝 Note: {note}\n")
+
+    details = []
+    if location:
+        details.append(f"Location: {location}")
+    if color:
+        details.append(f"Color: {color}")
+    if is_favorite:
+        details.append("⭐ Favorite")
+    if highlighted_at:
+        try:
+            # Parse and format the date
+            dt = datetime.fromisoformat(highlighted_at.replace('Z', '+00:00'))
+            details.append(f"Date: {dt.strftime('%Y-%m-%d')}")
+        except:
+            details.append(f"Date: {highlighted_at}")
+
+    if details:
+        lines.append(f"  ({' | '.join(details)})\n")
+
+    tag_names = _tag_names(tags)
+    if tag_names:
+        lines.append(f"  🏷️ Tags: {', '.join(tag_names)}\n")
+
+    lines.append("\n")
+    return "".join(lines)
+
+def format_book_header(book: Dict, highlight_count: int) -> str:
+    title = book.get('title', 'Unknown Title')
+    author = book.get('author', 'Unknown Author')
+    source = book.get('source', '')
+    source_url = book.get('source_url', '')
+    book_tags = book.get('book_tags', [])
+
+    lines = [f"--- {title}"]
+    if author and author != 'Unknown Author':
+        lines.append(f" by {author}")
+    lines.append(f" ({highlight_count} highlights) ---\n")
+
+    if source:
+        lines.append(f"Source: {source}\n")
+    if source_url:
+        lines.append(f"URL: {source_url}\n")
+    if book_tags:
+        lines.append(f"Book Tags: {', '.join(_tag_names(book_tags))}\n")
+
+    lines.append("\n")
+    return "".join(lines)
+
+def _totals_header(books: str, highlights: str) -> str:
+    return f"Total books/sources analyzed: {books}\nTotal highlights analyzed: {highlights}\n\n"
+
+def _section_header(category: str, books, highlights) -> str:
+    return f"=== {category.upper()} ({books} sources, {highlights} highlights) ===\n\n"
+
+def build_highlights_prompt(
+    books_data: Iterable[Dict],
+    max_chars: int = 800000,
+    library_totals: Tuple[int, int] = None,
+) -> PromptBuilder:
+    """Format highlights into a `PromptBuilder` for Gemini analysis with size limit (None for no limit).
+
+    `books_data` is consumed in a single pass, so it can be a generator such as
+    `highlight_store.iter_books()`; only the formatted parts are kept in memory.
+    Totals in the headers still cover every book, including truncated ones;
+    room for the headers and separators is reserved out of `max_chars`.
+    When `books_data` is a packed subset, pass the library's `(books,
+    highlights)` as `library_totals` so the headers say "N of M".
+    """
+    total_books = 0
+    total_highlights = 0
+    sections = {}  # category -> {'books', 'highlights', 'text'}, in first-seen order
+    truncated = False
+
+    # Headers are written at the end, once the counts are known; their size is
+    # reserved up front (with the widest counts) so the output stays in budget.
+    widest = "9" * COUNT_WIDTH
+    widest_total = f"{widest} of {widest}" if library_totals else widest
+    used_chars = len(_totals_header(widest_total, widest_total)) + len(TRUNCATION_MARKER)
 
-    # Calculate totals
-    total_books = len(books_data)
-    total_highlights = sum(len(book.get('highlights', [])) for book in books_data)
+    for book in books_data:
+        highlights = book.get('highlights', [])
+        category = book.get('category', 'unknown')
+        if category not in sections and not truncated:
+            used_chars += len(_section_header(category, widest, widest)) + len(SECTION_SEPARATOR)
+        section = sections.setdefault(category, {'books': 0, 'highlights': 0, 'text': PromptBuilder()})
+
+        total_books += 1
+        total_highlights += len(highlights)
+        section['books'] += 1
+        section['highlights'] += len(highlights)
+
+        # Past the limit we keep counting for the headers but stop formatting
+        if truncated or not highlights:
+            continue
+
+        # Check if we're approaching the character limit
+        if max_chars is not None and used_chars >= max_chars:
+            truncated = True
+            continue
+
+        # The book's block gets whatever is left of the overall budget, minus its closing newline
+        block = PromptBuilder(max_chars=max_chars - used_chars - len(BOOK_SEPARATOR) if max_chars is not None else None)
+        if not block.add_if_fits(format_book_header(book, len(highlights))):
+            truncated = True
+            continue
+
+        # Sort highlights by location if available
+        for highlight in sorted(highlights, key=lambda h: h.get('location', 0) or 0):
+            if not block.add_if_fits(format_highlight(highlight)):
+                truncated = True
+                break
+
+        block.add(BOOK_SEPARATOR)
+        section['text'].extend(block)
+        used_chars += len(block)
+
+    output = PromptBuilder()
+    books_line, highlights_line = f"{total_books}", f"{total_highlights}"
+    if library_totals:
+        books_line += f" of {library_totals[0]}"
+        highlights_line += f" of {library_totals[1]}"
+    output.add(_totals_header(books_line, highlights_line))
+
+    for category, section in sections.items():
+        if truncated and not section['text']:
+            continue
+        output.add(_section_header(category, section['books'], section['highlights']))
+        output.extend(section['text'])
+        output.add(SECTION_SEPARATOR)
+
+    if truncated:
+        output.add(TRUNCATION_MARKER)
+    output.truncated = truncated
+    return output
+
+def format_highlights_for_analysis(
+    books_data: Iterable[Dict],
+    max_chars: int = 800000,
+    library_totals: Tuple[int, int] = None,
+) -> str:
+    """Format highlights into a readable string for Gemini analysis with size limit."""
+    return build_highlights_prompt(books_data, max_chars=max_chars, library_totals=library_totals).build()
 
-    formatted_text += f"Total books/sources analyzed: {total_books}\n"
-    formatted_text += f"Total highlights analyzed: {total_highlights}\n\n"
+def score_highlight(highlight: Dict, now: datetime) -> float:
+    """Prompt priority of a highlight: recent, favourited and annotated ones first."""
+    age_days = None
+    if highlight.get('highlighted_at'):
+        try:
+            highlighted_at = datetime.fromisoformat(highlight['highlighted_at'].replace('Z', '+00:00'))
+            age_days = (now - highlighted_at).total_seconds() / 86400
+        except ValueError:
+            pass
+
+    score = 1.0 + recency_score(age_days)
+    if highlight.get('is_favorite'):
+        score += 1.0
+    if (highlight.get('note') or '').strip():
+        score += 0.75
+    return score
+
+def pack_highlights(books_data: Iterable[Dict], budget_tokens: int) -> Tuple[List[Dict], Dict[str, int]]:
+    """Keep the highlights that carry the most signal within `budget_tokens`.
+
+    Highlights are scored with `score_highlight` and packed by score per
+    token, with a bonus for covering categories, books and tags that aren't
+    represented yet. Returns the books (export shape, same order) holding
+    only their chosen highlights, and counts for logging and the prompt
+    headers (`total_books` / `total_highlights` cover the whole library).
+    """
+    now = datetime.now(timezone.utc)
+    books = []
+    total_highlights = 0
+    candidates = []
+    owners = []  # (book index, highlight) per candidate
+    book_headers = {}
 
-    # Group by category for better organization
-    categories = {}
     for book in books_data:
+        book_index = len(books)
+        books.append(book)
+        highlights = book.get('highlights', [])
+        total_highlights += len(highlights)
+        book_headers[book_index] = estimate_tokens(format_book_header(book, len(highlights)))
         category = book.get('category', 'unknown')
-        if category not in categories:
-            categories[category] = []
-        categories[category].append(book)
-
-    for category, category_books in categories.items():
-        category_highlights = sum(len(book.get('highlights', [])) for book in category_books)
-        formatted_text += f"=== {category.upper()} ({len(category_books)} sources, {category_highlights} highlights) ===\n\n"
 
-        for book in category_books:
-            highlights = book.get('highlights', [])
-            if not highlights:
+        for highlight in highlights:
+            entry = format_highlight(highlight)
+            if not entry:
                 continue
-
-            # Check if we're approaching the character limit
-            if len(formatted_text) > max_chars:
-                formatted_text += "\n[TRUNCATED - Too many highlights to include all details]\n"
-                return formatted_text
-
-            title = book.get('title', 'Unknown Title')
-            author = book.get('author', 'Unknown Author')
-            source = book.get('source', '')
-            source_url = book.get('source_url', '')
-            book_tags = book.get('book_tags', [])
-
-            formatted_text += f"--- {title}"
-            if author and author != 'Unknown Author':
-                formatted_text += f" by {author}"
-            formatted_text += f" ({len(highlights)} highlights) ---\n"
-
-            if source:
-                formatted_text += f"Source: {source}\n"
-            if source_url:
-                formatted_text += f"URL: {source_url}\n"
-            if book_tags:
-                tag_names = [tag.get('name', tag) if isinstance(tag, dict) else str(tag) for tag in book_tags]
-                formatted_text += f"Book Tags: {', '.join(tag_names)}\n"
-
-            formatted_text += "\n"
-
-            # Sort highlights by location if available
-            sorted_highlights = sorted(highlights, key=lambda h: h.get('location', 0) or 0)
-
-            for highlight in sorted_highlights:
-                if len(formatted_text) > max_chars:
-                    formatted_text += "\n[TRUNCATED - Character limit reached]\n"
-                    return formatted_text
-
-                text = highlight.get('text', '').strip()
-                note = highlight.get('note', '').strip()
-                location = highlight.get('location')
-                color = highlight.get('color', '')
-                highlighted_at = highlight.get('highlighted_at', '')
-                tags = highlight.get('tags', [])
-                is_favorite = highlight.get('is_favorite', False)
-
-                if not text:
-                    continue
-
-                formatted_text += f"• {text}\n"
-
-                if note:
-                    formatted_text += f"  📝 Note: {note}\n"
-
-                details = []
-                if location:
-                    details.append(f"Location: {location}")
-                if color:
-                    details.append(f"Color: {color}")
-                if is_favorite:
-                    details.append("⭐ Favorite")
-                if highlighted_at:
-                    try:
-                        # Parse and format the date
-                        dt = datetime.fromisoformat(highlighted_at.replace('Z', '+00:00'))
-                        details.append(f"Date: {dt.strftime('%Y-%m-%d')}")
-                    except:
-                        details.append(f"Date: {highlighted_at}")
-
-                if details:
-                    formatted_text += f"  ({' | '.join(details)})\n"
-
-                if tags:
-                    tag_names = [tag.get('name', tag) if isinstance(tag, dict) else str(tag) for tag in tags]
-                    if tag_names:
-                        formatted_text += f"  🏷️ Tags: {', '.join(tag_names)}\n"
-
-                formatted_text += "\n"
-
-            formatted_text += "\n"
-
-        formatted_text += "\n"
-
-    return formatted_text
+            keys = [f"category:{category}", f"book:{book_index}"]
+            keys.extend(f"tag:{name}" for name in _tag_names(highlight.get('tags', [])))
+            candidates.append((score_highlight(highlight, now), estimate_tokens(entry), keys))
+            owners.append((book_index, highlight))
+
+    chosen = pack(
+        candidates,
+        budget_tokens,
+        group_of=[book_index for book_index, _ in owners],
+        group_cost=book_headers,
+    )
+
+    kept = {}
+    used_tokens = 0
+    for i in chosen:
+        book_index, highlight = owners[i]
+        kept.setdefault(book_index, []).append(highlight)
+        used_tokens += candidates[i][1]
+    used_tokens += sum(book_headers[book_index] for book_index in kept)
+
+    packed = [dict(books[book_index], highlights=highlights) for book_index, highlights in sorted(kept.items())]
+    return packed, {
+        'selected': len(chosen),
+        'total': len(candidates),
+        'used_tokens': used_tokens,
+        'total_books': len(books),
+        'total_highlights': total_highlights,
+    }
 
 def test_gemini_connection():
     """Test if the Gemini API key is working."""
@@ -198,17 +316,9 @@ def test_gemini_connection():
         print(f"✗ Gemini API connection failed: {e}")
         return False
 
-def analyze_highlights_with_gemini(highlights_text: str) -> str:
-    """Use Gemini to analyze highlights and create a comprehensive personality profile."""
-    if not GOOGLE_API_KEY:
-        raise ValueError("GOOGLE_API_KEY not found in environment variables. Ensure it's set in your .env file.")
-
-    client = genai.Client(api_key=GOOGLE_API_KEY)
-    model_name = "gemini-2.5-pro"
-
-    print(f"Using Gemini model: {model_name}")
-
-    prompt = f"""
+def build_profile_prompt(highlights_text: str) -> str:
+    """Wrap formatted highlights in the profiling and recommendations prompt."""
+    return f"""
 Based on the following comprehensive collection of highlights from my Readwise account, please create the most detailed and insightful profile of me as a person that you possibly can. These highlights represent passages I found meaningful enough to save while reading books, articles, tweets, and other content.
 
 ## PART 1: COMPREHENSIVE PERSONAL PROFILE
@@ -302,16 +412,27 @@ Here are my highlights:
 Please provide a comprehensive, thoughtful analysis that treats this as a serious profiling and recommendation exercise. I want to learn as much as possible about myself and get genuinely useful suggestions for my continued growth and exploration.
 """
 
+def analyze_highlights_with_gemini(highlights_text: str) -> str:
+    """Use Gemini to analyze highlights and create a comprehensive personality profile."""
+    if not GOOGLE_API_KEY:
+        raise ValueError("GOOGLE_API_KEY not found in environment variables. Ensure it's set in your .env file.")
+
+    client = genai.Client(api_key=GOOGLE_API_KEY)
+    model_name = PROFILE_MODEL
+
+    print(f"Using Gemini model: {model_name}")
+
+    prompt = build_profile_prompt(highlights_text)
+
     print("\nSending request to Gemini API for comprehensive personality analysis...")
     print(f"Analyzing approximately {len(highlights_text):,} characters of highlight data...")
 
     try:
-        response = client.models.generate_content(
+        analysis = gemini_text(
+            client,
             model=model_name,
             contents=prompt
         )
-
-        analysis = response.text
         print("Received comprehensive personality analysis from Gemini.")
         return analysis
 
@@ -328,6 +449,148 @@ Please provide a comprehensive, thoughtful analysis that treats this as a seriou
 
         return f"Error analyzing highlights with Gemini: {e}"
 
+def _book_pieces(book: Dict, chunk_tokens: int) -> Iterable[Tuple[Dict, int]]:
+    """Yield `(book, tokens)` copies of a book, each holding a run of its highlights within `chunk_tokens`."""
+    highlights = book.get('highlights', [])
+    header_tokens = estimate_tokens(format_book_header(book, len(highlights)))
+    piece, tokens = [], header_tokens
+    for highlight in highlights:
+        cost = estimate_tokens(format_highlight(highlight))
+        if piece and tokens + cost > chunk_tokens:
+            yield dict(book, highlights=piece), tokens
+            piece, tokens = [], header_tokens
+        piece.append(highlight)
+        tokens += cost
+    if piece:
+        yield dict(book, highlights=piece), tokens
+
+def build_map_prompt(number: int, count: int, label: str, books: List[Dict]) -> str:
+    """The profile prompt for one slice of the library."""
+    return (
+        f"Note: this is slice {number} of {count} of my highlights ({label}). Base your analysis on this "
+        "slice only; it will be merged with the analyses of the other slices afterwards.\n"
+        + build_profile_prompt(format_highlights_for_analysis(books, max_chars=None))
+    )
+
+def shard_highlights(books_data: Iterable[Dict], chunk_tokens: int = MAP_CHUNK_TOKENS) -> List[Tuple[str, List[Dict]]]:
+    """Split books into `(label, books)` shards whose map prompts are roughly `chunk_tokens` each.
+
+    The prompt template, headers and safety margin are taken off
+    `chunk_tokens` before the highlights are divided up. Shards never mix
+    categories. Books stay whole where they fit; a book bigger than a shard
+    is spread over several, each with a slice of its highlights.
+    """
+    widest = "9" * COUNT_WIDTH
+    overhead = estimate_tokens(build_map_prompt(int(widest), int(widest), "x" * 80, [])) + estimate_tokens(
+        _section_header("x" * 40, widest, widest) + SECTION_SEPARATOR
+    )
+    chunk_tokens = max(prompt_budget(template_tokens=overhead, context_tokens=chunk_tokens), 1)
+
+    by_category = {}
+    for book in books_data:
+        if book.get('highlights'):
+            by_category.setdefault(book.get('category', 'unknown'), []).append(book)
+
+    shards = []
+    for category, books in by_category.items():
+        category_shards = []
+        shard, shard_tokens = [], 0
+        for book in books:
+            for piece, tokens in _book_pieces(book, chunk_tokens):
+                if shard and shard_tokens + tokens > chunk_tokens:
+                    category_shards.append(shard)
+                    shard, shard_tokens = [], 0
+                shard.append(piece)
+                shard_tokens += tokens
+        if shard:
+            category_shards.append(shard)
+
+        for i, shard in enumerate(category_shards, 1):
+            label = category if len(category_shards) == 1 else f"{category}, part {i} of {len(category_shards)}"
+            shards.append((label, shard))
+    return shards
+
+def build_reduce_prompt(partials: List[Tuple[str, str]]) -> str:
+    """Ask for one final profile merging the partial analyses of each shard."""
+    brief = build_profile_prompt("[one slice of my highlights]")
+    analyses = "\n\n".join(
+        f"### Partial analysis {i}: {label}\n\n{text}" for i, (label, text) in enumerate(partials, 1)
+    )
+    return f"""
+My Readwise highlights were too many for a single request, so they were split into {len(partials)} slices (by category) and each slice was analyzed separately with the brief below.
+
+=== BRIEF ===
+{brief}
+=== END OF BRIEF ===
+
+Merge the partial analyses that follow into ONE final answer to the brief, using the same structure. Weigh each partial by how much evidence it had, reconcile contradictions, drop duplicated points and recommendations, and keep the most specific references to highlighted passages.
+
+{analyses}
+"""
+
+def _generate(client, prompt: str) -> str:
+    return gemini_text(client, model=PROFILE_MODEL, contents=prompt)
+
+def analyze_highlights_map_reduce(shards: List[Tuple[str, List[Dict]]], max_workers: int = MAP_MAX_WORKERS) -> str:
+    """Analyze each shard with the profile prompt concurrently, then merge the partial profiles.
+
+    If the partials are too big to merge in one request, they are merged in
+    groups first, as many rounds as needed.
+    """
+    if not GOOGLE_API_KEY:
+        raise ValueError("GOOGLE_API_KEY not found in environment variables. Ensure it's set in your .env file.")
+
+    client = genai.Client(api_key=GOOGLE_API_KEY)
+    print(f"Using Gemini model: {PROFILE_MODEL}")
+
+    def analyze_shard(numbered_shard):
+        i, (label, books) = numbered_shard
+        prompt = build_map_prompt(i, len(shards), label, books)
+        try:
+            text = _generate(client, prompt)
+            print(f"✓ Analyzed slice {i}/{len(shards)} ({label})")
+            return label, text
+        except Exception as e:
+            print(f"✗ Slice {i}/{len(shards)} ({label}) failed: {e}")
+            return label, None
+
+    print(f"\nAnalyzing {len(shards)} slices with up to {max_workers} concurrent requests...")
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        partials = [(label, text) for label, text in executor.map(analyze_shard, enumerate(shards, 1)) if text]
+
+    if not partials:
+        return "Error analyzing highlights with Gemini: every slice failed"
+    if len(partials) < len(shards):
+        print(f"Continuing with {len(partials)} of {len(shards)} slices.")
+
+    budget_tokens = prompt_budget()
+    try:
+        while len(partials) > 1 and estimate_tokens(build_reduce_prompt(partials)) > budget_tokens:
+            # Merge neighbouring partials in groups that each fit into one request
+            groups, group = [], []
+            for partial in partials:
+                if group and estimate_tokens(build_reduce_prompt(group + [partial])) > budget_tokens:
+                    groups.append(group)
+                    group = []
+                group.append(partial)
+            groups.append(group)
+            if len(groups) == len(partials):
+                break  # no two partials fit in one request; send them all together anyway
+            print(f"Merging {len(partials)} partial analyses in {len(groups)} groups...")
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                merged = list(executor.map(lambda group: _generate(client, build_reduce_prompt(group)), groups))
+            partials = [(f"merged group {i}", text) for i, text in enumerate(merged, 1)]
+
+        if len(partials) == 1:
+            return partials[0][1]
+        print(f"Merging {len(partials)} partial analyses into the final profile...")
+        analysis = _generate(client, build_reduce_prompt(partials))
+        print("Received comprehensive personality analysis from Gemini.")
+        return analysis
+    except Exception as e:
+        print(f"Error merging analyses with Gemini: {e}")
+        return f"Error analyzing highlights with Gemini: {e}"
+
 def save_analysis_to_file(analysis: str, filename: str = None):
     """Save the analysis to a file with timestamp."""
     if not filename:
@@ -350,60 +613,77 @@ def save_analysis_to_file(analysis: str, filename: str = None):
         print(f"Error saving analysis to file: {e}")
         return None
 
-def generate_highlights_summary(books_data: List[Dict]) -> Dict[str, Any]:
-    """Generate a summary of the highlights data."""
-    total_books = len(books_data)
-    total_highlights = sum(len(book.get('highlights', [])) for book in books_data)
-
-    # Category breakdown
+def generate_highlights_summary(books_data: Iterable[Dict]) -> Dict[str, Any]:
+    """Generate a summary of the highlights data in a single pass over `books_data`."""
+    total_books = 0
+    total_highlights = 0
     categories = {}
-    for book in books_data:
+    top_books = []  # min-heap of (highlight count, order, title, author)
+    all_tags = set()
+    earliest = None
+    latest = None
+    total_dates = 0
+
+    for order, book in enumerate(books_data):
+        highlights = book.get('highlights', [])
+        total_books += 1
+        total_highlights += len(highlights)
+
+        # Category breakdown
         category = book.get('category', 'unknown')
         if category not in categories:
             categories[category] = {'books': 0, 'highlights': 0}
         categories[category]['books'] += 1
-        categories[category]['highlights'] += len(book.get('highlights', []))
+        categories[category]['highlights'] += len(highlights)
 
-    # Most highlighted books
-    books_by_highlights = sorted(books_data, key=lambda b: len(b.get('highlights', [])), reverse=True)
-    top_books = books_by_highlights[:10]
+        # Most highlighted books
+        entry = (len(highlights), -order, book.get('title', 'Unknown'), book.get('author', 'Unknown'))
+        if len(top_books) < 10:
+            heapq.heappush(top_books, entry)
+        else:
+            heapq.heappushpop(top_books, entry)
 
-    # Collect all tags
-    all_tags = set()
-    for book in books_data:
-        for highlight in book.get('highlights', []):
+        for highlight in highlights:
+            # Collect all tags
             for tag in highlight.get('tags', []):
                 tag_name = tag.get('name', tag) if isinstance(tag, dict) else str(tag)
                 all_tags.add(tag_name)
 
-    # Time analysis
-    highlight_dates = []
-    for book in books_data:
-        for highlight in book.get('highlights', []):
+            # Time analysis
             date_str = highlight.get('highlighted_at')
             if date_str:
                 try:
                     dt = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                    highlight_dates.append(dt)
                 except:
-                    pass
+                    continue
+                total_dates += 1
+                earliest = dt if earliest is None or dt < earliest else earliest
+                latest = dt if latest is None or dt > latest else latest
 
     return {
         'total_books': total_books,
         'total_highlights': total_highlights,
         'categories': categories,
-        'top_books': [(book.get('title', 'Unknown'), book.get('author', 'Unknown'), len(book.get('highlights', []))) for book in top_books],
+        'top_books': [(title, author, count) for count, _, title, author in sorted(top_books, reverse=True)],
         'total_tags': len(all_tags),
         'tags': sorted(list(all_tags)),
         'date_range': {
-            'earliest': min(highlight_dates) if highlight_dates else None,
-            'latest': max(highlight_dates) if highlight_dates else None,
-            'total_dates': len(highlight_dates)
+            'earliest': earliest,
+            'latest': latest,
+            'total_dates': total_dates
         }
     }
 
 def main():
     """Main function to orchestrate the comprehensive highlights-based analysis."""
+    parser = argparse.ArgumentParser(description='Profile me based on my Readwise highlights')
+    parser.add_argument('--map-reduce', action='store_true',
+                        help='Analyze the whole library in slices and merge the results, instead of packing one prompt')
+    parser.add_argument('--chunk-tokens', type=int, default=MAP_CHUNK_TOKENS,
+                        help='Approximate prompt tokens per slice request')
+    parser.add_argument('--workers', type=int, default=MAP_MAX_WORKERS, help='Slices analyzed concurrently')
+    args = parser.parse_args()
+
     print("=== Comprehensive Readwise Highlights Profile & Recommendations ===\n")
 
     # Test API connections first
@@ -413,20 +693,20 @@ def main():
         return
 
     try:
-        # Fetch all highlights
+        # Fetch all highlights (streamed from the local store, one book at a time)
         print("\nStep 1: Fetching all highlights from Readwise...")
-        books_data = fetch_all_highlights()
+        books_data = fetch_all_highlights(stream=True)
+
+        # Generate summary
+        print(f"\nStep 2: Analyzing highlights...")
+        summary = generate_highlights_summary(books_data)
 
         # Check if we have any highlights
-        total_highlights = sum(len(book.get('highlights', [])) for book in books_data)
+        total_highlights = summary['total_highlights']
         if total_highlights == 0:
             print("No highlights found. Please check your Readwise token and ensure you have highlights saved.")
             return
 
-        # Generate summary
-        print(f"\nStep 2: Analyzing {len(books_data)} books with {total_highlights} highlights...")
-        summary = generate_highlights_summary(books_data)
-
         print(f"\n📊 HIGHLIGHTS SUMMARY:")
         print(f"   • Total sources: {summary['total_books']}")
         print(f"   • Total highlights: {summary['total_highlights']}")
@@ -447,18 +727,36 @@ def main():
             for i, (title, author, count) in enumerate(summary['top_books'][:5], 1):
                 print(f"   {i}. {title} by {author} ({count} highlights)")
 
-        # Format highlights for analysis
-        print(f"\nStep 3: Formatting highlights for comprehensive analysis...")
-        formatted_highlights = format_highlights_for_analysis(books_data)
+        if args.map_reduce:
+            print(f"\nStep 3: Splitting highlights into slices of ~{args.chunk_tokens:,} tokens...")
+            shards = shard_highlights(highlight_store.iter_books(), chunk_tokens=args.chunk_tokens)
+            print(f"Split into {len(shards)} slices: {', '.join(label for label, _ in shards)}")
+
+            print(f"\nStep 4: Sending slices to Gemini and merging the partial profiles...")
+            analysis = analyze_highlights_map_reduce(shards, max_workers=args.workers)
+        else:
+            # Pack as much signal as fits into the model's context window
+            print(f"\nStep 3: Formatting highlights for comprehensive analysis...")
+            budget_tokens = prompt_budget(template_tokens=estimate_tokens(build_profile_prompt("")))
+            packed_books, packing = pack_highlights(highlight_store.iter_books(), budget_tokens)
+            print(
+                f"Packed {packing['selected']:,} of {packing['total']:,} highlights "
+                f"(~{packing['used_tokens']:,} of {budget_tokens:,} tokens)"
+            )
+            formatted_highlights = format_highlights_for_analysis(
+                packed_books,
+                max_chars=None,
+                library_totals=(packing['total_books'], packing['total_highlights']),
+            )
 
-        # Show a preview
-        print(f"Highlights data preview (first 500 chars):")
-        print("-" * 50)
-        print(formatted_highlights[:500] + "..." if len(formatted_highlights) > 500 else formatted_highlights)
-        print("-" * 50)
+            # Show a preview
+            print(f"Highlights data preview (first 500 chars):")
+            print("-" * 50)
+            print(formatted_highlights[:500] + "..." if len(formatted_highlights) > 500 else formatted_highlights)
+            print("-" * 50)
 
-        print(f"\nStep 4: Sending to Gemini for comprehensive personality analysis and recommendations...")
-        analysis = analyze_highlights_with_gemini(formatted_highlights)
+            print(f"\nStep 4: Sending to Gemini for comprehensive personality analysis and recommendations...")
+            analysis = analyze_highlights_with_gemini(formatted_highlights)
 
         # Check if analysis was successful
         if analysis.startswith("Error analyzing"):
@@ -475,6 +773,7 @@ def main():
 
         if filename:
             print(f"\n(Full analysis also saved to: {filename})")
+        cache.print_stats()
 
     except Exception as e:
         print(f"Error during analysis: {e}")
@@ -1,116 +1,30 @@
-import os
+import argparse
 import requests
-from datetime import datetime
-from dotenv import load_dotenv
-from collections import defaultdict
-
-def fetch_read_content_2024():
-    load_dotenv()
-    token = os.getenv('READWISE_TOKEN')
-    if not token:
+from datetime import date, timedelta
+
+from src.readwise import client, reading_rollups, store
+
+def sync_read_content(rebuild=False):
+    """Delta-sync the Reader mirror and fold the changes into the reading rollups."""
+    if not client.READWISE_TOKEN:
         raise ValueError("READWISE_TOKEN not found in environment variables")
 
-    def fetch_reader_document_list_api(location='archive'):
-        full_data = []
-        next_page_cursor = None
-
-        while True:
-            params = {'location': location}
-            if next_page_cursor:
-                params['pageCursor'] = next_page_cursor
-
-            response = requests.get(
-                url="https://readwise.io/api/v3/list/",
-                params=params,
-                headers={"Authorization": f"Token {token}"},
-            )
-
-            if response.status_code != 200:
-                print(f"Error: {response.status_code}")
-                break
-
-            data = response.json()
-            full_data.extend(data['results'])
-            next_page_cursor = data.get('nextPageCursor')
-
-            if not next_page_cursor:
-                break
-
-        return full_data
-
-    archived_docs = fetch_reader_document_list_api()
-
-    read_in_2024 = []
-    for doc in archived_docs:
-        last_moved_at = datetime.fromisoformat(doc['last_moved_at'].replace('Z', '+00:00'))
-        if last_moved_at.year == 2024:
-            read_in_2024.append({
-                'title': doc['title'],
-                'author': doc['author'] or 'Unknown',
-                'category': doc['category'] or 'Uncategorized',
-                'completed_date': last_moved_at,
-                'word_count': doc['word_count'] or 0,  # Convert None to 0
-                'reading_progress': doc.get('reading_progress', 0) or 0  # Convert None to 0
-            })
-
-    return read_in_2024
-
-def calculate_statistics(content):
-    stats = {
-        'total_items': len(content),
-        'by_category': defaultdict(int),
-        'words_by_category': defaultdict(int),
-        'by_month': defaultdict(int),
-        'authors': defaultdict(int),
-        'total_words': 0,
-        'avg_words_per_item': 0,
-        'completed_items': 0,
-        'partially_read': 0,
-        'items_with_word_count': 0  # New counter for items with valid word count
-    }
-
-    month_names = {
-        1: "January", 2: "February", 3: "March", 4: "April",
-        5: "May", 6: "June", 7: "July", 8: "August",
-        9: "September", 10: "October", 11: "November", 12: "December"
-    }
-
-    for item in content:
-        # Category counts
-        stats['by_category'][item['category']] += 1
-
-        # Word counts by category (only if word_count exists)
-        word_count = item['word_count']
-        if word_count > 0:  # Only count if we have a valid word count
-            stats['words_by_category'][item['category']] += word_count
-            stats['total_words'] += word_count
-            stats['items_with_word_count'] += 1
-
-        # Monthly distribution
-        month = item['completed_date'].month
-        stats['by_month'][month_names[month]] += 1
-
-        # Author statistics
-        stats['authors'][item['author']] += 1
-
-        # Reading progress
-        progress = item['reading_progress']
-        if progress >= 0.9:
-            stats['completed_items'] += 1
-        elif progress > 0:
-            stats['partially_read'] += 1
-
-    # Calculate averages (only for items with word count)
-    if stats['items_with_word_count'] > 0:
-        stats['avg_words_per_item'] = stats['total_words'] / stats['items_with_word_count']
+    try:
+        store.sync_documents()
+    except requests.exceptions.HTTPError as e:
+        print(f"Error: {e.response.status_code}. Using the local copy.")
 
-    return stats
+    reading_rollups.refresh_rollups(rebuild=rebuild)
+
+def calculate_statistics(start=None, end=None):
+    """Reading statistics for documents archived in `[start, end)`, read from the rollups."""
+    return reading_rollups.query_rollups(start=start, end=end)
 
 def format_number(num):
     return f"{num:,}"
 
-def print_statistics(stats):
-    print("\n📚 READING STATISTICS 2024 📚")
+def print_statistics(stats, label):
+    print(f"\n📚 READING STATISTICS {label} 📚")
     print("=" * 50)
 
     print("\n📊 OVERALL METRICS")
@@ -125,14 +39,15 @@ def print_statistics(stats):
     print("\n📑 BREAKDOWN BY CATEGORY")
     print("-" * 40)
     for category, count in sorted(stats['by_category'].items(), key=lambda x: x[1], reverse=True):
-        words = stats['words_by_category'][category]
+        words = stats['words_by_category'].get(category, 0)
         avg_words = words / count if count > 0 else 0
         print(f"{category.title():12} : {count:3} items | {format_number(words):10} words | avg: {format_number(int(avg_words))} words/item")
 
     print("\n📅 MONTHLY DISTRIBUTION")
     print("-" * 40)
-    for month, count in sorted(stats['by_month'].items(), key=lambda x: list(stats['by_month'].keys()).index(x[0])):
-        print(f"{month:12} : {count:3} items")
+    for month, count in stats['by_month'].items():
+        month_name = date.fromisoformat(f"{month}-01").strftime('%B %Y')
+        print(f"{month_name:15} : {count:3} items")
 
     print("\n✍️ TOP AUTHORS")
     print("-" * 40)
@@ -145,11 +60,34 @@ def print_statistics(stats):
     completion_rate = (stats['completed_items'] / stats['total_items'] * 100) if stats['total_items'] > 0 else 0
     print(f"\n📈 Completion Rate: {completion_rate:.1f}%")
 
+def parse_period(args):
+    """Turn the CLI flags into `(start, end, label)` with `end` exclusive."""
+    if args.days:
+        start = date.today() - timedelta(days=args.days - 1)
+        return start.isoformat(), None, f"LAST {args.days} DAYS"
+
+    year = args.year or date.today().year
+    if args.quarter:
+        first_month = 3 * (args.quarter - 1) + 1
+        start = date(year, first_month, 1)
+        end = date(year + 1, 1, 1) if args.quarter == 4 else date(year, first_month + 3, 1)
+        return start.isoformat(), end.isoformat(), f"Q{args.quarter} {year}"
+    return f"{year}-01-01", f"{year + 1}-01-01", str(year)
+
 def main():
+    parser = argparse.ArgumentParser(description='Reading statistics from the Reader archive')
+    parser.add_argument('--year', type=int, help='Year to report on (default: the current year)')
+    parser.add_argument('--quarter', type=int, choices=[1, 2, 3, 4], help='Only this quarter of --year')
+    parser.add_argument('--days', type=int, help='Rolling window of the last N days instead of a year')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild the rollups from the local mirror')
+    args = parser.parse_args()
+    start, end, label = parse_period(args)
+
     try:
-        content = fetch_read_content_2024()
-        stats = calculate_statistics(content)
-        print_statistics(stats)
+        sync_read_content(rebuild=args.rebuild)
+        client.print_stats()
+        stats = calculate_statistics(start=start, end=end)
+        print_statistics(stats, label=label)
 
     except ValueError as e:
         print(f"Error: {e}")
@@ -0,0 +1,184 @@
+"""Pre-aggregated reading statistics built from the local Reader mirror.
+
+Every archived document contributes one row to `reading_events` (the day it
+was archived, its category, author, word count and progress). Those rows are
+summed into `reading_rollups`, one row per day x category x author. Each
+refresh only looks at documents changed since the last one and re-sums just
+the days they touched, so answering a year, quarter or rolling window is a
+small range scan over the rollups.
+"""
+
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+
+from src.readwise import store
+
+ROLLUP_SCOPE = "reading_rollups"
+COMPLETED_PROGRESS = 0.9
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reading_events (
+    id TEXT PRIMARY KEY,
+    day TEXT NOT NULL,
+    category TEXT NOT NULL,
+    author TEXT NOT NULL,
+    word_count INTEGER NOT NULL,
+    completed INTEGER NOT NULL,
+    partial INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reading_events_day ON reading_events (day);
+
+CREATE TABLE IF NOT EXISTS reading_rollups (
+    day TEXT NOT NULL,
+    category TEXT NOT NULL,
+    author TEXT NOT NULL,
+    items INTEGER NOT NULL,
+    words INTEGER NOT NULL,
+    items_with_words INTEGER NOT NULL,
+    completed INTEGER NOT NULL,
+    partial INTEGER NOT NULL,
+    PRIMARY KEY (day, category, author)
+);
+"""
+
+
+def connect(db_path: Path = None) -> sqlite3.Connection:
+    conn = store.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _event_for(doc: Dict[str, Any]) -> Optional[tuple]:
+    """Turn a document into a `reading_events` row, or None if it isn't read yet."""
+    if doc.get("location") != "archive" or not doc.get("last_moved_at"):
+        return None
+    progress = doc.get("reading_progress") or 0
+    return (
+        doc["id"],
+        doc["last_moved_at"][:10],  # timestamps are UTC
+        doc.get("category") or "Uncategorized",
+        doc.get("author") or "Unknown",
+        doc.get("word_count") or 0,
+        int(progress >= COMPLETED_PROGRESS),
+        int(0 < progress < COMPLETED_PROGRESS),
+    )
+
+
+def refresh_rollups(rebuild: bool = False, db_path: Path = None) -> int:
+    """Fold documents changed since the last refresh into the rollups.
+
+    Reads only the local mirror; call `store.sync_documents()` first to pull
+    new changes. Returns the number of documents looked at.
+    """
+    conn = connect(db_path)
+    try:
+        if rebuild:
+            conn.execute("DELETE FROM reading_events")
+            conn.execute("DELETE FROM reading_rollups")
+            store.set_watermark(conn, ROLLUP_SCOPE, None)
+
+        watermark = store.get_watermark(conn, ROLLUP_SCOPE)
+        sql = "SELECT id, updated_at, data FROM documents"
+        params = []
+        if watermark:
+            # >= so documents stored later with the same timestamp aren't missed
+            sql += " WHERE updated_at >= ?"
+            params.append(watermark)
+
+        touched_days: Set[str] = set()
+        newest = watermark
+        seen = 0
+        for row in conn.execute(sql, params).fetchall():
+            seen += 1
+            if row["updated_at"] and (newest is None or row["updated_at"] > newest):
+                newest = row["updated_at"]
+
+            old = conn.execute("SELECT day FROM reading_events WHERE id = ?", (row["id"],)).fetchone()
+            if old:
+                touched_days.add(old["day"])
+                conn.execute("DELETE FROM reading_events WHERE id = ?", (row["id"],))
+
+            event = _event_for(json.loads(row["data"]))
+            if event:
+                touched_days.add(event[1])
+                conn.execute("INSERT INTO reading_events VALUES (?, ?, ?, ?, ?, ?, ?)", event)
+
+        days = [(day,) for day in touched_days]
+        conn.executemany("DELETE FROM reading_rollups WHERE day = ?", days)
+        conn.executemany(
+            """
+            INSERT INTO reading_rollups
+            SELECT day, category, author,
+                   COUNT(*),
+                   SUM(CASE WHEN word_count > 0 THEN word_count ELSE 0 END),
+                   SUM(word_count > 0),
+                   SUM(completed),
+                   SUM(partial)
+            FROM reading_events WHERE day = ?
+            GROUP BY day, category, author
+            """,
+            days,
+        )
+        store.set_watermark(conn, ROLLUP_SCOPE, newest)
+        conn.commit()
+        print(f"Reading rollups refreshed: {seen} documents checked, {len(touched_days)} days re-aggregated.")
+        return seen
+    finally:
+        conn.close()
+
+
+def query_rollups(start: str = None, end: str = None, db_path: Path = None) -> Dict[str, Any]:
+    """Aggregate the rollups for days in `[start, end)` (ISO dates, either bound optional).
+
+    Returns totals plus per-category, per-month ('YYYY-MM') and per-author
+    breakdowns in the shape `reader_stats.print_statistics` expects.
+    """
+    clauses = []
+    params = []
+    if start:
+        clauses.append("day >= ?")
+        params.append(start)
+    if end:
+        clauses.append("day < ?")
+        params.append(end)
+    where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+
+    conn = connect(db_path)
+    try:
+        totals = conn.execute(
+            "SELECT COALESCE(SUM(items), 0) AS items, COALESCE(SUM(words), 0) AS words, "
+            "COALESCE(SUM(items_with_words), 0) AS items_with_words, "
+            "COALESCE(SUM(completed), 0) AS completed, COALESCE(SUM(partial), 0) AS partial "
+            f"FROM reading_rollups{where}",
+            params,
+        ).fetchone()
+        by_category = conn.execute(
+            f"SELECT category, SUM(items) AS items, SUM(words) AS words FROM reading_rollups{where} GROUP BY category",
+            params,
+        ).fetchall()
+        by_month = conn.execute(
+            f"SELECT substr(day, 1, 7) AS month, SUM(items) AS items FROM reading_rollups{where} "
+            "GROUP BY month ORDER BY month",
+            params,
+        ).fetchall()
+        authors = conn.execute(
+            f"SELECT author, SUM(items) AS items FROM reading_rollups{where} GROUP BY author",
+            params,
+        ).fetchall()
+    finally:
+        conn.close()
+
+    return {
+        'total_items': totals["items"],
+        'by_category': {row["category"]: row["items"] for row in by_category},
+        'words_by_category': {row["category"]: row["words"] for row in by_category},
+        'by_month': {row["month"]: row["items"] for row in by_month},
+        'authors': {row["author"]: row["items"] for row in authors},
+        'total_words': totals["words"],
+        'avg_words_per_item': totals["words"] / totals["items_with_words"] if totals["items_with_words"] else 0,
+        'completed_items': totals["completed"],
+        'partially_read': totals["partial"],
+        'items_with_word_count': totals["items_with_words"],
+    }
@@ -1,107 +1,85 @@
-import os
+import argparse
 import requests
-from datetime import datetime
-from dotenv import load_dotenv
-from collections import defaultdict
-
-def fetch_highlights_2024():
-    load_dotenv()
-    token = os.getenv('READWISE_TOKEN')
-    if not token:
-        raise ValueError("READWISE_TOKEN not found in environment variables")
-
-    def fetch_from_export_api():
-        full_data = []
-        next_page_cursor = None
-
-        while True:
-            params = {}
-            if next_page_cursor:
-                params['pageCursor'] = next_page_cursor
-
-            response = requests.get(
-                url="https://readwise.io/api/v2/export/",
-                headers={"Authorization": f"Token {token}"},
-                params=params
-            )
-
-            if response.status_code != 200:
-                raise Exception(f"API request failed with status code: {response.status_code}")
-
-            data = response.json()
-            full_data.extend(data['results'])
-            next_page_cursor = data.get('nextPageCursor')
-
-            if not next_page_cursor:
-                break
-
-        return full_data
-
-    return fetch_from_export_api()
-
-def analyze_2024_activity(data):
-    stats = {
-        'total_books': 0,
-        'total_highlights': 0,
-        'highlights_by_month': defaultdict(int),
-        'highlights_by_category': defaultdict(int),
-        'books_by_category': defaultdict(set),
-        'highlights_by_source': defaultdict(int),
-        'most_highlighted_books': defaultdict(int),
-        'total_notes': 0,
-        'books_with_notes': set(),
-        'favorite_highlights': 0
-    }
-
-    for book in data:
-        book_highlights_2024 = []
-
-        # Filter highlights from 2024
-        for highlight in book['highlights']:
-            if highlight.get('highlighted_at'):
-                highlight_date = datetime.fromisoformat(highlight['highlighted_at'].replace('Z', '+00:00'))
-                if highlight_date.year == 2024:
-                    book_highlights_2024.append(highlight)
-
-        if book_highlights_2024:
-            stats['total_books'] += 1
-            stats['total_highlights'] += len(book_highlights_2024)
+from datetime import date
 
-            # Category stats
-            category = book['category'] or 'uncategorized'
-            stats['books_by_category'][category].add(book['title'])
+import pandas as pd
 
-            for highlight in book_highlights_2024:
-                # Monthly distribution
-                highlight_date = datetime.fromisoformat(highlight['highlighted_at'].replace('Z', '+00:00'))
-                month = highlight_date.strftime('%B')
-                stats['highlights_by_month'][month] += 1
+from src.readwise import client, highlight_store
 
-                # Category distribution
-                stats['highlights_by_category'][category] += 1
+# Readwise timestamps are UTC but come as '...Z', '....123456Z' or '...+00:00';
+# cutting them to whole seconds lets pandas parse them with one fixed format.
+HIGHLIGHT_COLUMNS_SQL = """
+    SELECT h.id, h.book_id, substr(h.highlighted_at, 1, 19) AS highlighted_at, h.is_favorite, h.has_note,
+           b.title, b.category, b.source
+    FROM highlights h JOIN books b ON b.user_book_id = h.book_id
+"""
 
-                # Source distribution
-                stats['highlights_by_source'][book['source']] += 1
+def fetch_highlights(start=None, end=None, sync=True):
+    """Load highlights made in `[start, end)` into a DataFrame, one row per highlight.
 
-                # Book popularity
-                stats['most_highlighted_books'][book['title']] += 1
+    The local export mirror is synced first. Bounds are ISO dates such as
+    '2024-01-01'; the range is applied in SQL, and the timestamps are then
+    parsed in bulk into a UTC `highlighted_at` column.
+    """
+    if not client.READWISE_TOKEN:
+        raise ValueError("READWISE_TOKEN not found in environment variables")
 
-                # Notes stats
-                if highlight.get('note'):
-                    stats['total_notes'] += 1
-                    stats['books_with_notes'].add(book['title'])
+    if sync:
+        try:
+            highlight_store.sync_highlights()
+        except requests.exceptions.HTTPError as e:
+            raise Exception(f"API request failed with status code: {e.response.status_code}") from e
 
-                # Favorite highlights
-                if highlight.get('is_favorite'):
-                    stats['favorite_highlights'] += 1
+    where, params = highlight_store.where_clause(highlighted_after=start, highlighted_before=end)
+    if not where:
+        where = " WHERE h.highlighted_at IS NOT NULL"
 
-    return stats
+    conn = highlight_store.connect()
+    try:
+        frame = pd.read_sql_query(HIGHLIGHT_COLUMNS_SQL + where, conn, params=params)
+    finally:
+        conn.close()
+
+    frame["highlighted_at"] = pd.to_datetime(
+        frame["highlighted_at"], format="%Y-%m-%dT%H:%M:%S", utc=True, errors="coerce"
+    )
+    frame["category"] = frame["category"].fillna("").replace("", "uncategorized")
+    frame["source"] = frame["source"].fillna("unknown")
+    frame["title"] = frame["title"].fillna("")
+    frame["is_favorite"] = frame["is_favorite"].astype(bool)
+    frame["has_note"] = frame["has_note"].astype(bool)
+    return frame.dropna(subset=["highlighted_at"])
+
+def analyze_activity(frame):
+    """Aggregate a highlights frame from `fetch_highlights` into summary stats.
+
+    Every aggregate is a single group-by over the frame. Books are counted
+    by id, since two books can share a title, and months are keyed by
+    calendar month so multi-year ranges stay apart.
+    """
+    book_counts = frame["book_id"].value_counts()
+    titles = frame.drop_duplicates("book_id").set_index("book_id")["title"]
+    month_counts = frame.groupby(frame["highlighted_at"].dt.tz_localize(None).dt.to_period("M")).size()
+
+    return {
+        'total_books': frame["book_id"].nunique(),
+        'total_highlights': len(frame),
+        'highlights_by_month': month_counts.sort_index().to_dict(),
+        'highlights_by_category': frame["category"].value_counts().to_dict(),
+        'books_by_category': frame.groupby("category")["book_id"].nunique().to_dict(),
+        'highlights_by_source': frame["source"].value_counts().to_dict(),
+        # (title, count) per book, most highlighted first
+        'most_highlighted_books': [(titles[book_id], int(count)) for book_id, count in book_counts.items()],
+        'total_notes': int(frame["has_note"].sum()),
+        'books_with_notes': frame.loc[frame["has_note"], "book_id"].nunique(),
+        'favorite_highlights': int(frame["is_favorite"].sum()),
+    }
 
 def format_number(num):
     return f"{num:,}"
 
-def print_statistics(stats):
-    print("\n📚 READWISE ACTIVITY SUMMARY 2024 📚")
+def print_statistics(stats, label):
+    print(f"\n📚 READWISE ACTIVITY SUMMARY {label} 📚")
     print("=" * 50)
 
     print("\n📊 OVERALL METRICS")
@@ -113,20 +91,17 @@ def print_statistics(stats):
     print("\n📑 HIGHLIGHTS BY CATEGORY")
     print("-" * 40)
     for category, count in sorted(stats['highlights_by_category'].items(), key=lambda x: x[1], reverse=True):
-        books_count = len(stats['books_by_category'][category])
+        books_count = stats['books_by_category'].get(category, 0)
         print(f"{category.title():15} : {count:5} highlights across {books_count:3} sources")
 
     print("\n📅 MONTHLY DISTRIBUTION")
     print("-" * 40)
-    for month in ['January', 'February', 'March', 'April', 'May', 'June',
-                 'July', 'August', 'September', 'October', 'November', 'December']:
-        if count := stats['highlights_by_month'].get(month, 0):
-            print(f"{month:12} : {count:5} highlights")
+    for month, count in stats['highlights_by_month'].items():
+        print(f"{month.strftime('%B %Y'):15} : {count:5} highlights")
 
     print("\n📖 TOP 5 MOST HIGHLIGHTED SOURCES")
     print("-" * 40)
-    top_books = sorted(stats['most_highlighted_books'].items(), key=lambda x: x[1], reverse=True)[:5]
-    for book, count in top_books:
+    for book, count in stats['most_highlighted_books'][:5]:
         print(f"{book[:50]:52} : {count:3} highlights")
 
     print("\n🔍 SOURCE DISTRIBUTION")
@@ -134,12 +109,28 @@ def print_statistics(stats):
     for source, count in sorted(stats['highlights_by_source'].items(), key=lambda x: x[1], reverse=True):
         print(f"{source:15} : {count:5} highlights")
 
+def parse_period(args):
+    """Turn the CLI flags into `(start, end, label)`; no flags means the whole history."""
+    if args.year:
+        return f"{args.year}-01-01", f"{args.year + 1}-01-01", str(args.year)
+    if args.start or args.end:
+        return args.start, args.end, f"{args.start or 'START'} – {args.end or date.today().isoformat()}"
+    return None, None, "ALL TIME"
+
 def main():
+    parser = argparse.ArgumentParser(description='Summarize Readwise highlighting activity')
+    parser.add_argument('--year', type=int, help='Calendar year to summarize')
+    parser.add_argument('--start', type=str, help='Start date (inclusive), e.g. 2023-06-01')
+    parser.add_argument('--end', type=str, help='End date (exclusive), e.g. 2024-06-01')
+    args = parser.parse_args()
+    start, end, label = parse_period(args)
+
     try:
         print("Fetching Readwise data...")
-        data = fetch_highlights_2024()
-        stats = analyze_2024_activity(data)
-        print_statistics(stats)
+        frame = fetch_highlights(start=start, end=end)
+        client.print_stats()
+        stats = analyze_activity(frame)
+        print_statistics(stats, label=label)
 
     except Exception as e:
         print(f"An error occurred: {e}")
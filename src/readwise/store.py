@@ -0,0 +1,205 @@
+"""Local SQLite mirror of the Reader v3 document list.
+
+The first sync for a category crawls everything; after that only documents
+updated since the stored watermark are fetched and upserted, and callers read
+from the local table.
+"""
+
+import json
+import sqlite3
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from src.checkpoint import CrawlCheckpoint
+from src.readwise import client
+
+DB_PATH = Path.cwd() / "caches" / "readwise.sqlite3"
+ALL_SCOPE = "*"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id TEXT PRIMARY KEY,
+    category TEXT,
+    location TEXT,
+    updated_at TEXT,
+    last_moved_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_documents_category_location ON documents (category, location);
+CREATE INDEX IF NOT EXISTS idx_documents_location ON documents (location);
+CREATE INDEX IF NOT EXISTS idx_documents_updated_at ON documents (updated_at);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    scope TEXT PRIMARY KEY,
+    watermark TEXT,
+    synced_at TEXT
+);
+"""
+
+
+def connect(db_path: Path = None) -> sqlite3.Connection:
+    """Open the store, creating the file and schema if needed."""
+    db_path = Path(db_path or DB_PATH)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def get_watermark(conn: sqlite3.Connection, scope: str) -> Optional[str]:
+    row = conn.execute("SELECT watermark FROM sync_state WHERE scope = ?", (scope,)).fetchone()
+    return row["watermark"] if row else None
+
+
+def seconds_since_sync(conn: sqlite3.Connection, scope: str) -> Optional[float]:
+    """How long ago `scope` last finished syncing, or None if it never has."""
+    row = conn.execute(
+        "SELECT (julianday('now') - julianday(synced_at)) * 86400 AS age FROM sync_state WHERE scope = ?",
+        (scope,),
+    ).fetchone()
+    return row["age"] if row and row["age"] is not None else None
+
+
+def set_watermark(conn: sqlite3.Connection, scope: str, watermark: Optional[str]) -> None:
+    conn.execute(
+        """
+        INSERT INTO sync_state (scope, watermark, synced_at) VALUES (?, ?, datetime('now'))
+        ON CONFLICT(scope) DO UPDATE SET watermark = excluded.watermark, synced_at = excluded.synced_at
+        """,
+        (scope, watermark),
+    )
+
+
+def clear_sync_state(conn: sqlite3.Connection, scope: str) -> None:
+    """Forget `scope`'s watermark and last sync time, so the next sync starts from scratch."""
+    conn.execute("DELETE FROM sync_state WHERE scope = ?", (scope,))
+
+
+def upsert_documents(conn: sqlite3.Connection, docs: List[Dict[str, Any]]) -> None:
+    conn.executemany(
+        """
+        INSERT INTO documents (id, category, location, updated_at, last_moved_at, data)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            category = excluded.category,
+            location = excluded.location,
+            updated_at = excluded.updated_at,
+            last_moved_at = excluded.last_moved_at,
+            data = excluded.data
+        """,
+        [
+            (
+                doc["id"],
+                doc.get("category"),
+                doc.get("location"),
+                doc.get("updated_at"),
+                doc.get("last_moved_at"),
+                json.dumps(doc),
+            )
+            for doc in docs
+        ],
+    )
+
+
+def _scope_for(category: Optional[str]) -> str:
+    return category or ALL_SCOPE
+
+
+def sync_documents(category: str = None, full_refresh: bool = False, db_path: Path = None) -> int:
+    """Bring the local mirror up to date for one category (or the whole library).
+
+    Syncs are keyed by category only: a location filter on the server would
+    miss documents that moved out of that location, so locations are always
+    filtered locally. A full-library sync also counts as a sync of every
+    category. Returns the number of documents fetched.
+    """
+    scope = _scope_for(category)
+    conn = connect(db_path)
+    try:
+        if full_refresh:
+            CrawlCheckpoint("reader-documents", {"category": category} if category else {}).complete()
+            if category:
+                conn.execute("DELETE FROM documents WHERE category = ?", (category,))
+            else:
+                conn.execute("DELETE FROM documents")
+            set_watermark(conn, scope, None)
+            conn.commit()
+
+        watermarks = [get_watermark(conn, scope)]
+        if category:
+            watermarks.append(get_watermark(conn, ALL_SCOPE))
+        watermarks = [w for w in watermarks if w]
+        updated_after = max(watermarks) if watermarks else None
+
+        if updated_after:
+            print(f"Syncing Reader documents ({scope}) updated after {updated_after}...")
+        else:
+            print(f"No local copy for Reader documents ({scope}), running a full crawl...")
+
+        params = {}
+        if category:
+            params["category"] = category
+        if updated_after:
+            params["updatedAfter"] = updated_after
+
+        # A crawl that dies halfway resumes from its last page on the next run
+        # (the watermark hasn't moved, so the params and checkpoint match).
+        checkpoint = CrawlCheckpoint("reader-documents", params)
+
+        fetched = 0
+        newest = updated_after
+        pages = client.iter_pages(client.READER_LIST_URL, params=params, checkpoint=checkpoint)
+        for _, results, next_cursor in pages:
+            upsert_documents(conn, results)
+            conn.commit()
+
+            fetched += len(results)
+            for doc in results:
+                if doc.get("updated_at") and (newest is None or doc["updated_at"] > newest):
+                    newest = doc["updated_at"]
+
+            print(f"Synced {len(results)} documents. Total: {fetched}. Next cursor: {'Yes' if next_cursor else 'No'}")
+
+        # Only move the watermark once the whole delta is stored, so an
+        # interrupted sync is picked up again from the old watermark.
+        checkpoint.verify()
+        set_watermark(conn, scope, newest)
+        conn.commit()
+        checkpoint.complete()
+        return fetched
+    finally:
+        conn.close()
+
+
+def query_documents(
+    category: str = None,
+    location: str = None,
+    updated_after: str = None,
+    db_path: Path = None,
+) -> List[Dict[str, Any]]:
+    """Read documents from the local mirror, newest first."""
+    clauses = []
+    params = []
+    if category:
+        clauses.append("category = ?")
+        params.append(category)
+    if location:
+        clauses.append("location = ?")
+        params.append(location)
+    if updated_after:
+        clauses.append("updated_at > ?")
+        params.append(updated_after)
+
+    sql = "SELECT data FROM documents"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY updated_at DESC"
+
+    conn = connect(db_path)
+    try:
+        return [json.loads(row["data"]) for row in conn.execute(sql, params)]
+    finally:
+        conn.close()
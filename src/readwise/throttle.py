@@ -0,0 +1,94 @@
+"""Adaptive token-bucket throttle shared by every Readwise request.
+
+Readwise allows about 20 requests/minute on its list and export endpoints and
+answers 429 with a `Retry-After` header when we go over. The bucket starts at
+that rate, creeps up while requests succeed and halves whenever a 429 comes
+back, so long crawls settle just under the real limit.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+
+class AdaptiveThrottle:
+    def __init__(
+        self,
+        rate_per_minute: float = 20,
+        min_rate_per_minute: float = 2,
+        max_rate_per_minute: float = 60,
+        burst: int = 5,
+        increase_per_success: float = 0.5,
+    ):
+        self.rate = min(rate_per_minute, max_rate_per_minute)
+        self.min_rate = min_rate_per_minute
+        self.max_rate = max_rate_per_minute
+        self.burst = burst
+        self.increase_per_success = increase_per_success
+
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self.rate_limited = 0
+        self.waited_seconds = 0.0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate / 60)
+        self._last_refill = now
+
+    def acquire(self) -> None:
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._blocked_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._blocked_until - now, (1 - self._tokens) * 60 / self.rate)
+                self.waited_seconds += wait
+            time.sleep(wait)
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase_per_success)
+
+    def on_rate_limited(self, retry_after: Optional[float]) -> float:
+        """Back off after a 429. Returns how many seconds requests are paused for."""
+        with self._lock:
+            self.rate_limited += 1
+            self.rate = max(self.min_rate, self.rate / 2)
+            pause = retry_after if retry_after is not None else 60 / self.rate
+            self._blocked_until = max(self._blocked_until, time.monotonic() + pause)
+            self._tokens = 0
+            return pause
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a `Retry-After` header given either in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        # "-0000" dates parse as naive; they're UTC
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
+
+
+throttle = AdaptiveThrottle(
+    rate_per_minute=float(os.getenv("READWISE_RATE_PER_MINUTE", "20")),
+    max_rate_per_minute=float(os.getenv("READWISE_MAX_RATE_PER_MINUTE", "60")),
+    burst=int(os.getenv("READWISE_BURST", "5")),
+)
@@ -1,125 +1,128 @@
-import os
 import requests
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from itertools import product
 
-# Load environment variables early
-load_dotenv()
+from src.checkpoint import CrawlCheckpoint
+from src.readwise import client, store
+from src.readwise.client import READER_LIST_URL as API_URL, READWISE_TOKEN
 
-# Configuration
-READWISE_TOKEN = os.getenv("READWISE_TOKEN")
-API_URL = "https://readwise.io/api/v3/list/"
 
-def fetch_all_documents(category=None, location=None):
-    """Fetch all documents from the Readwise Reader API, handling pagination."""
+def fetch_all_documents(category=None, location=None, use_store=True, full_refresh=False):
+    """Fetch all documents from Readwise Reader.
+
+    By default the local SQLite mirror is delta-synced and the documents are
+    served from it. Pass `use_store=False` to crawl the API directly.
+    """
     if not READWISE_TOKEN:
         raise ValueError("Missing READWISE_TOKEN in environment variables. Ensure it's set in your .env file.")
 
-    all_docs = []
-    next_cursor = None
-
-    print(f"Starting fetch... Category: {category}, Location: {location}")
-
-    while True:
-        params = {}
-        if category:
-            params["category"] = category
-        if location:
-            params["location"] = location
-        if next_cursor:
-            params["pageCursor"] = next_cursor
-
-        print(f"Fetching page with params: {params}") # Debug print
+    if use_store:
+        print(f"Loading documents from local store... Category: {category}, Location: {location}")
         try:
-            response = requests.get(
-                API_URL,
-                headers={"Authorization": f"Token {READWISE_TOKEN}"},
-                params=params,
-                timeout=30 # Add a timeout
-            )
-            response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
-
+            store.sync_documents(category=category, full_refresh=full_refresh)
         except requests.exceptions.RequestException as e:
             print(f"Error during API request: {e}")
-            # Decide how to handle: retry, raise, return partial etc.
-            # For now, we'll raise an exception to stop the process
             raise Exception(f"API Request Failed: {e}") from e
 
-        try:
-            data = response.json()
-        except requests.exceptions.JSONDecodeError as e:
-             print(f"Error decoding JSON response: {e}")
-             print(f"Response status code: {response.status_code}")
-             print(f"Response text: {response.text[:500]}...") # Print start of response text
-             raise Exception("Failed to decode API response JSON.") from e
-
-        results = data.get("results", [])
-        all_docs.extend(results)
-        next_cursor = data.get("nextPageCursor")
-
-        print(f"Fetched {len(results)} documents. Total: {len(all_docs)}. Next cursor: {'Yes' if next_cursor else 'No'}")
+        all_docs = store.query_documents(category=category, location=location)
+        print(f"Finished loading. Total documents: {len(all_docs)}")
+        client.print_stats()
+        return all_docs
 
-        if not next_cursor:
-            break
+    print(f"Starting fetch... Category: {category}, Location: {location}")
+    checkpoint = CrawlCheckpoint("reader-fetch", {"category": category, "location": location})
+    all_docs = list(iter_documents(category=category, location=location, checkpoint=checkpoint))
+    checkpoint.verify()
+    checkpoint.complete()
 
     print(f"Finished fetching. Total documents: {len(all_docs)}")
+    client.print_stats()
     return all_docs
 
 
-def fetch_recently_archived_documents(days=7):
-    if not READWISE_TOKEN:
-        raise ValueError("Missing READWISE_TOKEN in environment variables. Ensure it's set in your .env file.")
+def iter_documents(category=None, location=None, updated_after=None, checkpoint=None):
+    """Yield documents straight from the Reader API, prefetching the next page while the caller works.
 
-    # Calculate the cutoff date (N days ago) - make it timezone-aware (UTC)
-    cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
-    cutoff_date_iso = cutoff_date.isoformat()
+    Pass a `CrawlCheckpoint` to make the crawl resumable after a failure.
+    """
+    params = {}
+    if category:
+        params["category"] = category
+    if location:
+        params["location"] = location
+    if updated_after:
+        params["updatedAfter"] = updated_after
 
-    print(f"Fetching documents updated since: {cutoff_date_iso}")
+    try:
+        yield from client.iter_results(API_URL, params=params, checkpoint=checkpoint)
+    except requests.exceptions.RequestException as e:
+        print(f"Error during API request: {e}")
+        # Decide how to handle: retry, raise, return partial etc.
+        # For now, we'll raise an exception to stop the process
+        raise Exception(f"API Request Failed: {e}") from e
 
-    all_docs = []
-    next_cursor = None
 
-    while True:
-        params = {
-            "updatedAfter": cutoff_date_iso
-        }
-        if next_cursor:
-            params["pageCursor"] = next_cursor
+def fetch_documents_by_partition(categories=None, locations=None, max_workers=4, use_store=True):
+    """Fetch every category x location partition concurrently.
 
-        print(f"Fetching page with params: {params}")
+    Returns a dict keyed by `(category, location)`. With the local store, each
+    category is synced once (in parallel) and the partitions are then read
+    locally; without it, each partition is crawled from the API in parallel.
+    """
+    if not READWISE_TOKEN:
+        raise ValueError("Missing READWISE_TOKEN in environment variables. Ensure it's set in your .env file.")
 
-        try:
-            response = requests.get(
-                API_URL,
-                headers={"Authorization": f"Token {READWISE_TOKEN}"},
-                params=params,
-                timeout=30
-            )
-            response.raise_for_status()
+    partitions = list(product(categories or [None], locations or [None]))
+    print(f"Fetching {len(partitions)} partitions with up to {max_workers} workers...")
 
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            if use_store:
+                sync_categories = list(dict.fromkeys(category for category, _ in partitions))
+                list(executor.map(lambda category: store.sync_documents(category=category), sync_categories))
+                results = {
+                    (category, location): store.query_documents(category=category, location=location)
+                    for category, location in partitions
+                }
+            else:
+                fetched = executor.map(lambda p: list(iter_documents(category=p[0], location=p[1])), partitions)
+                results = dict(zip(partitions, fetched))
         except requests.exceptions.RequestException as e:
             print(f"Error during API request: {e}")
             raise Exception(f"API Request Failed: {e}") from e
 
-        try:
-            data = response.json()
-        except requests.exceptions.JSONDecodeError as e:
-            print(f"Error decoding JSON response: {e}")
-            raise Exception("Failed to decode API response JSON.") from e
+    client.print_stats()
+    return results
+
+
+def merge_documents(documents_by_partition):
+    """Flatten partition results into one list, dropping duplicate document ids."""
+    seen = set()
+    merged = []
+    for docs in documents_by_partition.values():
+        for doc in docs:
+            if doc["id"] in seen:
+                continue
+            seen.add(doc["id"])
+            merged.append(doc)
+    return merged
 
-        results = data.get("results", [])
-        all_docs.extend(results)
-        next_cursor = data.get("nextPageCursor")
 
-        print(f"Fetched {len(results)} documents. Total: {len(all_docs)}. Next cursor: {'Yes' if next_cursor else 'No'}")
+def fetch_recently_archived_documents(days=7):
+    if not READWISE_TOKEN:
+        raise ValueError("Missing READWISE_TOKEN in environment variables. Ensure it's set in your .env file.")
+
+    # Calculate the cutoff date (N days ago) - make it timezone-aware (UTC)
+    cutoff_date = datetime.now(timezone.utc) - timedelta(days=days)
+    cutoff_date_iso = cutoff_date.isoformat()
 
-        if not next_cursor:
-            break
+    print(f"Fetching documents updated since: {cutoff_date_iso}")
 
     # Filter for documents that are currently archived AND were moved to archive in the timeframe
     recently_archived = []
 
-    for doc in all_docs:
+    for doc in iter_documents(updated_after=cutoff_date_iso):
         # Must be in archive location
         if doc.get("location") != "archive":
             continue
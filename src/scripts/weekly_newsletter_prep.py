@@ -1,78 +1,48 @@
-import datetime
-import requests
-import os
-from dotenv import load_dotenv
+import random
 
-load_dotenv()
+from src.readwise import client
+from src.readwise.highlights import get_recent_highlights as fetch_recent_highlights
 
 # Get your Readwise API token from https://readwise.io/access_token
-READWISE_TOKEN = os.environ.get("READWISE_TOKEN")
+READWISE_TOKEN = client.READWISE_TOKEN
 if not READWISE_TOKEN:
     print("Error: Please set the READWISE_TOKEN environment variable.")
     exit()
 
-def get_recent_highlights(token, days=7, sample_size=5):
+def get_recent_highlights(days=7, sample_size=5):
     """
-    Fetches highlights updated in the last specified number of days and returns a sample.
+    Returns a sample of the highlights updated in the last specified number of days.
+
+    Highlights come from the shared recent-highlights provider, which syncs the
+    local export mirror at most once per run instead of crawling the API here.
 
     Args:
-        token: Your Readwise API token.
         days: The number of recent days to filter by.
         sample_size: The number of highlights to sample.
 
     Returns:
-        A list of highlight dictionaries, or None if an error occurs.
+        A list of highlight dictionaries.
     """
-    url = "https://readwise.io/api/v2/highlights/"
-    headers = {"Authorization": f"Token {token}"}
-    now = datetime.datetime.now(datetime.timezone.utc)
-    time_delta = datetime.timedelta(days=days)
-    updated_after = (now - time_delta).isoformat()
-
-    params = {
-        "updated__gt": updated_after,
-        "page_size": 100  # Adjust page size as needed
-    }
-
-    recent_highlights = []
-    next_page = url
-
-    try:
-        while next_page:
-            response = requests.get(next_page, headers=headers, params=params)
-            response.raise_for_status()  # Raise an exception for bad status codes
-            data = response.json()
-            recent_highlights.extend(data.get('results', []))
-            next_page = data.get('next')
-            params = {} # Clear params for subsequent pages
-
-        if not recent_highlights:
-            print(f"No highlights found updated in the last {days} days.")
-            return []
+    recent_highlights = fetch_recent_highlights(days=days)
 
-        # Sample the highlights
-        if len(recent_highlights) <= sample_size:
-            return recent_highlights
-        else:
-            import random
-            return random.sample(recent_highlights, sample_size)
+    if not recent_highlights:
+        print(f"No highlights found updated in the last {days} days.")
+        return []
 
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching highlights: {e}")
-        return None
-    except ValueError:
-        print("Error decoding JSON response.")
-        return None
+    # Sample the highlights
+    if len(recent_highlights) <= sample_size:
+        return recent_highlights
+    return random.sample(recent_highlights, sample_size)
 
 if __name__ == "__main__":
-    recent_sample = get_recent_highlights(READWISE_TOKEN)
+    recent_sample = get_recent_highlights()
 
     if recent_sample:
         print("\nSample of recent highlights:")
         for i, highlight in enumerate(recent_sample):
             print(f"\n--- Highlight {i+1} ---")
             print(f"Text: {highlight.get('text')}")
-            print(f"Book/Article: {highlight.get('title')}")
-            print(f"Author: {highlight.get('author')}")
+            print(f"Book/Article: {highlight.get('book_title')}")
+            print(f"Author: {highlight.get('book_author')}")
             print(f"Note: {highlight.get('note')}")
             print(f"Highlighted At: {highlight.get('highlighted_at')}")
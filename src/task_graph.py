@@ -0,0 +1,101 @@
+"""Run a small graph of dependent tasks on a thread pool.
+
+Each task is a named callable that may depend on other tasks. A task is
+started as soon as everything it depends on has finished, so independent
+tasks (newsletter blocks, report sections) overlap their network and LLM
+round trips and the whole graph takes about as long as its slowest path.
+Results come back keyed by name, so the caller decides the output order.
+Tasks run in a copy of the caller's context, so a tracing span opened around
+`run` still applies inside them. A task whose dependency fails is skipped,
+and the first error is raised once everything that could run has finished.
+"""
+
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+
+class Task:
+    def __init__(self, name: str, func: Callable[..., Any], deps: Iterable[str] = ()):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+
+
+class TaskGraph:
+    def __init__(self):
+        self.tasks: Dict[str, Task] = {}
+        self.timings: Dict[str, float] = {}
+        self.errors: Dict[str, BaseException] = {}
+
+    def add(self, name: str, func: Callable[..., Any], deps: Iterable[str] = ()) -> "TaskGraph":
+        """Register `func` under `name`; it is called with the results of `deps`, in that order."""
+        if name in self.tasks:
+            raise ValueError(f"Task {name!r} is already defined")
+        self.tasks[name] = Task(name, func, deps)
+        return self
+
+    def _check(self) -> None:
+        for task in self.tasks.values():
+            for dep in task.deps:
+                if dep not in self.tasks:
+                    raise ValueError(f"Task {task.name!r} depends on unknown task {dep!r}")
+
+        # Kahn's algorithm; anything left over sits on a cycle
+        pending = {name: len(task.deps) for name, task in self.tasks.items()}
+        ready = [name for name, count in pending.items() if count == 0]
+        done = 0
+        while ready:
+            name = ready.pop()
+            done += 1
+            for other in self.tasks.values():
+                if name in other.deps:
+                    pending[other.name] -= other.deps.count(name)
+                    if pending[other.name] == 0:
+                        ready.append(other.name)
+        if done != len(self.tasks):
+            cycle = sorted(name for name, count in pending.items() if count > 0)
+            raise ValueError(f"Task graph has a cycle through: {', '.join(cycle)}")
+
+    def _timed(self, task: Task, args: List[Any]) -> Any:
+        started = time.perf_counter()
+        try:
+            return task.func(*args)
+        finally:
+            self.timings[task.name] = time.perf_counter() - started
+
+    def run(self, max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """Run every task, each as soon as its dependencies are done; return results by name."""
+        self._check()
+        self.timings.clear()
+        self.errors.clear()
+        results: Dict[str, Any] = {}
+        waiting = dict(self.tasks)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=max_workers or len(self.tasks) or 1) as executor:
+            while waiting or running:
+                for name, task in list(waiting.items()):
+                    if any(dep in self.errors for dep in task.deps):
+                        self.errors[name] = RuntimeError(f"skipped because a dependency of {name!r} failed")
+                        del waiting[name]
+                    elif all(dep in results for dep in task.deps):
+                        args = [results[dep] for dep in task.deps]
+                        running[executor.submit(contextvars.copy_context().run, self._timed, task, args)] = name
+                        del waiting[name]
+
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        self.errors[name] = e
+
+        failed = [name for name in self.tasks if name in self.errors and name in self.timings]
+        if failed:
+            raise self.errors[failed[0]]
+        return results
@@ -0,0 +1,268 @@
+"""Per-stage timing, traffic and LLM cost tracing.
+
+Wrap a stage in `tracer.span(name)` (or decorate it with `@traced`) and
+everything that happens inside it is charged to that span: wall time, bytes
+sent and received over HTTP, and input/output tokens of every LLM call made
+through the `src.llm_cache` helpers, priced with `MODEL_PRICES`. Spans nest;
+work is charged to the innermost one. Traffic is counted by a response hook
+(`record_response`), registered on the shared Readwise session with
+`trace_session` and passed per call elsewhere; `requests` itself is never
+patched. The current span is carried in a context variable, so thread pools
+that submit through `contextvars` (the task graph, the page fetcher) keep
+charging the span that started them.
+
+At the end of a run, `tracer.print_summary()` prints a table and
+`tracer.write_json()` saves the full trace under `caches/traces/`.
+"""
+
+import contextvars
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import requests
+
+TRACE_DIR = Path.cwd() / "caches" / "traces"
+
+# USD per million (input, output) tokens; the longest matching prefix wins
+MODEL_PRICES = {
+    "claude-sonnet-4": (3.00, 15.00),
+    "claude-3-7-sonnet": (3.00, 15.00),
+    "claude-3-5-sonnet": (3.00, 15.00),
+    "gpt-5": (1.25, 10.00),
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+}
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+def estimate_cost(model: Optional[str], input_tokens: int, output_tokens: int) -> float:
+    matches = [prefix for prefix in MODEL_PRICES if model and model.startswith(prefix)]
+    if not matches:
+        return 0.0
+    input_price, output_price = MODEL_PRICES[max(matches, key=len)]
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+class Span:
+    def __init__(self, name: str, parent: Optional["Span"] = None):
+        self.name = name
+        self.parent = parent
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.wall_time = 0.0
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.llm_calls = 0
+        self.llm_cached = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "parent": self.parent.name if self.parent else None,
+            "started_at": self.started_at,
+            "wall_time": round(self.wall_time, 3),
+            "requests": self.requests,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "llm_calls": self.llm_calls,
+            "llm_cached": self.llm_cached,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost": round(self.cost, 6),
+            "error": self.error,
+        }
+
+
+class Tracer:
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+        self._started: Optional[float] = None
+
+    def reset(self) -> None:
+        with self._lock:
+            self.spans = []
+            self._started = None
+
+    @contextmanager
+    def span(self, name: str):
+        span = Span(name, parent=_current_span.get())
+        with self._lock:
+            # The run's total time starts with its first span
+            if self._started is None:
+                self._started = time.perf_counter()
+            self.spans.append(span)
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.wall_time = time.perf_counter() - started
+            _current_span.reset(token)
+
+    def _charge(self, span: Optional[Span] = None, **amounts) -> None:
+        span = span or _current_span.get()
+        if span is None:
+            return
+        with self._lock:
+            for field, amount in amounts.items():
+                setattr(span, field, getattr(span, field) + amount)
+
+    def record_request(self, sent: int, received: int) -> None:
+        self._charge(requests=1, bytes_sent=sent, bytes_received=received)
+
+    def record_llm(
+        self,
+        model: Optional[str],
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        cached: bool = False,
+    ) -> None:
+        """Charge one LLM call to the current span; cached answers cost nothing."""
+        if cached:
+            self._charge(llm_calls=1, llm_cached=1)
+            return
+        self._charge(
+            llm_calls=1,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cost=estimate_cost(model, input_tokens, output_tokens),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = [span.to_dict() for span in self.spans]
+            wall_time = time.perf_counter() - self._started if self._started is not None else 0.0
+        return {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "wall_time": round(wall_time, 3),
+            "spans": spans,
+        }
+
+    def write_json(self, name: str = "trace", directory: Path = None) -> Path:
+        directory = Path(directory or TRACE_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+    def print_summary(self) -> None:
+        trace = self.to_dict()
+        spans = trace["spans"]
+        if not spans:
+            return
+
+        width = max(len(span["name"]) for span in spans + [{"name": "total"}])
+        header = (
+            f"{'stage':<{width}}  {'time':>8}  {'reqs':>5}  {'sent':>9}  {'received':>9}  "
+            f"{'llm':>5}  {'in tok':>8}  {'out tok':>8}  {'cost':>8}"
+        )
+        print("\n" + header)
+        print("-" * len(header))
+        for span in spans:
+            llm = f"{span['llm_calls']}" + (f"/{span['llm_cached']}c" if span["llm_cached"] else "")
+            status = "  (failed)" if span["error"] else ""
+            print(
+                f"{span['name']:<{width}}  {span['wall_time']:7.2f}s  {span['requests']:>5}  "
+                f"{format_bytes(span['bytes_sent']):>9}  {format_bytes(span['bytes_received']):>9}  {llm:>5}  "
+                f"{span['input_tokens']:>8,}  {span['output_tokens']:>8,}  ${span['cost']:>7.4f}{status}"
+            )
+        print("-" * len(header))
+        print(
+            f"{'total':<{width}}  {trace['wall_time']:7.2f}s  {sum(s['requests'] for s in spans):>5}  "
+            f"{format_bytes(sum(s['bytes_sent'] for s in spans)):>9}  "
+            f"{format_bytes(sum(s['bytes_received'] for s in spans)):>9}  "
+            f"{sum(s['llm_calls'] for s in spans):>5}  {sum(s['input_tokens'] for s in spans):>8,}  "
+            f"{sum(s['output_tokens'] for s in spans):>8,}  ${sum(s['cost'] for s in spans):>7.4f}"
+        )
+
+
+def format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+tracer = Tracer()
+
+
+def traced(func=None, *, name: str = None):
+    """Decorator form of `tracer.span`, named after the function by default."""
+    if func is None:
+        return functools.partial(traced, name=name)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with tracer.span(name or func.__name__):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def _response_size(response: requests.Response) -> int:
+    content = response.content
+    raw = getattr(response, "raw", None)
+    try:
+        # Bytes on the wire, before decompression
+        return raw.tell() if raw is not None else len(content)
+    except Exception:
+        return len(content)
+
+
+def record_response(response: requests.Response, *args, **kwargs) -> requests.Response:
+    """`requests` response hook that charges the request's traffic to the current span.
+
+    Register it on a session with `trace_session`, or per call with
+    `hooks={"response": record_response}`.
+    """
+    if _current_span.get() is None:
+        return response
+    request = response.request
+    # Streamed uploads (files, generators) have no size we can read cheaply
+    body = request.body if isinstance(request.body, (bytes, str)) else b""
+    sent = len(body) + len(request.url) + sum(len(k) + len(v) for k, v in request.headers.items())
+    if kwargs.get("stream"):
+        # The body hasn't been read yet; `record_streamed_body` adds it once it has
+        tracer.record_request(sent, 0)
+        response._trace_span = _current_span.get()
+    else:
+        # Hooks run before `send` reads the body; reading it here is what `send` would do next
+        tracer.record_request(sent, _response_size(response))
+    return response
+
+
+def record_streamed_body(response: requests.Response, received: int) -> None:
+    """Charge the `received` bytes of a consumed `stream=True` body to the span that made the request.
+
+    Does nothing for untraced responses, or if the body was already charged.
+    """
+    span = getattr(response, "_trace_span", None)
+    if span is None:
+        return
+    response._trace_span = None
+    tracer._charge(span, bytes_received=received)
+
+
+def trace_session(session: requests.Session) -> requests.Session:
+    """Count the traffic of every request `session` makes while a span is open."""
+    if record_response not in session.hooks["response"]:
+        session.hooks["response"].append(record_response)
+    return session
@@ -3,9 +3,13 @@ from dotenv import load_dotenv
 import requests
 from google import genai
 
+from src.llm_cache import gemini_text
+from src.tracing import record_response, traced
+
 load_dotenv()
 
 
+@traced
 def send_to_typefully(content: str, threadify: bool = True) -> dict:
     cleaned_content = content.replace("\n---\n", "\n\n\n\n")
 
@@ -16,13 +20,14 @@ def send_to_typefully(content: str, threadify: bool = True) -> dict:
     }
     payload = {"content": cleaned_content, "threadify": threadify}
 
-    response = requests.post(url, headers=headers, json=payload)
+    response = requests.post(url, headers=headers, json=payload, hooks={"response": record_response})
     response.raise_for_status()
 
     return response.json()
 
 
 
+@traced
 def generate_tweet_thread_from_newsletter(newsletter_content: str) -> str:
     """
     Generate a tweet thread from newsletter content using Gemini.
@@ -211,9 +216,8 @@ Here is the newsletter content to convert this time:
 """
 
     try:
-        response = client.models.generate_content(
-            model="gemini-2.5-pro-preview-03-25", contents=prompt
+        return gemini_text(
+            client, model="gemini-2.5-pro-preview-03-25", contents=prompt
         )
-        return response.text
     except Exception as e:
         return f"Error generating tweet thread with Gemini: {e}"